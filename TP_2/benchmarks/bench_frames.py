@@ -0,0 +1,98 @@
+"""
+Benchmark de Lectura de Frames grandes (throughput del protocolo).
+
+Envía frames de varios MB (payload binario con un campo bytes, como un
+screenshot) por un par de sockets locales y mide cuánto tarda el lado
+lector en recibirlos y decodificarlos, en las rutas síncrona y asíncrona.
+
+Uso (desde TP_2/):
+    python -m benchmarks.bench_frames
+    python -m benchmarks.bench_frames --frame-mb 8 --frames 20 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from typing import Dict, Callable
+
+from common.protocol import ProtocolHandler, RESP_SUCCESS
+from common.serialization import CODEC_BINARY
+
+
+def _sender(sock: socket.socket, message: bytes, frames: int):
+    for _ in range(frames):
+        sock.sendall(message)
+
+
+def _run(reader: Callable[[socket.socket, int], None], message: bytes, frames: int) -> float:
+    """Devuelve MB/s leídos por `reader` mientras otro hilo escribe los frames."""
+    s1, s2 = socket.socketpair()
+    try:
+        sender = threading.Thread(target=_sender, args=(s1, message, frames))
+        start = time.perf_counter()
+        sender.start()
+        reader(s2, frames)
+        elapsed = time.perf_counter() - start
+        sender.join()
+    finally:
+        s1.close()
+        s2.close()
+    return len(message) * frames / (1024 * 1024) / elapsed
+
+
+def read_sync(sock: socket.socket, frames: int):
+    proto = ProtocolHandler()
+    for _ in range(frames):
+        proto.sync_read_frame(sock)
+
+
+def read_async_stream(sock: socket.socket, frames: int):
+    async def main():
+        reader, writer = await asyncio.open_connection(sock=sock)
+        proto = ProtocolHandler()
+        for _ in range(frames):
+            await proto.async_read_frame(reader)
+        writer.transport.pause_reading()
+    asyncio.run(main())
+
+
+def read_async_sock(sock: socket.socket, frames: int):
+    async def main():
+        sock.setblocking(False)
+        proto = ProtocolHandler()
+        for _ in range(frames):
+            await proto.async_sock_read_frame(sock)
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de lectura de frames grandes')
+    parser.add_argument('--frame-mb', type=int, default=4, help='Tamaño de cada frame en MB (default: 4)')
+    parser.add_argument('--frames', type=int, default=20, help='Cantidad de frames (default: 20)')
+    parser.add_argument('--json', action='store_true', dest='as_json', help='Imprimir resultados como JSON')
+    args = parser.parse_args()
+
+    payload = {"data": {"screenshot": os.urandom(args.frame_mb * 1024 * 1024)}}
+    message = ProtocolHandler(CODEC_BINARY).pack_message(RESP_SUCCESS, payload, request_id=1)
+
+    readers: Dict[str, Callable] = {"sync": read_sync, "async_stream": read_async_stream}
+    if hasattr(ProtocolHandler, 'async_sock_read_frame'):
+        readers["async_sock"] = read_async_sock
+
+    results = {name: round(_run(reader, message, args.frames), 1) for name, reader in readers.items()}
+
+    if args.as_json:
+        print(json.dumps({"frame_mb": args.frame_mb, "frames": args.frames, "mb_per_s": results}, indent=2))
+        return
+
+    print(f"Frames: {args.frames} x {args.frame_mb} MB")
+    for name, mbps in results.items():
+        print(f"{name:<14}{mbps:>10} MB/s")
+
+
+if __name__ == "__main__":
+    main()
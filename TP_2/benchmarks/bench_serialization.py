@@ -0,0 +1,75 @@
+"""
+Benchmark de Serialización: JSON (+ base64) vs codec binario.
+
+Arma una respuesta típica del Servidor B (screenshot + thumbnails +
+performance) y compara tamaño del payload y tiempo de ida y vuelta
+(serializar + deserializar) para cada codec.
+
+Uso (desde TP_2/):
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --screenshot-kb 2048 --rounds 50 --json
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+from typing import Dict, Any
+
+from common.serialization import (
+    serialize_data, deserialize_data, CODEC_JSON, CODEC_BINARY
+)
+
+
+def build_payload(screenshot_kb: int, thumbnails: int, as_bytes: bool) -> Dict[str, Any]:
+    """Respuesta sintética; con as_bytes=False las imágenes van en base64 (como con JSON)."""
+    screenshot = os.urandom(screenshot_kb * 1024)
+    thumbs = [os.urandom(6 * 1024) for _ in range(thumbnails)]
+    if not as_bytes:
+        screenshot = base64.b64encode(screenshot).decode('utf-8')
+        thumbs = [base64.b64encode(t).decode('utf-8') for t in thumbs]
+    return {
+        "data": {
+            "screenshot": screenshot,
+            "thumbnails": thumbs,
+            "performance": {"load_time_ms": 812.33, "total_size_kb": 431.2, "num_requests": 37},
+        }
+    }
+
+
+def measure(payload: Dict[str, Any], codec: int, rounds: int) -> Dict[str, float]:
+    """Devuelve tamaño en bytes y tiempo medio (ms) de serializar + deserializar."""
+    encoded = serialize_data(payload, codec)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        deserialize_data(serialize_data(payload, codec), codec)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / rounds
+    return {"payload_bytes": len(encoded), "roundtrip_ms": round(elapsed_ms, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de codecs de serialización A <-> B')
+    parser.add_argument('--screenshot-kb', type=int, default=1024, help='Tamaño del screenshot crudo en KB (default: 1024)')
+    parser.add_argument('--thumbnails', type=int, default=5, help='Cantidad de thumbnails (default: 5)')
+    parser.add_argument('--rounds', type=int, default=20, help='Repeticiones por codec (default: 20)')
+    parser.add_argument('--json', action='store_true', dest='as_json', help='Imprimir resultados como JSON')
+    args = parser.parse_args()
+
+    results = {
+        "json_base64": measure(build_payload(args.screenshot_kb, args.thumbnails, as_bytes=False), CODEC_JSON, args.rounds),
+        "binary_raw": measure(build_payload(args.screenshot_kb, args.thumbnails, as_bytes=True), CODEC_BINARY, args.rounds),
+    }
+
+    if args.as_json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Screenshot: {args.screenshot_kb} KB, thumbnails: {args.thumbnails}, rounds: {args.rounds}")
+    print(f"{'codec':<14}{'payload (bytes)':>18}{'ida y vuelta (ms)':>20}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['payload_bytes']:>18}{r['roundtrip_ms']:>20}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""
+Prueba de Carga E2E sin Internet (throughput y latencia del pipeline completo).
+
+Levanta todo localmente:
+
+- Un origen sintético (aiohttp) que sirve páginas de tamaño, cantidad de
+  links e imágenes configurables (`/page/<n>`) y un PNG por imagen.
+- Un Servidor B: un stub que habla el protocolo y responde con datos
+  sintéticos tras un retardo (`--server-b stub`, default) o el
+  server_processing.py real (`--server-b real`, necesita Chrome).
+- El Servidor A (server_scraping.py) como subproceso, o en el mismo event
+  loop con `--in-process` (menos fiel, pero sin procesos extra).
+
+Antes de medir se hacen `--warmup` requests secuenciales (arranque en
+frío). El generador es de lazo abierto: programa los requests a `--rate` por
+segundo durante `--duration` segundos y mide la latencia desde el instante
+programado (así una cola en el servidor no se esconde detrás de un cliente
+que espera). `--max-in-flight` acota los requests abiertos. Para
+/scrape/async la latencia llega hasta que /status?wait= (long-polling)
+informa el final.
+
+Cada request usa una URL distinta (sin hits de cache) salvo que se pida
+`--unique-urls N`. El resultado (JSON con `--json` o `--output`) trae por
+endpoint throughput, p50/p95/p99, tasa de errores y conteo de status.
+
+Uso (desde TP_2/):
+    python -m benchmarks.load_test --rate 20 --duration 10
+    python -m benchmarks.load_test --endpoints sync,async --page-kb 200 --links 500 --json
+    python -m benchmarks.load_test --server-b real --components title,links,thumbnails --output load.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from common.protocol import (
+    ProtocolHandler, ProtocolException, TASK_SCREENSHOT, TASK_PERFORMANCE, TASK_IMAGES, RESP_SUCCESS, RESP_ERROR
+)
+from common.serialization import CODEC_BINARY, bytes_to_base64
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_VERSION = 1
+
+
+# --- Origen sintético ---
+
+def synthetic_page(n: int, kb: int, links: int, images: int) -> bytes:
+    """Página HTML determinística de ~`kb` KB con `links` links e `images` imágenes."""
+    head = (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Página {n}</title>"
+            f"<meta name='description' content='Página sintética {n}'>"
+            f"<link rel='stylesheet' href='/static/{n}.css'><script src='/static/{n}.js'></script></head><body>")
+    parts = [head, f"<h1>Página {n}</h1>"]
+    parts += [f"<a href='/page/{n}-{i}'>Link {i}</a>" for i in range(links)]
+    parts += [f"<img src='/img/{n}-{i}.png' alt='Imagen {i}'>" for i in range(images)]
+    body = "".join(parts)
+    filler = max(0, kb * 1024 - len(body) - 20)
+    paragraph = "<p>" + "Lorem ipsum dolor sit amet. " * 8 + "</p>"
+    body += paragraph * (filler // len(paragraph) + (1 if filler else 0))
+    return (body + "</body></html>").encode("utf-8")
+
+
+def _png(size: Tuple[int, int] = (320, 240)) -> bytes:
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", size, (40, 120, 200)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def create_origin_app(page_kb: int, links: int, images: int) -> web.Application:
+    """
+    App del origen. Los parámetros por defecto se pueden cambiar por request
+    con ?kb=&links=&images= en la URL de la página.
+    """
+    png = _png()
+
+    async def page(request: web.Request) -> web.Response:
+        query = request.query
+        html = synthetic_page(
+            request.match_info["n"],
+            int(query.get("kb", page_kb)), int(query.get("links", links)), int(query.get("images", images))
+        )
+        return web.Response(body=html, content_type="text/html", charset="utf-8")
+
+    async def image(request: web.Request) -> web.Response:
+        return web.Response(body=png, content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/page/{n}", page)
+    app.router.add_get("/img/{name}", image)
+    return app
+
+
+# --- Stub del Servidor B ---
+
+class StubProcessingServer:
+    """Responde TASK_* con datos sintéticos tras `delay` segundos, respetando IDs y codec."""
+
+    def __init__(self, delay: float = 0.05, screenshot_kb: int = 200, thumbnail_kb: int = 6):
+        self.delay = delay
+        self.screenshot = os.urandom(screenshot_kb * 1024)
+        self.thumbnail = os.urandom(thumbnail_kb * 1024)
+        self.proto = ProtocolHandler()
+        self.tasks = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _result(self, msg_type: int, payload: Dict[str, Any], raw_bytes: bool) -> Any:
+        if msg_type == TASK_SCREENSHOT:
+            result = self.screenshot
+        elif msg_type == TASK_PERFORMANCE:
+            stats = payload.get("page_stats") or {}
+            result = {"load_time_ms": stats.get("load_time_ms", 0.0),
+                      "total_size_kb": stats.get("total_size_kb", 0.0), "num_requests": 1}
+        elif msg_type == TASK_IMAGES:
+            result = [self.thumbnail] * min(5, len(payload.get("image_urls", [])))
+        else:
+            raise ValueError(f"Tipo de tarea desconocido: {msg_type}")
+        return result if raw_bytes else bytes_to_base64(result)
+
+    async def _answer(self, writer: asyncio.StreamWriter, frame):
+        await asyncio.sleep(self.delay)
+        try:
+            data = self._result(frame.msg_type, frame.payload, frame.codec == CODEC_BINARY)
+            message = self.proto.pack_message(RESP_SUCCESS, {"data": data}, frame.request_id, frame.codec)
+        except ValueError as e:
+            message = self.proto.pack_message(RESP_ERROR, {"error": str(e)}, frame.request_id, frame.codec)
+        self.tasks += 1
+        if not writer.is_closing():
+            writer.write(message)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        pending = set()
+        try:
+            while True:
+                frame = await self.proto.async_read_frame(reader)
+                task = asyncio.create_task(self._answer(writer, frame))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except ProtocolException:
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+# --- Procesos y sitios ---
+
+def free_port() -> int:
+    with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Timeout esperando el puerto {port}")
+
+
+def spawn(script: str, args: List[str], log_path: Optional[str]) -> subprocess.Popen:
+    """Lanza un servidor del proyecto como subproceso (su salida va a `log_path` o se descarta)."""
+    output = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, os.path.join(PROJECT_ROOT, script), *args],
+                            cwd=PROJECT_ROOT, stdout=output, stderr=subprocess.STDOUT)
+
+
+def stop(process: Optional[subprocess.Popen]):
+    if process is None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def start_site(app: web.Application) -> Tuple[web.AppRunner, int]:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+async def start_server_a_in_process(b_port: int, extra_args: List[str]) -> Tuple[web.AppRunner, int]:
+    """Servidor A en este mismo event loop (sin procesos de parsing)."""
+    import server_scraping
+
+    args = server_scraping.parse_args(["-i", "127.0.0.1", "-p", "0", "--processing-port", str(b_port),
+                                       "--parse-workers", "0", *extra_args])
+    args.worker_id = 0
+    return await start_site(await server_scraping.init_app(args))
+
+
+# --- Generador de carga ---
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Percentil por rango más cercano (None si no hay valores)."""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), math.ceil(q * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(endpoint: str, target_rps: float, duration: float, elapsed: float,
+              samples: List[Tuple[bool, str, float]]) -> Dict[str, Any]:
+    """Resumen de una corrida: samples es una lista de (ok, status, latencia en segundos)."""
+    latencies = sorted(latency * 1000 for ok, _, latency in samples if ok)
+    status_counts: Dict[str, int] = {}
+    for _, status, _ in samples:
+        status_counts[status] = status_counts.get(status, 0) + 1
+    ok = len(latencies)
+    errors = len(samples) - ok
+    round_ms = lambda value: None if value is None else round(value, 2)
+    return {
+        "endpoint": endpoint,
+        "target_rps": target_rps,
+        "duration_s": duration,
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(samples),
+        "ok": ok,
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed > 0 else 0.0,
+        "status_counts": dict(sorted(status_counts.items())),
+        "latency_ms": {
+            "p50": round_ms(percentile(latencies, 0.50)),
+            "p95": round_ms(percentile(latencies, 0.95)),
+            "p99": round_ms(percentile(latencies, 0.99)),
+            "mean": round_ms(sum(latencies) / ok if ok else None),
+            "max": round_ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+async def _scrape_sync(session: aiohttp.ClientSession, base_url: str, url: str,
+                       components: Optional[str]) -> Tuple[bool, str]:
+    params = {"url": url}
+    if components:
+        params["components"] = components
+    async with session.get(f"{base_url}/scrape", params=params) as response:
+        await response.read()
+        return response.status == 200, str(response.status)
+
+
+async def _scrape_async(session: aiohttp.ClientSession, base_url: str, url: str,
+                        components: Optional[str], wait: float) -> Tuple[bool, str]:
+    form = {"url": url}
+    if components:
+        form["components"] = components
+    async with session.post(f"{base_url}/scrape/async", data=form) as response:
+        if response.status != 202:
+            await response.read()
+            return False, str(response.status)
+        task_id = (await response.json())["task_id"]
+
+    # Long-polling: el servidor responde apenas la tarea termina
+    while True:
+        async with session.get(f"{base_url}/status/{task_id}", params={"wait": str(wait)}) as response:
+            status = (await response.json()).get("status") if response.status == 200 else str(response.status)
+        if status == "completed":
+            return True, "completed"
+        if status not in ("pending", "scraping"):
+            return False, str(status)
+
+
+async def run_load(base_url: str, origin_url: str, endpoint: str, rate: float, duration: float,
+                   components: Optional[str] = None, unique_urls: int = 0, max_in_flight: int = 256,
+                   timeout: float = 60.0, url_prefix: str = "") -> Dict[str, Any]:
+    """
+    Genera `rate` requests por segundo durante `duration` segundos contra
+    `endpoint` ('sync' o 'async') y devuelve el resumen (ver summarize).
+    """
+    total = max(1, int(rate * duration))
+    slots = asyncio.Semaphore(max_in_flight)
+    samples: List[Tuple[bool, str, float]] = []
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+
+    async with aiohttp.ClientSession(timeout=client_timeout, connector=connector) as session:
+        async def one(i: int, scheduled_at: float):
+            n = i % unique_urls if unique_urls else i
+            url = f"{origin_url}/page/{url_prefix}{endpoint}-{n}"
+            try:
+                if endpoint == "sync":
+                    ok, status = await _scrape_sync(session, base_url, url, components)
+                else:
+                    ok, status = await asyncio.wait_for(
+                        _scrape_async(session, base_url, url, components, timeout), timeout)
+            except asyncio.TimeoutError:
+                ok, status = False, "timeout"
+            except aiohttp.ClientError as e:
+                ok, status = False, type(e).__name__
+            finally:
+                slots.release()
+            samples.append((ok, status, time.monotonic() - scheduled_at))
+
+        start = time.monotonic()
+        tasks = []
+        for i in range(total):
+            scheduled_at = start + i / rate
+            delay = scheduled_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            tasks.append(asyncio.create_task(one(i, scheduled_at)))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    return summarize(endpoint, rate, duration, elapsed, samples)
+
+
+# --- Orquestación ---
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    origin_runner, origin_port = await start_site(create_origin_app(args.page_kb, args.links, args.images))
+    origin_url = f"http://127.0.0.1:{origin_port}"
+    stub: Optional[StubProcessingServer] = None
+    server_b: Optional[subprocess.Popen] = None
+    server_a: Optional[subprocess.Popen] = None
+    a_runner: Optional[web.AppRunner] = None
+    log = (lambda name: os.path.join(args.log_dir, name)) if args.log_dir else (lambda name: None)
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    try:
+        if args.server_b == "stub":
+            stub = StubProcessingServer(args.stub_delay_ms / 1000, args.stub_screenshot_kb)
+            b_port = await stub.start()
+        else:
+            b_port = free_port()
+            server_b = spawn("server_processing.py", ["-i", "127.0.0.1", "-p", str(b_port),
+                                                      *shlex.split(args.server_b_args)], log("server_b.log"))
+            await wait_for_port(b_port)
+
+        extra_a_args = shlex.split(args.server_a_args)
+        if args.in_process:
+            a_runner, a_port = await start_server_a_in_process(b_port, extra_a_args)
+        else:
+            a_port = free_port()
+            server_a = spawn("server_scraping.py", ["-i", "127.0.0.1", "-p", str(a_port),
+                                                    "--processing-port", str(b_port), *extra_a_args],
+                             log("server_a.log"))
+            await wait_for_port(a_port)
+        base_url = f"http://127.0.0.1:{a_port}"
+
+        prefix = f"{int(time.time())}-"  # URLs nuevas en cada corrida
+        if args.warmup:
+            # Arranque en frío (pool de parsing, conexiones hacia B): no se mide
+            await run_load(base_url, origin_url, "sync", args.warmup, 1.0, args.components,
+                           max_in_flight=1, timeout=args.timeout, url_prefix=f"{prefix}warmup-")
+
+        results = []
+        for endpoint in args.endpoints:
+            results.append(await run_load(
+                base_url, origin_url, endpoint, args.rate, args.duration, args.components,
+                args.unique_urls, args.max_in_flight, args.timeout, url_prefix=prefix
+            ))
+    finally:
+        stop(server_a)
+        stop(server_b)
+        if a_runner is not None:
+            await a_runner.cleanup()
+        if stub is not None:
+            await stub.close()
+        await origin_runner.cleanup()
+
+    return {
+        "version": REPORT_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "server_b": args.server_b, "in_process": args.in_process, "rate": args.rate,
+            "duration_s": args.duration, "components": args.components, "unique_urls": args.unique_urls,
+            "max_in_flight": args.max_in_flight, "warmup": args.warmup, "page_kb": args.page_kb, "links": args.links,
+            "images": args.images, "stub_delay_ms": args.stub_delay_ms if stub else None,
+            "server_a_args": args.server_a_args,
+        },
+        "results": results,
+    }
+
+
+def _print_table(report: Dict[str, Any]):
+    print(f"{'endpoint':<8} {'req':>6} {'ok':>6} {'err%':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in report["results"]:
+        lat = r["latency_ms"]
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        print(f"{r['endpoint']:<8} {r['requests']:>6} {r['ok']:>6} {r['error_rate'] * 100:>5.1f}% "
+              f"{r['throughput_rps']:>8.1f} {fmt(lat['p50']):>9} {fmt(lat['p95']):>9} {fmt(lat['p99']):>9}")
+        print(f"         status: {r['status_counts']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Prueba de carga E2E del pipeline (origen local, sin Internet)')
+    parser.add_argument('--endpoints', type=str, default='sync', help='Endpoints a probar, separados por coma: sync,async (default: sync)')
+    parser.add_argument('--rate', type=float, default=20.0, help='Requests por segundo programados (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos de carga por endpoint (default: %(default)s)')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='Requests abiertos como máximo (default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=5, help='Requests sin medir antes de empezar, 0 = ninguno (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Timeout de cada request en segundos (default: %(default)s)')
+    parser.add_argument('--components', type=str, default=None, help='Componentes a pedir (default: todos)')
+    parser.add_argument('--unique-urls', type=int, default=0, help='Cantidad de URLs distintas, 0 = todas distintas (default: 0)')
+    parser.add_argument('--page-kb', type=int, default=50, help='Tamaño de cada página sintética en KB (default: %(default)s)')
+    parser.add_argument('--links', type=int, default=100, help='Links por página (default: %(default)s)')
+    parser.add_argument('--images', type=int, default=5, help='Imágenes por página (default: %(default)s)')
+    parser.add_argument('--server-b', choices=['stub', 'real'], default='stub', help='Servidor B simulado o server_processing.py (default: stub)')
+    parser.add_argument('--server-b-args', type=str, default='', help='Argumentos extra para server_processing.py (con --server-b real)')
+    parser.add_argument('--stub-delay-ms', type=float, default=50.0, help='Retardo de cada tarea del stub (default: %(default)s)')
+    parser.add_argument('--stub-screenshot-kb', type=int, default=200, help='Tamaño del screenshot del stub en KB (default: %(default)s)')
+    parser.add_argument('--server-a-args', type=str, default='', help='Argumentos extra para server_scraping.py (ej: "--cache-size 0")')
+    parser.add_argument('--in-process', action='store_true', help='Correr el Servidor A en este proceso')
+    parser.add_argument('--log-dir', type=str, default=None, help='Guardar la salida de los servidores en este directorio')
+    parser.add_argument('--output', type=str, default=None, help='Escribir el reporte JSON en este archivo')
+    parser.add_argument('--json', action='store_true', dest='as_json', help='Imprimir el reporte como JSON')
+    args = parser.parse_args(argv)
+    args.endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    invalid = set(args.endpoints) - {'sync', 'async'}
+    if invalid or not args.endpoints:
+        parser.error(f"--endpoints inválido: {args.endpoints}")
+    if args.rate <= 0 or args.duration <= 0:
+        parser.error("--rate y --duration deben ser positivos")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.in_process:
+        # El Servidor A imprime una línea por request: se descarta para no medir la terminal
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = asyncio.run(run_benchmark(args))
+    else:
+        report = asyncio.run(run_benchmark(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report)
+
+
+if __name__ == '__main__':
+    main()
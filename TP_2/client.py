@@ -11,6 +11,12 @@ from urllib.parse import urlparse
 import os
 import base64
 from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# Segundos que cada long-poll deja esperando al servidor (su tope es 60)
+LONG_POLL_WAIT = 30
+# El servidor manda un keepalive cada 15 s: sin datos por más tiempo, la conexión murió
+SSE_READ_TIMEOUT = 45
 
 def save_artifacts(data: dict, save_screenshot: bool):
     """Guarda el JSON en 'outputs/' y el screenshot en 'screenshots/'."""
@@ -41,9 +47,14 @@ def save_artifacts(data: dict, save_screenshot: bool):
         
         try:
             b64_data = data.get('processing_data', {}).get('screenshot')
+            extension = 'png'
+            if isinstance(b64_data, dict) and 'image' in b64_data:
+                # Screenshot pedido con opciones: {"image", "format", "bytes_saved", ...}
+                extension = {'jpeg': 'jpg'}.get(b64_data.get('format'), b64_data.get('format') or 'png')
+                b64_data = b64_data['image']
             if b64_data and isinstance(b64_data, str):
                 png_data = base64.b64decode(b64_data)
-                png_path = os.path.join('screenshots', f"{domain}_{timestamp}.png")
+                png_path = os.path.join('screenshots', f"{domain}_{timestamp}.{extension}")
                 
                 with open(png_path, 'wb') as f:
                     f.write(png_data)
@@ -55,6 +66,116 @@ def save_artifacts(data: dict, save_screenshot: bool):
         except OSError as e:
             print(f"Error de sistema de archivos al guardar screenshot: {e}", file=sys.stderr)
 
+def omit_screenshot(value):
+    """Reemplaza la imagen del screenshot (string o dict con opciones) por un marcador."""
+    if isinstance(value, dict) and 'image' in value:
+        return dict(value, image="[...Base64 omitido...]")
+    return "[...Base64 omitido...]"
+
+def screenshot_params(args: argparse.Namespace) -> dict:
+    """Opciones screenshot_* para el Servidor A (sólo las que se indicaron)."""
+    options = {
+        'screenshot_mode': args.screenshot_mode,
+        'screenshot_width': args.screenshot_width,
+        'screenshot_format': args.screenshot_format,
+        'screenshot_quality': args.screenshot_quality,
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+def run_batch(server_url_base: str, args: argparse.Namespace):
+    """Envía un batch de URLs y muestra cada resultado apenas llega (NDJSON)."""
+    try:
+        with open(args.batch, encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    except OSError as e:
+        print(f"Error al leer {args.batch}: {e}", file=sys.stderr)
+        return
+    
+    batch_url = f"{server_url_base}/scrape/batch"
+    print(f"📦 Enviando batch de {len(urls)} URLs a: {batch_url}\n")
+    
+    payload = {'urls': urls}
+    if args.components:
+        payload['components'] = args.components.split(',')
+    if args.concurrency:
+        payload['concurrency'] = args.concurrency
+    payload.update(screenshot_params(args))
+    
+    ok = failed = 0
+    try:
+        with requests.post(batch_url, json=payload, stream=True, timeout=(10, 120)) as response:
+            response.raise_for_status()
+            print(f"   URLs únicas: {response.headers.get('X-Batch-Unique', '?')}\n")
+            
+            for raw_line in response.iter_lines():
+                if not raw_line:
+                    continue
+                line = json.loads(raw_line)
+                if line.get('status') == 'success':
+                    ok += 1
+                    print(f"✅ {line['url']} ({line.get('cache', 'miss')})")
+                    if args.save:
+                        save_artifacts(line['result'], save_screenshot=True)
+                else:
+                    failed += 1
+                    print(f"❌ {line['url']}: {line.get('error')}")
+    except requests.RequestException as e:
+        print(f"Error de conexión: {e}", file=sys.stderr)
+    except json.JSONDecodeError as e:
+        print(f"Error: línea NDJSON inválida: {e}", file=sys.stderr)
+    
+    print(f"\nBatch terminado: {ok} exitosas, {failed} fallidas.")
+
+def wait_for_task(server_url_base: str, task_id: str, max_wait: float) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Long-polling sobre GET /result/{task_id}?wait=N: el servidor responde
+    apenas la tarea termina, así que el resultado llega en un solo request.
+    Devuelve (estado final, resultado) o ('timeout', None).
+    """
+    result_url = f"{server_url_base}/result/{task_id}"
+    deadline = time.monotonic() + max_wait
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return 'timeout', None
+        wait = min(LONG_POLL_WAIT, remaining)
+        response = requests.get(result_url, params={'wait': f"{wait:.1f}"}, timeout=wait + 10)
+        if response.status_code == 200:
+            return 'completed', response.json()
+        if response.status_code == 500:
+            return 'failed', response.json()
+        if response.status_code == 410:
+            return 'expired', None
+        response.raise_for_status()
+        print(f"   Estado: {response.json().get('status')}")
+
+def stream_task(server_url_base: str, task_id: str, max_wait: float) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Sigue la tarea por Server-Sent Events (GET /status/{task_id}/events):
+    muestra cada cambio de estado y devuelve el resultado del evento final.
+    """
+    events_url = f"{server_url_base}/status/{task_id}/events"
+    deadline = time.monotonic() + max_wait
+    status = 'timeout'
+    with requests.get(events_url, stream=True, timeout=(10, SSE_READ_TIMEOUT)) as response:
+        response.raise_for_status()
+        event, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if time.monotonic() > deadline:
+                return 'timeout', None
+            if line.startswith('event:'):
+                event = line[len('event:'):].strip()
+            elif line.startswith('data:'):
+                data.append(line[len('data:'):].strip())
+            elif not line and event:
+                payload = json.loads("\n".join(data))
+                if event == 'result':
+                    return ('failed' if payload.get('status') == 'failed' else 'completed'), payload
+                status = payload.get('status')
+                print(f"   Estado: {status}")
+                event, data = None, []
+    return (status if status == 'expired' else 'timeout'), None
+
 def main():
     parser = argparse.ArgumentParser(
         description='Cliente de prueba para el TP2 (CORREGIDO)',
@@ -68,11 +189,23 @@ Ejemplos de uso:
   # MODO ASÍNCRONO (Bonus Track - con task IDs)
   python client.py -u https://www.python.org --async --save
   
+  # MODO ASÍNCRONO siguiendo la tarea por Server-Sent Events
+  python client.py -u https://www.python.org --async --sse
+  
   # Consultar estado de tarea
   python client.py --status <task_id>
   
   # Descargar resultado de tarea
   python client.py --result <task_id> --save
+  
+  # MODO BATCH: muchas URLs (una por línea) en un solo request, resultados en streaming
+  python client.py --batch urls.txt --save
+  
+  # Sólo algunos componentes (title y meta no usan el Servidor B)
+  python client.py -u https://www.python.org --components title,meta
+  
+  # Screenshot liviano: sólo el viewport, 640 px de ancho, WebP
+  python client.py -u https://www.python.org --components screenshot --screenshot-mode viewport --screenshot-width 640 --screenshot-format webp
         """
     )
     
@@ -97,6 +230,10 @@ Ejemplos de uso:
         '--async', action='store_true', dest='async_mode',
         help='[BONUS] Usar modo asíncrono con task ID'
     )
+    parser.add_argument(
+        '--sse', action='store_true',
+        help='[BONUS] Con --async, seguir la tarea por Server-Sent Events en vez de long-polling'
+    )
     parser.add_argument(
         '--status', type=str, metavar='TASK_ID',
         help='[BONUS] Consultar el estado de una tarea específica'
@@ -106,6 +243,36 @@ Ejemplos de uso:
         help='[BONUS] Descargar el resultado de una tarea completada'
     )
     
+    parser.add_argument(
+        '--batch', type=str, metavar='ARCHIVO',
+        help='Scrapear todas las URLs del archivo (una por línea) con POST /scrape/batch'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=None,
+        help='URLs del batch procesándose a la vez (el servidor aplica su propio máximo)'
+    )
+    
+    parser.add_argument(
+        '--components', type=str, default=None,
+        help='Componentes a pedir separados por coma (ej: title,meta,screenshot). Default: todos'
+    )
+    parser.add_argument(
+        '--screenshot-mode', choices=['full', 'viewport'], default=None,
+        help='Capturar la página completa o sólo el viewport (default del servidor: full)'
+    )
+    parser.add_argument(
+        '--screenshot-width', type=int, default=None,
+        help='Ancho final del screenshot en px (se reduce en el Servidor B)'
+    )
+    parser.add_argument(
+        '--screenshot-format', choices=['png', 'jpeg', 'webp'], default=None,
+        help='Formato del screenshot (default del servidor: png)'
+    )
+    parser.add_argument(
+        '--screenshot-quality', type=int, default=None,
+        help='Calidad 1-100 para jpeg/webp (default del servidor: 80)'
+    )
+    
     args = parser.parse_args()
     
     server_url_base = f"http://{args.server_host}:{args.server_port}"
@@ -142,7 +309,7 @@ Ejemplos de uso:
                 save_artifacts(data, save_screenshot=True)
             else:
                 if data.get('processing_data', {}).get('screenshot'):
-                    data['processing_data']['screenshot'] = "[...Base64 omitido...]"
+                    data['processing_data']['screenshot'] = omit_screenshot(data['processing_data']['screenshot'])
                 if data.get('processing_data', {}).get('thumbnails'):
                     data['processing_data']['thumbnails'] = f"[{len(data['processing_data']['thumbnails'])} thumbnails]"
                 print(json.dumps(data, indent=2, ensure_ascii=False))
@@ -158,8 +325,12 @@ Ejemplos de uso:
             print(f"Error de conexión: {e}", file=sys.stderr)
         return
 
+    if args.batch:
+        run_batch(server_url_base, args)
+        return
+    
     if not args.url:
-        parser.error("Se requiere -u/--url (o usar --status/--result)")
+        parser.error("Se requiere -u/--url (o usar --status/--result/--batch)")
     
 
     if args.async_mode:
@@ -169,7 +340,15 @@ Ejemplos de uso:
         print(f"   URL a scrapear: {args.url}\n")
         
         try:
-            response = requests.post(scrape_async_url, data={'url': args.url}, timeout=10)
+            form = {'url': args.url}
+            if args.components:
+                form['components'] = args.components
+            form.update(screenshot_params(args))
+            response = requests.post(scrape_async_url, data=form, timeout=10)
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After', '?')
+                print(f"⏸️  Servidor saturado: la cola está llena. Reintentar en {retry_after}s.", file=sys.stderr)
+                return
             response.raise_for_status()
             task_data = response.json()
             
@@ -177,47 +356,32 @@ Ejemplos de uso:
             print(f"✅ Tarea creada exitosamente!")
             print(f"   Task ID: {task_id}\n")
             
-            status_url = f"{server_url_base}/status/{task_id}"
-            result_url = f"{server_url_base}/result/{task_id}"
-            
             print("⏳ Esperando a que la tarea se complete...")
-            max_wait = 60  
-            elapsed = 0
+            max_wait = 60
+            if args.sse:
+                final_status, data = stream_task(server_url_base, task_id, max_wait)
+            else:
+                final_status, data = wait_for_task(server_url_base, task_id, max_wait)
             
-            while elapsed < max_wait:
-                time.sleep(2)
-                elapsed += 2
+            if final_status == 'completed':
+                print("\n✅ Tarea completada!\n")
+                if args.save:
+                    save_artifacts(data, save_screenshot=True)
+                else:
+                    if data.get('processing_data', {}).get('screenshot'):
+                        data['processing_data']['screenshot'] = omit_screenshot(data['processing_data']['screenshot'])
+                    if data.get('processing_data', {}).get('thumbnails'):
+                        data['processing_data']['thumbnails'] = f"[{len(data['processing_data']['thumbnails'])} thumbnails]"
+                    print(json.dumps(data, indent=2, ensure_ascii=False))
                 
-                status_resp = requests.get(status_url, timeout=10)
-                status_data = status_resp.json()
-                current_status = status_data.get('status')
-                
-                print(f"   [{elapsed}s] Estado: {current_status}")
-                
-                if current_status == 'completed':
-                    print("\n✅ Tarea completada! Descargando resultados...\n")
-                    result_resp = requests.get(result_url, timeout=10)
-                    result_resp.raise_for_status()
-                    data = result_resp.json()
-                    
-                    if args.save:
-                        save_artifacts(data, save_screenshot=True)
-                    else:
-                        if data.get('processing_data', {}).get('screenshot'):
-                            data['processing_data']['screenshot'] = "[...Base64 omitido...]"
-                        if data.get('processing_data', {}).get('thumbnails'):
-                            data['processing_data']['thumbnails'] = f"[{len(data['processing_data']['thumbnails'])} thumbnails]"
-                        print(json.dumps(data, indent=2, ensure_ascii=False))
-                    
-                    print("\n¡Solicitud completada!")
-                    return
-                
-                elif current_status == 'failed':
-                    print(f"\n❌ La tarea falló.")
-                    return
-            
-            print(f"\n⏰ Timeout: La tarea no se completó en {max_wait} segundos.")
-            print(f"   Usa: python client.py --status {task_id}")
+                print("\n¡Solicitud completada!")
+            elif final_status == 'failed':
+                print(f"\n❌ La tarea falló: {(data or {}).get('error', 'error desconocido')}")
+            elif final_status == 'expired':
+                print("\n⌛ El resultado de la tarea ya no está disponible.")
+            else:
+                print(f"\n⏰ Timeout: La tarea no se completó en {max_wait} segundos.")
+                print(f"   Usa: python client.py --status {task_id}")
         
         except requests.RequestException as e:
             print(f"Error de conexión: {e}", file=sys.stderr)
@@ -232,7 +396,11 @@ Ejemplos de uso:
     print(f"   Modo: SÍNCRONO (transparencia total)\n")
     
     try:
-        response = requests.get(scrape_url, params={'url': args.url}, timeout=60)
+        params = {'url': args.url}
+        if args.components:
+            params['components'] = args.components
+        params.update(screenshot_params(args))
+        response = requests.get(scrape_url, params=params, timeout=60)
         response.raise_for_status()
         
         print("✅ Respuesta recibida (Status 200 OK). Procesando...")
@@ -242,7 +410,7 @@ Ejemplos de uso:
             save_artifacts(data, save_screenshot=True)
         else:
             if data.get('processing_data', {}).get('screenshot'):
-                data['processing_data']['screenshot'] = "[...Base64 omitido...]"
+                data['processing_data']['screenshot'] = omit_screenshot(data['processing_data']['screenshot'])
             if data.get('processing_data', {}).get('thumbnails'):
                 data['processing_data']['thumbnails'] = f"[{len(data['processing_data']['thumbnails'])} thumbnails]"
             print(json.dumps(data, indent=2, ensure_ascii=False))
@@ -0,0 +1,135 @@
+"""
+Módulo de Cache en memoria (SRP: Solo guarda y expira valores).
+
+TTLCache es un LRU acotado por cantidad de entradas y, opcionalmente, por
+bytes estimados. Cada entrada tiene su propio TTL; las vencidas se
+descartan al leerlas y las menos usadas se desalojan al superar los límites.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class TTLCache:
+    """LRU con TTL por entrada y límite de entradas y de bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 size_of: Optional[Callable[[Any], int]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of or (lambda value: 0)
+        self.clock = clock
+        # clave -> (valor, vencimiento, bytes estimados)
+        self._data: OrderedDict = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """Devuelve el valor si existe y no venció (y lo marca como recién usado)."""
+        item = self._data.get(key)
+        if item is None:
+            if count:
+                self.misses += 1
+            return None
+
+        value, expires_at, _ = item
+        if self.clock() >= expires_at:
+            self.pop(key)
+            if count:
+                self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: float):
+        """Guarda un valor por `ttl` segundos y desaloja lo necesario para respetar los límites."""
+        self.pop(key)
+        if self.max_entries <= 0:
+            return
+
+        size = self.size_of(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self._data[key] = (value, self.clock() + ttl, size)
+        self.total_bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self.total_bytes -= item[2]
+        return item[0]
+
+    def clear(self):
+        self._data.clear()
+        self.total_bytes = 0
+
+    def _evict(self):
+        """Desaloja primero lo vencido y después lo menos usado recientemente."""
+        now = self.clock()
+        over_limit = lambda: (len(self._data) > self.max_entries or
+                              (self.max_bytes is not None and self.total_bytes > self.max_bytes))
+        if not over_limit():
+            return
+
+        for key in [k for k, (_, expires_at, _) in self._data.items() if expires_at <= now]:
+            self.pop(key)
+            self.evictions += 1
+
+        while over_limit():
+            key = next(iter(self._data))
+            self.pop(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normaliza una URL para usarla como clave de cache: esquema y host en
+    minúsculas, sin puerto por defecto, sin fragmento, path vacío -> '/'
+    y parámetros de query ordenados.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ':' in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
@@ -0,0 +1,217 @@
+"""
+Módulo de Pool de Conexiones Multiplexadas (SRP: Solo maneja conexiones A -> B).
+
+Mantiene un conjunto de conexiones TCP de larga duración hacia el Servidor B.
+Cada conexión transporta muchas tareas en paralelo: cada request lleva un ID
+en el header del protocolo y la respuesta se despacha al Future que espera
+ese ID, por lo que las respuestas pueden llegar fuera de orden. El header
+también lleva el tiempo que le queda al request antes de que se abandone,
+para que el Servidor B no gaste procesos en respuestas que nadie va a leer.
+
+Se usan sockets no bloqueantes con loop.sock_* (en lugar de streams) para
+que las respuestas grandes se reciban directo en su buffer final.
+"""
+
+import asyncio
+import itertools
+import socket
+from typing import Dict, Any, List, Optional, Tuple
+
+from common.protocol import ProtocolHandler, ProtocolException, MAX_REQUEST_ID
+from common.serialization import CODEC_JSON
+from common.metrics import MetricsRegistry
+from common import ProtocolError
+
+
+async def open_socket(host: str, port: int) -> socket.socket:
+    """Conecta un socket TCP no bloqueante probando cada dirección que resuelve getaddrinfo."""
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    last_error: Optional[OSError] = None
+
+    for family, socktype, proto, _, address in infos:
+        sock = socket.socket(family, socktype, proto)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, address)
+        except OSError as e:
+            sock.close()
+            last_error = e
+            continue
+        except BaseException:
+            sock.close()
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    raise last_error or OSError(f"No se pudo resolver {host}:{port}")
+
+
+def _consume_exception(task: asyncio.Task):
+    """Marca como leída la excepción de un envío cuyo request ya se canceló."""
+    if not task.cancelled():
+        task.exception()
+
+
+class MultiplexedConnection:
+    """Una conexión TCP hacia el Servidor B compartida por varias tareas."""
+
+    def __init__(self, host: str, port: int, proto: ProtocolHandler):
+        self.host = host
+        self.port = port
+        self.proto = proto
+        self.sock: Optional[socket.socket] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._send_lock = asyncio.Lock()
+        self._reader_task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.pending)
+
+    @property
+    def is_alive(self) -> bool:
+        return not self.closed and self.sock is not None
+
+    async def connect(self, timeout: float):
+        """Abre el socket y lanza la tarea lectora que despacha respuestas."""
+        self.sock = await asyncio.wait_for(open_socket(self.host, self.port), timeout=timeout)
+        self._reader_task = asyncio.create_task(self._reader_loop())
+
+    def _next_id(self) -> int:
+        request_id = next(self._ids)
+        if request_id > MAX_REQUEST_ID:
+            self._ids = itertools.count(1)
+            request_id = next(self._ids)
+        return request_id
+
+    async def request(self, msg_type: int, payload: Dict[str, Any], timeout: float) -> Tuple[int, Dict[str, Any]]:
+        """Envía una tarea y espera SU respuesta (identificada por request_id)."""
+        if not self.is_alive:
+            raise ProtocolError("Conexión con Servidor B cerrada")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        request_id = self._next_id()
+        future = loop.create_future()
+        self.pending[request_id] = future
+
+        try:
+            # El envío corre en su propia tarea: si este request se cancela a mitad
+            # del frame, el frame igual se termina de escribir y el socket compartido
+            # no queda desincronizado para los demás requests en vuelo.
+            send = asyncio.create_task(self._send(msg_type, payload, request_id, deadline))
+            send.add_done_callback(_consume_exception)
+            await asyncio.shield(send)
+            return await asyncio.wait_for(future, timeout=max(0.0, deadline - loop.time()))
+        except ProtocolException as e:
+            raise ProtocolError(f"Error enviando a Servidor B: {e}") from e
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _send(self, msg_type: int, payload: Dict[str, Any], request_id: int, deadline: float):
+        """Escribe un frame completo con el lock de envío tomado."""
+        async with self._send_lock:
+            if request_id not in self.pending or not self.is_alive:
+                return  # se canceló (o cayó la conexión) antes de llegar a enviarse
+            # El Servidor B recibe cuánto falta para que este request se abandone
+            remaining_ms = (deadline - asyncio.get_running_loop().time()) * 1000
+            try:
+                await self.proto.async_sock_send_message(self.sock, msg_type, payload, request_id,
+                                                         deadline_ms=remaining_ms)
+            except ProtocolException as e:
+                self._fail_all(ProtocolError(f"Error enviando a Servidor B: {e}"))
+                raise
+
+    async def _reader_loop(self):
+        """Lee respuestas continuamente y resuelve el Future de cada request_id."""
+        error = ProtocolError("Conexión con Servidor B cerrada")
+        try:
+            while True:
+                frame = await self.proto.async_sock_read_frame(self.sock)
+                future = self.pending.pop(frame.request_id, None)
+                if future and not future.done():
+                    future.set_result((frame.msg_type, frame.payload))
+        except (ProtocolException, OSError) as e:
+            print(f"[ConnectionPool] Conexión con Servidor B perdida: {e}")
+            error = ProtocolError(f"Conexión con Servidor B perdida: {e}")
+        except Exception as e:
+            # Un frame que no se pudo decodificar deja el stream en un estado desconocido
+            print(f"[ConnectionPool] Error inesperado leyendo del Servidor B: {e!r}")
+            error = ProtocolError(f"Respuesta inválida del Servidor B: {e}")
+        finally:
+            # Pase lo que pase, nadie queda esperando una respuesta que no va a llegar
+            self._fail_all(error)
+            if self.sock:
+                self.sock.close()
+
+    def _fail_all(self, exc: Exception):
+        """Despierta a todas las tareas que esperaban respuesta en esta conexión."""
+        self.closed = True
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self.pending.clear()
+
+    async def close(self):
+        self.closed = True
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self.sock:
+            self.sock.close()
+
+
+class ProcessingConnectionPool:
+    """
+    Pool de conexiones persistentes hacia el Servidor B.
+
+    Las conexiones se abren de forma perezosa y se reemplazan si se caen.
+    Cada tarea se envía por la conexión viva con menos requests en vuelo.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 2, connect_timeout: float = 10.0,
+                 codec: int = CODEC_JSON, metrics: Optional[MetricsRegistry] = None):
+        self.host = host
+        self.port = port
+        self.size = max(1, size)
+        self.connect_timeout = connect_timeout
+        self.proto = ProtocolHandler(codec, metrics)
+        self._slots: List[Optional[MultiplexedConnection]] = [None] * self.size
+        self._slot_locks = [asyncio.Lock() for _ in range(self.size)]
+
+    async def _get_connection(self, slot: int) -> MultiplexedConnection:
+        """Devuelve la conexión del slot, (re)conectando si hace falta."""
+        async with self._slot_locks[slot]:
+            conn = self._slots[slot]
+            if conn is None or not conn.is_alive:
+                conn = MultiplexedConnection(self.host, self.port, self.proto)
+                await conn.connect(self.connect_timeout)
+                self._slots[slot] = conn
+                print(f"[ConnectionPool] Conexión {slot} abierta con {self.host}:{self.port}")
+            return conn
+
+    def _pick_slot(self) -> int:
+        """Elige el slot con menos requests en vuelo (a igual carga, uno ya conectado)."""
+        def load(i: int) -> Tuple[int, int]:
+            conn = self._slots[i]
+            if conn is None or not conn.is_alive:
+                return (0, 1)
+            return (conn.in_flight, 0)
+        return min(range(self.size), key=load)
+
+    async def request(self, msg_type: int, payload: Dict[str, Any], timeout: float = 35.0) -> Tuple[int, Dict[str, Any]]:
+        """Envía una tarea al Servidor B y devuelve (tipo_respuesta, payload)."""
+        conn = await self._get_connection(self._pick_slot())
+        return await conn.request(msg_type, payload, timeout)
+
+    async def close(self):
+        for i, conn in enumerate(self._slots):
+            if conn:
+                await conn.close()
+            self._slots[i] = None
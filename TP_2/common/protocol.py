@@ -7,121 +7,281 @@ tal como se sugiere en los consejos del enunciado.
 Formato del Header:
 - 4 bytes: Longitud total del mensaje (Payload + Header) (Big Endian, 'I')
 - 1 byte:  Tipo de mensaje (Big Endian, 'B')
+- 1 byte:  Flags (Big Endian, 'B'). Bits 0-1: codec del payload
+           (0 = JSON, 1 = binario). El Servidor B responde con el mismo
+           codec que recibió, así el Servidor A negocia el formato.
+- 4 bytes: ID de request (Big Endian, 'I'). Permite multiplexar varias
+           tareas sobre una misma conexión: la respuesta lleva el mismo ID
+           que el request y puede llegar fuera de orden.
 Formato Total:
-[Header (5 bytes)] [Payload (N bytes)]
+[Header (10 bytes)] [Deadline (0 o 4 bytes)] [Payload (N bytes)]
+
+Si el bit 2 de los flags (FLAG_DEADLINE) está prendido, después del header
+vienen 4 bytes ('!I') con los milisegundos que le quedan al emisor antes de
+abandonar el request. Es un tiempo relativo (no un instante), así no depende
+de que los relojes de A y B estén sincronizados. La longitud total incluye
+esos 4 bytes.
+
+Lectura sin copias: se lee el header, se reserva un bytearray del largo
+anunciado y se llena con recv_into (sync) o loop.sock_recv_into (async),
+sin juntar chunks. El deserializador recibe ese buffer directamente.
+
+Con un MetricsRegistry, el handler mide cuánto tarda cada serialización y
+deserialización (histograma `protocol_codec_seconds`).
 """
 
 import struct
 import asyncio
 import socket
-from typing import Dict, Any, Tuple
+import time
+from typing import Dict, Any, NamedTuple, Optional, Tuple
 
-from common.serialization import serialize_data, deserialize_data
+from common.serialization import serialize_data, deserialize_data, CODEC_JSON, CODEC_NAMES, CODECS, Buffer
+from common.metrics import MetricsRegistry
+
+_CODEC_LABELS = {codec: name for name, codec in CODEC_NAMES.items()}
 
 # Tipos de Tareas (Request de A -> B)
 TASK_SCREENSHOT = 0x01
 TASK_PERFORMANCE = 0x02
 TASK_IMAGES = 0x03
+TASK_STATS = 0x04  # Estado de los carriles y workers del Servidor B (no usa el Pool)
+
+TASK_NAMES = {
+    TASK_SCREENSHOT: "screenshot",
+    TASK_PERFORMANCE: "performance",
+    TASK_IMAGES: "images",
+    TASK_STATS: "stats",
+}
 
 # Tipos de Respuesta (Response de B -> A)
 RESP_SUCCESS = 0x80
 RESP_ERROR = 0x81
 
-HEADER_FORMAT = "!IB"
+HEADER_FORMAT = "!IBBI"
 HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 
+DEADLINE_FORMAT = "!I"
+DEADLINE_SIZE = struct.calcsize(DEADLINE_FORMAT)
+
+MAX_REQUEST_ID = 0xFFFFFFFF
+MAX_DEADLINE_MS = 0xFFFFFFFF
+FLAG_CODEC_MASK = 0x03
+FLAG_DEADLINE = 0x04
+
 
 class ProtocolException(Exception):
     """Excepción custom para errores de protocolo (ej. desconexión)."""
     pass
 
 
+class Frame(NamedTuple):
+    """Mensaje ya decodificado, con los datos del header que importan."""
+    msg_type: int
+    request_id: int
+    payload: Dict[str, Any]
+    codec: int = CODEC_JSON
+    deadline_ms: Optional[int] = None  # ms que le quedaban al emisor al enviarlo
+
+
 class ProtocolHandler:
     """
     Abstracción para manejar el empaquetado y desempaquetado de mensajes.
     Contiene la lógica para la comunicación binaria eficiente.
     """
 
-    def pack_message(self, msg_type: int, payload: Dict[str, Any]) -> bytes:
-        """Empaqueta un mensaje completo."""
-        payload_bytes = serialize_data(payload)
-        total_len = HEADER_SIZE + len(payload_bytes)
-        
-        header = struct.pack(HEADER_FORMAT, total_len, msg_type)
-        return header + payload_bytes
+    def __init__(self, codec: int = CODEC_JSON, metrics: Optional[MetricsRegistry] = None):
+        if codec not in CODECS:
+            raise ValueError(f"Codec desconocido: {codec}")
+        self.codec = codec
+        self._codec_seconds = None
+        if metrics is not None:
+            self._codec_seconds = metrics.histogram(
+                "protocol_codec_seconds", "Tiempo de serialización/deserialización de payloads A<->B",
+                ("codec", "op")
+            )
+
+    def _serialize(self, payload: Dict[str, Any], codec: int) -> bytes:
+        if self._codec_seconds is None:
+            return serialize_data(payload, codec)
+        start = time.perf_counter()
+        data = serialize_data(payload, codec)
+        self._codec_seconds.observe(time.perf_counter() - start, codec=_CODEC_LABELS[codec], op="encode")
+        return data
+
+    def _deserialize(self, data: Buffer, codec: int) -> Dict[str, Any]:
+        if self._codec_seconds is None:
+            return deserialize_data(data, codec)
+        start = time.perf_counter()
+        payload = deserialize_data(data, codec)
+        self._codec_seconds.observe(time.perf_counter() - start, codec=_CODEC_LABELS[codec], op="decode")
+        return payload
+
+    def pack_message(self, msg_type: int, payload: Dict[str, Any], request_id: int = 0,
+                     codec: Optional[int] = None, deadline_ms: Optional[int] = None) -> bytes:
+        """
+        Empaqueta un mensaje completo (con el codec del handler si no se indica otro).
+        Con deadline_ms se agrega la extensión de deadline después del header.
+        """
+        codec = self.codec if codec is None else codec
+        payload_bytes = self._serialize(payload, codec)
+        flags = codec & FLAG_CODEC_MASK
+        extension = b""
+        if deadline_ms is not None:
+            flags |= FLAG_DEADLINE
+            extension = struct.pack(DEADLINE_FORMAT, max(0, min(int(deadline_ms), MAX_DEADLINE_MS)))
+        total_len = HEADER_SIZE + len(extension) + len(payload_bytes)
+
+        header = struct.pack(HEADER_FORMAT, total_len, msg_type, flags, request_id)
+        return header + extension + payload_bytes
+
+    def _unpack_header(self, header_data: Buffer) -> Tuple[int, int, int, int, bool]:
+        """Devuelve (largo_payload, tipo, codec, request_id, trae_deadline) validando el header."""
+        total_len, msg_type, flags, request_id = struct.unpack(HEADER_FORMAT, header_data)
+
+        has_deadline = bool(flags & FLAG_DEADLINE)
+        payload_len = total_len - HEADER_SIZE - (DEADLINE_SIZE if has_deadline else 0)
+        if payload_len < 0:
+            raise ProtocolException(f"Longitud de payload inválida: {payload_len}")
+
+        codec = flags & FLAG_CODEC_MASK
+        if codec not in CODECS:
+            raise ProtocolException(f"Codec desconocido en el header: {codec}")
+
+        return payload_len, msg_type, codec, request_id, has_deadline
+
+    @staticmethod
+    def _unpack_deadline(data: Buffer) -> int:
+        return struct.unpack(DEADLINE_FORMAT, data)[0]
 
     async def async_read_message(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any]]:
-        """Lee un mensaje completo de forma asíncrona."""
+        """Lee un mensaje completo de forma asíncrona (descarta el ID de request)."""
+        frame = await self.async_read_frame(reader)
+        return frame.msg_type, frame.payload
+
+    async def async_read_frame(self, reader: asyncio.StreamReader) -> Frame:
+        """Lee un mensaje completo de forma asíncrona, con los datos de su header."""
         try:
             header_data = await reader.readexactly(HEADER_SIZE)
         except (asyncio.IncompleteReadError, ConnectionResetError) as e:
             raise ProtocolException(f"Desconexión al leer header: {e}")
-            
-        total_len, msg_type = struct.unpack(HEADER_FORMAT, header_data)
-        
-        payload_len = total_len - HEADER_SIZE
-        if payload_len < 0:
-            raise ProtocolException(f"Longitud de payload inválida: {payload_len}")
-        
+
+        payload_len, msg_type, codec, request_id, has_deadline = self._unpack_header(header_data)
+
         try:
+            deadline_ms = None
+            if has_deadline:
+                deadline_ms = self._unpack_deadline(await reader.readexactly(DEADLINE_SIZE))
             payload_bytes = await reader.readexactly(payload_len)
         except (asyncio.IncompleteReadError, ConnectionResetError) as e:
             raise ProtocolException(f"Desconexión al leer payload: {e}")
-            
-        payload = deserialize_data(payload_bytes)
-        
-        return msg_type, payload
 
-    async def async_send_message(self, writer: asyncio.StreamWriter, msg_type: int, payload: Dict[str, Any]):
+        payload = self._deserialize(payload_bytes, codec)
+
+        return Frame(msg_type, request_id, payload, codec, deadline_ms)
+
+    async def async_send_message(self, writer: asyncio.StreamWriter, msg_type: int,
+                                 payload: Dict[str, Any], request_id: int = 0,
+                                 codec: Optional[int] = None, deadline_ms: Optional[int] = None):
         """Envía un mensaje completo de forma asíncrona."""
         try:
-            message = self.pack_message(msg_type, payload)
+            message = self.pack_message(msg_type, payload, request_id, codec, deadline_ms)
             writer.write(message)
             await writer.drain()
         except (ConnectionResetError, BrokenPipeError) as e:
             raise ProtocolException(f"Error al enviar mensaje (async): {e}")
 
+    async def async_sock_read_frame(self, sock: socket.socket) -> Frame:
+        """
+        Lee un mensaje completo de un socket no bloqueante con el event loop.
+        El payload se recibe directo en un bytearray del tamaño anunciado.
+        """
+        header_data = await self._async_recv_exactly(sock, HEADER_SIZE)
+        payload_len, msg_type, codec, request_id, has_deadline = self._unpack_header(header_data)
+
+        deadline_ms = None
+        if has_deadline:
+            deadline_ms = self._unpack_deadline(await self._async_recv_exactly(sock, DEADLINE_SIZE))
+
+        payload_buf = await self._async_recv_exactly(sock, payload_len)
+        payload = self._deserialize(payload_buf, codec)
+
+        return Frame(msg_type, request_id, payload, codec, deadline_ms)
+
+    async def async_sock_send_message(self, sock: socket.socket, msg_type: int,
+                                      payload: Dict[str, Any], request_id: int = 0,
+                                      codec: Optional[int] = None, deadline_ms: Optional[int] = None):
+        """Envía un mensaje completo por un socket no bloqueante con el event loop."""
+        try:
+            message = self.pack_message(msg_type, payload, request_id, codec, deadline_ms)
+            await asyncio.get_running_loop().sock_sendall(sock, message)
+        except (ConnectionResetError, BrokenPipeError, OSError) as e:
+            raise ProtocolException(f"Error al enviar mensaje (async): {e}")
+
+    async def _async_recv_exactly(self, sock: socket.socket, n_bytes: int) -> bytearray:
+        """Helper asíncrono: llena un bytearray de N bytes con sock_recv_into."""
+        loop = asyncio.get_running_loop()
+        buf = bytearray(n_bytes)
+        view = memoryview(buf)
+        bytes_recd = 0
+        while bytes_recd < n_bytes:
+            try:
+                n = await loop.sock_recv_into(sock, view[bytes_recd:])
+            except (ConnectionResetError, OSError) as e:
+                raise ProtocolException(f"Conexión reseteada por el peer: {e}")
+            if n == 0:
+                raise ProtocolException(f"Socket cerrado inesperadamente (recibidos {bytes_recd}/{n_bytes})")
+            bytes_recd += n
+        return buf
+
     def sync_read_message(self, sock: socket.socket) -> Tuple[int, Dict[str, Any]]:
-        """Lee un mensaje completo de forma síncrona (bloqueante)."""
+        """Lee un mensaje completo de forma síncrona (descarta el ID de request)."""
+        frame = self.sync_read_frame(sock)
+        return frame.msg_type, frame.payload
+
+    def sync_read_frame(self, sock: socket.socket) -> Frame:
+        """Lee un mensaje completo de forma síncrona (bloqueante), con los datos de su header."""
         header_data = self._recv_exactly(sock, HEADER_SIZE)
         if not header_data:
             raise ProtocolException("Cliente desconectado (header vacío)")
-            
-        total_len, msg_type = struct.unpack(HEADER_FORMAT, header_data)
-        
-        payload_len = total_len - HEADER_SIZE
-        if payload_len < 0:
-            raise ProtocolException(f"Longitud de payload inválida: {payload_len}")
-        
+
+        payload_len, msg_type, codec, request_id, has_deadline = self._unpack_header(header_data)
+
+        deadline_ms = None
+        if has_deadline:
+            deadline_ms = self._unpack_deadline(self._recv_exactly(sock, DEADLINE_SIZE))
+
         payload_bytes = self._recv_exactly(sock, payload_len)
         if not payload_bytes:
              raise ProtocolException("Cliente desconectado (payload vacío)")
-             
-        payload = deserialize_data(payload_bytes)
-        
-        return msg_type, payload
 
-    def sync_send_message(self, sock: socket.socket, msg_type: int, payload: Dict[str, Any]):
+        payload = self._deserialize(payload_bytes, codec)
+
+        return Frame(msg_type, request_id, payload, codec, deadline_ms)
+
+    def sync_send_message(self, sock: socket.socket, msg_type: int,
+                          payload: Dict[str, Any], request_id: int = 0,
+                          codec: Optional[int] = None, deadline_ms: Optional[int] = None):
         """Envía un mensaje completo de forma síncrona (bloqueante)."""
         try:
-            message = self.pack_message(msg_type, payload)
+            message = self.pack_message(msg_type, payload, request_id, codec, deadline_ms)
             sock.sendall(message)
         except (ConnectionResetError, BrokenPipeError) as e:
             raise ProtocolException(f"Error al enviar mensaje (sync): {e}")
 
-    def _recv_exactly(self, sock: socket.socket, n_bytes: int) -> bytes:
-        """Helper síncrono para recibir exactamente N bytes."""
-        chunks = []
+    def _recv_exactly(self, sock: socket.socket, n_bytes: int) -> bytearray:
+        """Helper síncrono para recibir exactamente N bytes en un buffer preasignado."""
+        buf = bytearray(n_bytes)
+        view = memoryview(buf)
         bytes_recd = 0
         while bytes_recd < n_bytes:
             try:
-                chunk = sock.recv(min(n_bytes - bytes_recd, 4096))
-                if chunk == b'':
+                n = sock.recv_into(view[bytes_recd:])
+                if n == 0:
                     raise ProtocolException("Socket cerrado inesperadamente")
-                chunks.append(chunk)
-                bytes_recd += len(chunk)
+                bytes_recd += n
             except socket.timeout:
                 raise ProtocolException(f"Timeout esperando datos (recibidos {bytes_recd}/{n_bytes})")
             except ConnectionResetError:
                  raise ProtocolException("Conexión reseteada por el peer")
-        return b''.join(chunks)
\ No newline at end of file
+        return buf
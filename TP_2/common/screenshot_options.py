@@ -0,0 +1,71 @@
+"""
+Módulo de Opciones de Screenshot (SRP: Solo valida y transporta las opciones de captura).
+
+Un pedido puede cambiar fidelidad por latencia:
+
+    mode     'full' (página completa, hasta MAX_FULL_HEIGHT px) o 'viewport'
+    width    ancho final en px; la imagen se reduce en el Servidor B
+    format   'png' (sin pérdida), 'jpeg' o 'webp'
+    quality  1-100, para jpeg y webp
+
+El Servidor A las lee de la query, el formulario o el JSON con prefijo
+`screenshot_` (ej. `screenshot_format=webp`) y las manda dentro del
+payload de TASK_SCREENSHOT sin prefijo.
+"""
+
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+CAPTURE_MODES = ("full", "viewport")
+FORMATS = ("png", "jpeg", "webp")
+FORMAT_ALIASES = {"jpg": "jpeg"}
+MAX_FULL_HEIGHT = 15000
+MIN_WIDTH = 16
+MAX_WIDTH = 4096
+DEFAULT_QUALITY = 80
+
+
+class ScreenshotOptions(NamedTuple):
+    mode: str = "full"
+    width: Optional[int] = None
+    format: str = "png"
+    quality: int = DEFAULT_QUALITY
+
+    def to_payload(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def _int_option(name: str, value: Any, low: int, high: int) -> int:
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return number
+
+
+def parse_screenshot_options(values: Mapping[str, Any], prefix: str = "screenshot_") -> Optional[ScreenshotOptions]:
+    """
+    Lee mode/width/format/quality (con `prefix`) de un mapping.
+    Devuelve None si no vino ninguna opción; lanza ValueError si alguna es inválida.
+    """
+    raw = {name: values.get(prefix + name) for name in ScreenshotOptions._fields}
+    raw = {name: value for name, value in raw.items() if value not in (None, "")}
+    if not raw:
+        return None
+
+    options = {}
+    if "mode" in raw:
+        options["mode"] = str(raw["mode"]).strip().lower()
+        if options["mode"] not in CAPTURE_MODES:
+            raise ValueError(f"{prefix}mode must be one of: {', '.join(CAPTURE_MODES)}")
+    if "format" in raw:
+        fmt = str(raw["format"]).strip().lower()
+        options["format"] = FORMAT_ALIASES.get(fmt, fmt)
+        if options["format"] not in FORMATS:
+            raise ValueError(f"{prefix}format must be one of: {', '.join(FORMATS)}")
+    if "width" in raw:
+        options["width"] = _int_option(f"{prefix}width", raw["width"], MIN_WIDTH, MAX_WIDTH)
+    if "quality" in raw:
+        options["quality"] = _int_option(f"{prefix}quality", raw["quality"], 1, 100)
+    return ScreenshotOptions(**options)
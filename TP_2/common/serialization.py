@@ -1,13 +1,50 @@
 """
 Módulo de Serialización (SRP)
 Maneja la serialización y deserialización de datos para comunicación.
+
+Hay dos codecs, elegidos por un flag en el header del protocolo:
+- CODEC_JSON:   JSON UTF-8 (fallback, legible, no admite bytes).
+- CODEC_BINARY: formato binario con tags de tipo. Los campos `bytes`
+                (screenshots, thumbnails) viajan crudos, sin base64.
+
+Formato binario (todos los enteros en Big Endian):
+    'N' None | 'T' True | 'F' False
+    'i' int64 | 'L' entero grande (u32 len + dígitos ASCII) | 'd' float64
+    's' str   (u32 len + UTF-8) | 'b' bytes (u32 len + datos crudos)
+    'l' lista (u32 n + n valores) | 'm' dict (u32 n + n pares clave/valor)
 """
 
+import base64
 import json
-from typing import Dict, Any
+import struct
+from typing import Dict, Any, List, Tuple, Union
+
+CODEC_JSON = 0
+CODEC_BINARY = 1
+CODECS = (CODEC_JSON, CODEC_BINARY)
+CODEC_NAMES = {"json": CODEC_JSON, "binary": CODEC_BINARY}
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+_U32 = struct.Struct("!I")
+_I64 = struct.Struct("!q")
+_F64 = struct.Struct("!d")
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
 
-def serialize_data(data: Dict[str, Any]) -> bytes:
-    """Serializa un diccionario a bytes (JSON UTF-8)."""
+
+class BinaryCodecError(ValueError):
+    """Error al codificar/decodificar el formato binario."""
+    pass
+
+
+def serialize_data(data: Dict[str, Any], codec: int = CODEC_JSON) -> bytes:
+    """Serializa un diccionario a bytes con el codec indicado (default: JSON UTF-8)."""
+    if codec == CODEC_BINARY:
+        try:
+            return binary_dumps(data)
+        except BinaryCodecError as e:
+            print(f"Error de serialización binaria: {e}. Objeto: {str(data)[:200]}")
+            return binary_dumps({"serialization_error": str(e), "original_data_snippet": str(data)[:200]})
     try:
         return json.dumps(data, ensure_ascii=False).encode('utf-8')
     except TypeError as e:
@@ -15,10 +52,131 @@ def serialize_data(data: Dict[str, Any]) -> bytes:
         error_data = {"serialization_error": str(e), "original_data_snippet": str(data)[:200]}
         return json.dumps(error_data, ensure_ascii=False).encode('utf-8')
 
-def deserialize_data(byte_data: bytes) -> Dict[str, Any]:
-    """Deserializa bytes (JSON UTF-8) a un diccionario."""
+def deserialize_data(byte_data: Buffer, codec: int = CODEC_JSON) -> Dict[str, Any]:
+    """Deserializa bytes a un diccionario con el codec indicado (default: JSON UTF-8)."""
+    if codec == CODEC_BINARY:
+        try:
+            return binary_loads(byte_data)
+        except BinaryCodecError as e:
+            print(f"Error de deserialización binaria: {e}. Data: {bytes(byte_data[:200])}")
+            return {"deserialization_error": str(e), "raw_data_snippet": repr(bytes(byte_data[:200]))}
     try:
-        return json.loads(byte_data.decode('utf-8'))
+        if isinstance(byte_data, memoryview):
+            return json.loads(str(byte_data, 'utf-8'))
+        # json.loads acepta bytes y bytearray sin copia previa
+        return json.loads(byte_data)
     except (json.JSONDecodeError, UnicodeDecodeError) as e:
-        print(f"Error de deserialización: {e}. Data: {byte_data[:200]}")
-        return {"deserialization_error": str(e), "raw_data_snippet": repr(byte_data[:200])}
\ No newline at end of file
+        print(f"Error de deserialización: {e}. Data: {bytes(byte_data[:200])}")
+        return {"deserialization_error": str(e), "raw_data_snippet": repr(bytes(byte_data[:200]))}
+
+
+def bytes_to_base64(value: Any) -> Any:
+    """Recorre un valor y convierte los bytes a str base64 (para responder en JSON)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode('utf-8')
+    if isinstance(value, dict):
+        return {key: bytes_to_base64(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [bytes_to_base64(item) for item in value]
+    return value
+
+
+# --- Codec binario ---
+
+def binary_dumps(data: Any) -> bytes:
+    """Codifica un valor (dict, list, str, bytes, números, bool, None) al formato binario."""
+    parts: List[bytes] = []
+    _encode(data, parts)
+    return b''.join(parts)
+
+def _encode(value: Any, parts: List[bytes]):
+    if value is None:
+        parts.append(b'N')
+    elif value is True:
+        parts.append(b'T')
+    elif value is False:
+        parts.append(b'F')
+    elif isinstance(value, int):
+        if _INT64_MIN <= value <= _INT64_MAX:
+            parts.append(b'i' + _I64.pack(value))
+        else:
+            digits = str(value).encode('ascii')
+            parts.append(b'L' + _U32.pack(len(digits)))
+            parts.append(digits)
+    elif isinstance(value, float):
+        parts.append(b'd' + _F64.pack(value))
+    elif isinstance(value, str):
+        raw = value.encode('utf-8')
+        parts.append(b's' + _U32.pack(len(raw)))
+        parts.append(raw)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        parts.append(b'b' + _U32.pack(len(value)))
+        parts.append(bytes(value))
+    elif isinstance(value, (list, tuple)):
+        parts.append(b'l' + _U32.pack(len(value)))
+        for item in value:
+            _encode(item, parts)
+    elif isinstance(value, dict):
+        parts.append(b'm' + _U32.pack(len(value)))
+        for key, item in value.items():
+            _encode(key, parts)
+            _encode(item, parts)
+    else:
+        raise BinaryCodecError(f"Tipo no serializable: {type(value).__name__}")
+
+def binary_loads(byte_data: Buffer) -> Any:
+    """Decodifica el formato binario. Acepta bytes, bytearray o memoryview."""
+    view = memoryview(byte_data)
+    try:
+        value, offset = _decode(view, 0)
+    except BinaryCodecError:
+        raise
+    except (struct.error, IndexError, UnicodeDecodeError, TypeError, ValueError, RecursionError) as e:
+        # TypeError: clave de map no hasheable; ValueError: entero 'L' inválido
+        raise BinaryCodecError(f"Datos binarios truncados o inválidos: {e}") from e
+    if offset != len(view):
+        raise BinaryCodecError(f"Sobran {len(view) - offset} bytes al final del mensaje")
+    return value
+
+def _decode(view: memoryview, offset: int) -> Tuple[Any, int]:
+    tag = view[offset:offset + 1].tobytes()
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    if tag == b'T':
+        return True, offset
+    if tag == b'F':
+        return False, offset
+    if tag == b'i':
+        return _I64.unpack_from(view, offset)[0], offset + _I64.size
+    if tag == b'd':
+        return _F64.unpack_from(view, offset)[0], offset + _F64.size
+    if tag in (b's', b'b', b'L'):
+        length = _U32.unpack_from(view, offset)[0]
+        offset += _U32.size
+        end = offset + length
+        if end > len(view):
+            raise BinaryCodecError("Longitud de campo fuera del mensaje")
+        chunk = view[offset:end]
+        if tag == b's':
+            return str(chunk, 'utf-8'), end
+        if tag == b'L':
+            return int(chunk.tobytes()), end
+        return chunk.tobytes(), end
+    if tag == b'l':
+        count = _U32.unpack_from(view, offset)[0]
+        offset += _U32.size
+        items = []
+        for _ in range(count):
+            item, offset = _decode(view, offset)
+            items.append(item)
+        return items, offset
+    if tag == b'm':
+        count = _U32.unpack_from(view, offset)[0]
+        offset += _U32.size
+        result = {}
+        for _ in range(count):
+            key, offset = _decode(view, offset)
+            result[key], offset = _decode(view, offset)
+        return result, offset
+    raise BinaryCodecError(f"Tag desconocido: {tag!r}")
@@ -0,0 +1,66 @@
+"""
+Módulo de Avisos de Tareas (SRP: Solo despierta a quienes esperan una tarea).
+
+Cada tarea de /scrape/async tiene un asyncio.Event que se dispara cuando
+cambia de estado, así el long-polling de /status y /result y el stream SSE
+responden en el instante en que la tarea termina, sin sondear.
+
+Uso (el evento se toma ANTES de leer el estado, así no se pierde un aviso
+que llegue mientras se lee):
+
+    with task_events.listen(task_id) as next_change:
+        while True:
+            changed = next_change()
+            task = await task_store.get(task_id)
+            if terminó: break
+            await asyncio.wait_for(changed.wait(), timeout)
+
+`notify` dispara el evento actual y lo descarta: la próxima espera usa uno
+nuevo. Los avisos son por proceso; con varios workers, una tarea terminada
+en otro worker se ve al releer el estado (ver TASK_RECHECK_INTERVAL).
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+# Cada cuánto se relee el estado aunque no llegue un aviso (tareas de otro worker)
+TASK_RECHECK_INTERVAL = 1.0
+
+
+class TaskEvents:
+    """Eventos de cambio de estado por tarea, creados sólo mientras alguien espera."""
+
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._listeners: Dict[str, int] = {}
+        self.notified = 0
+
+    def _event(self, task_id: str) -> asyncio.Event:
+        event = self._events.get(task_id)
+        if event is None:
+            event = self._events[task_id] = asyncio.Event()
+        return event
+
+    @contextmanager
+    def listen(self, task_id: str) -> Iterator[Callable[[], asyncio.Event]]:
+        """Registra un oyente; devuelve una función que da el evento del próximo cambio."""
+        self._listeners[task_id] = self._listeners.get(task_id, 0) + 1
+        try:
+            yield lambda: self._event(task_id)
+        finally:
+            self._listeners[task_id] -= 1
+            if not self._listeners[task_id]:
+                del self._listeners[task_id]
+                self._events.pop(task_id, None)
+
+    def notify(self, task_id: str):
+        """Despierta a todos los que esperan un cambio de la tarea."""
+        event = self._events.pop(task_id, None)
+        if event is not None:
+            self.notified += 1
+            event.set()
+
+    @property
+    def listeners(self) -> int:
+        return sum(self._listeners.values())
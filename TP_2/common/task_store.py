@@ -0,0 +1,361 @@
+"""
+Módulo de Almacenamiento de Tareas (SRP: Solo guarda el estado y el resultado
+de las tareas de /scrape/async).
+
+Los resultados se guardan ya serializados a JSON (bytes), así se mide su
+tamaño real y /result los devuelve sin volver a serializar.
+
+Dos backends con la misma interfaz asíncrona:
+- MemoryTaskStore: en RAM, con presupuesto de bytes para los resultados.
+  Al superarlo se descartan los resultados terminados más viejos (la tarea
+  pasa a 'expired').
+- SQLiteTaskStore: persistente. El estado vive en SQLite y los resultados
+  grandes (screenshots en base64) se escriben a archivos aparte, así no
+  quedan en RAM y sobreviven reinicios. Varios procesos pueden compartir la
+  misma base: cada uno firma sus tareas con un `owner` y, al reiniciar,
+  marca como 'failed' sólo las que había dejado en curso.
+
+Ambos purgan las tareas terminadas más viejas que `ttl` o que excedan
+`max_tasks`.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+STATUS_PENDING = 'pending'
+STATUS_SCRAPING = 'scraping'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_EXPIRED = 'expired'
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_EXPIRED)
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    return json.dumps(result, ensure_ascii=False).encode('utf-8')
+
+
+class TaskStore(ABC):
+    """Interfaz común de los backends de tareas (un backend incompleto falla al instanciarse)."""
+
+    @abstractmethod
+    async def create(self, task_id: str, url: str):
+        ...
+
+    @abstractmethod
+    async def set_status(self, task_id: str, status: str):
+        ...
+
+    @abstractmethod
+    async def finish(self, task_id: str, status: str, result: Dict[str, Any]):
+        """Marca la tarea como 'completed' o 'failed' y guarda su resultado."""
+
+    @abstractmethod
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve {'task_id', 'url', 'status', 'created_at', 'updated_at'} o None."""
+
+    @abstractmethod
+    async def get_result(self, task_id: str) -> Optional[bytes]:
+        """Devuelve el resultado serializado (JSON UTF-8) o None si no hay."""
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        ...
+
+    async def close(self):
+        pass
+
+
+class MemoryTaskStore(TaskStore):
+    """Backend en memoria con presupuesto de bytes para los resultados."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_tasks: int = 10000,
+                 ttl: float = 3600.0, purge_every: int = 100,
+                 clock: Callable[[], float] = time.time):
+        self.max_bytes = max_bytes
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self.clock = clock
+        self._creates = 0
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._results: "OrderedDict[str, bytes]" = OrderedDict()
+        self.result_bytes = 0
+        self.evicted_results = 0
+        self.purged_tasks = 0
+
+    async def create(self, task_id: str, url: str):
+        now = self.clock()
+        self._tasks[task_id] = {
+            'task_id': task_id, 'url': url, 'status': STATUS_PENDING,
+            'created_at': now, 'updated_at': now
+        }
+        self._creates += 1
+        if len(self._tasks) > self.max_tasks or self._creates % self.purge_every == 0:
+            self._purge()
+
+    async def set_status(self, task_id: str, status: str):
+        task = self._tasks.get(task_id)
+        if task is not None:
+            task['status'] = status
+            task['updated_at'] = self.clock()
+
+    async def finish(self, task_id: str, status: str, result: Dict[str, Any]):
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        task['status'] = status
+        task['updated_at'] = self.clock()
+
+        data = encode_result(result)
+        if len(data) > self.max_bytes:
+            task['status'] = STATUS_EXPIRED
+            self.evicted_results += 1
+            return
+        self._results[task_id] = data
+        self.result_bytes += len(data)
+        self._evict_results()
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        task = self._tasks.get(task_id)
+        return dict(task) if task is not None else None
+
+    async def get_result(self, task_id: str) -> Optional[bytes]:
+        return self._results.get(task_id)
+
+    def _drop_result(self, task_id: str) -> bool:
+        data = self._results.pop(task_id, None)
+        if data is None:
+            return False
+        self.result_bytes -= len(data)
+        return True
+
+    def _evict_results(self):
+        """Descarta los resultados más viejos hasta entrar en el presupuesto."""
+        while self.result_bytes > self.max_bytes and self._results:
+            task_id = next(iter(self._results))
+            self._drop_result(task_id)
+            self._tasks[task_id]['status'] = STATUS_EXPIRED
+            self.evicted_results += 1
+
+    def _purge(self):
+        """Olvida las tareas terminadas vencidas y las más viejas si sobran."""
+        cutoff = self.clock() - self.ttl
+        excess = len(self._tasks) - self.max_tasks
+        for task_id in list(self._tasks):
+            task = self._tasks[task_id]
+            if task['status'] not in FINISHED_STATUSES:
+                continue
+            if excess <= 0 and task['updated_at'] >= cutoff:
+                continue
+            del self._tasks[task_id]
+            self._drop_result(task_id)
+            self.purged_tasks += 1
+            excess -= 1
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': 'memory',
+            'tasks': len(self._tasks),
+            'results': len(self._results),
+            'result_bytes': self.result_bytes,
+            'evicted_results': self.evicted_results,
+            'purged_tasks': self.purged_tasks,
+        }
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Backend persistente: estado en SQLite, resultados grandes en archivos.
+
+    Todas las operaciones de disco corren en un único hilo, así el event loop
+    no se bloquea y la conexión SQLite se usa siempre desde el mismo hilo.
+    La base usa WAL, por lo que varios procesos pueden compartirla.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id     TEXT PRIMARY KEY,
+            url         TEXT NOT NULL,
+            status      TEXT NOT NULL,
+            created_at  REAL NOT NULL,
+            updated_at  REAL NOT NULL,
+            result      BLOB,
+            result_path TEXT,
+            result_size INTEGER NOT NULL DEFAULT 0,
+            owner       TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (status, updated_at);
+    """
+
+    def __init__(self, path: str, blob_dir: Optional[str] = None,
+                 spill_threshold: int = 64 * 1024, max_tasks: int = 10000,
+                 ttl: float = 3600.0, purge_every: int = 100, owner: str = "w0",
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.owner = owner
+        self.blob_dir = blob_dir or f"{path}.blobs"
+        self.spill_threshold = spill_threshold
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self.clock = clock
+        self._writes = 0
+        self.purged_tasks = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(tasks)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE tasks ADD COLUMN owner TEXT")
+        self._recover()
+
+    def _recover(self):
+        """Las tareas que este owner dejó a medias al morir no van a terminar nunca."""
+        result = encode_result({'error': 'Tarea interrumpida por un reinicio del servidor', 'status': STATUS_FAILED})
+        cursor = self._db.execute(
+            "UPDATE tasks SET status = ?, result = ?, result_size = ?, updated_at = ? "
+            "WHERE status IN (?, ?) AND (owner = ? OR owner IS NULL)",
+            (STATUS_FAILED, result, len(result), self.clock(), STATUS_PENDING, STATUS_SCRAPING, self.owner)
+        )
+        if cursor.rowcount:
+            print(f"[TaskStore] {cursor.rowcount} tareas interrumpidas marcadas como fallidas.")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def create(self, task_id: str, url: str):
+        await self._run(self._create, task_id, url)
+
+    def _create(self, task_id: str, url: str):
+        now = self.clock()
+        self._db.execute(
+            "INSERT OR REPLACE INTO tasks (task_id, url, status, created_at, updated_at, owner) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (task_id, url, STATUS_PENDING, now, now, self.owner)
+        )
+
+    async def set_status(self, task_id: str, status: str):
+        await self._run(self._set_status, task_id, status)
+
+    def _set_status(self, task_id: str, status: str):
+        self._db.execute(
+            "UPDATE tasks SET status = ?, updated_at = ? WHERE task_id = ?",
+            (status, self.clock(), task_id)
+        )
+
+    async def finish(self, task_id: str, status: str, result: Dict[str, Any]):
+        await self._run(self._finish, task_id, status, result)
+
+    def _finish(self, task_id: str, status: str, result: Dict[str, Any]):
+        data = encode_result(result)
+        inline, path = data, None
+        if len(data) > self.spill_threshold:
+            path = os.path.join(self.blob_dir, f"{task_id}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            inline = None
+
+        self._db.execute(
+            "UPDATE tasks SET status = ?, updated_at = ?, result = ?, result_path = ?, result_size = ? "
+            "WHERE task_id = ?",
+            (status, self.clock(), inline, path, len(data), task_id)
+        )
+
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._purge()
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, task_id)
+
+    def _get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT task_id, url, status, created_at, updated_at FROM tasks WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('task_id', 'url', 'status', 'created_at', 'updated_at'), row))
+
+    async def get_result(self, task_id: str) -> Optional[bytes]:
+        return await self._run(self._get_result, task_id)
+
+    def _get_result(self, task_id: str) -> Optional[bytes]:
+        row = self._db.execute(
+            "SELECT result, result_path FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        inline, path = row
+        if path is None:
+            return inline
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            self._db.execute(
+                "UPDATE tasks SET status = ?, result_path = NULL WHERE task_id = ?",
+                (STATUS_EXPIRED, task_id)
+            )
+            return None
+
+    def _purge(self):
+        """Borra (fila y archivo) las tareas terminadas vencidas y las que excedan max_tasks."""
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        rows = self._db.execute(
+            f"SELECT task_id, result_path FROM tasks WHERE status IN ({placeholders}) AND updated_at < ?",
+            (*FINISHED_STATUSES, self.clock() - self.ttl)
+        ).fetchall()
+
+        (total,) = self._db.execute("SELECT COUNT(*) FROM tasks").fetchone()
+        excess = total - len(rows) - self.max_tasks
+        if excess > 0:
+            rows += self._db.execute(
+                f"SELECT task_id, result_path FROM tasks WHERE status IN ({placeholders}) "
+                f"AND updated_at >= ? ORDER BY updated_at LIMIT ?",
+                (*FINISHED_STATUSES, self.clock() - self.ttl, excess)
+            ).fetchall()
+
+        for task_id, path in rows:
+            if path:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        self._db.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id, _ in rows])
+        self.purged_tasks += len(rows)
+
+    async def stats(self) -> Dict[str, Any]:
+        return await self._run(self._stats)
+
+    def _stats(self) -> Dict[str, Any]:
+        counts = dict(self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        (spilled, spilled_bytes) = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(result_size), 0) FROM tasks WHERE result_path IS NOT NULL"
+        ).fetchone()
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'tasks': sum(counts.values()),
+            'by_status': counts,
+            'spilled_results': spilled,
+            'spilled_bytes': spilled_bytes,
+            'purged_tasks': self.purged_tasks,
+        }
+
+    async def close(self):
+        await self._run(self._db.close)
+        self._executor.shutdown(wait=True)
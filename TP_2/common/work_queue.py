@@ -0,0 +1,161 @@
+"""
+Módulo de Cola de Trabajo (SRP: Solo admite y reparte trabajos en segundo plano).
+
+Cola acotada con un número fijo de workers asyncio y un tope de trabajos
+simultáneos por host. Si la cola está llena, `submit` rechaza el trabajo y
+`retry_after()` estima en cuántos segundos conviene reintentar.
+
+Los trabajos cuyo host ya está en su tope no ocupan un worker esperando:
+quedan diferidos en una lista por host y los toma el worker que libera un
+lugar para ese host.
+
+Con un MetricsRegistry, la espera en cola y el tiempo de servicio de cada
+trabajo se registran como histogramas.
+"""
+
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from common.metrics import MetricsRegistry
+
+Job = Tuple[Any, ...]  # (task_id, url, *argumentos extra para el handler)
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+class BoundedWorkQueue:
+    """Cola acotada con N workers y límite de concurrencia por host."""
+
+    def __init__(self, handler: Callable[..., Awaitable[Any]], max_size: int = 1000,
+                 workers: int = 16, per_host: int = 4, metrics: Optional[MetricsRegistry] = None):
+        self.handler = handler
+        self.max_size = max_size
+        self.workers = workers
+        self.per_host = per_host
+        self._queue: "asyncio.Queue[Tuple[Job, float]]" = asyncio.Queue()
+        self._deferred: Dict[str, Deque[Tuple[Job, float]]] = defaultdict(deque)
+        self._deferred_count = 0
+        self._active_per_host: Dict[str, int] = defaultdict(int)
+        self._worker_tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.wait_avg = 0.0
+        self.wait_max = 0.0
+        self.service_avg = 0.0
+        self._wait_seconds = self._service_seconds = None
+        if metrics is not None:
+            self._wait_seconds = metrics.histogram("work_queue_wait_seconds", "Espera en la cola de /scrape/async")
+            self._service_seconds = metrics.histogram("work_queue_service_seconds", "Duración de cada trabajo de la cola")
+
+    @property
+    def depth(self) -> int:
+        """Trabajos esperando (en la cola o diferidos por su host)."""
+        return self._queue.qsize() + self._deferred_count
+
+    def full(self) -> bool:
+        return self.depth >= self.max_size
+
+    def start(self):
+        for i in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(), name=f"work-queue-{i}"))
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def reject(self):
+        """Cuenta un trabajo descartado sin intentar encolarlo (el llamador ya vio la cola llena)."""
+        self.dropped += 1
+
+    def submit(self, task_id: str, url: str, *extra: Any) -> bool:
+        """Encola un trabajo. Devuelve False (y cuenta un descarte) si la cola está llena."""
+        if self.full():
+            self.reject()
+            return False
+        self._queue.put_nowait(((task_id, url, *extra), time.monotonic()))
+        self.submitted += 1
+        return True
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se libere lugar en la cola (entre 1 y 60)."""
+        service = self.service_avg or 1.0
+        estimate = (self.depth - self.max_size + 1) * service / max(self.workers, 1)
+        return max(1, min(60, math.ceil(estimate)))
+
+    async def _worker(self):
+        while True:
+            job, enqueued_at = await self._queue.get()
+            host = host_of(job[1])
+            if self._active_per_host[host] >= self.per_host:
+                self._deferred[host].append((job, enqueued_at))
+                self._deferred_count += 1
+                continue
+
+            # Mientras haya trabajos diferidos del mismo host, este worker los sigue
+            self._active_per_host[host] += 1
+            try:
+                while job is not None:
+                    await self._run(job, enqueued_at)
+                    job, enqueued_at = self._next_deferred(host)
+            finally:
+                self._active_per_host[host] -= 1
+                if not self._active_per_host[host]:
+                    del self._active_per_host[host]
+
+    def _next_deferred(self, host: str) -> Tuple[Optional[Job], float]:
+        pending = self._deferred.get(host)
+        if not pending:
+            self._deferred.pop(host, None)
+            return None, 0.0
+        self._deferred_count -= 1
+        return pending.popleft()
+
+    async def _run(self, job: Job, enqueued_at: float):
+        started = time.monotonic()
+        wait = started - enqueued_at
+        self.wait_avg = wait if not self.completed else 0.9 * self.wait_avg + 0.1 * wait
+        self.wait_max = max(self.wait_max, wait)
+        if self._wait_seconds is not None:
+            self._wait_seconds.observe(wait)
+
+        self.busy += 1
+        try:
+            await self.handler(*job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[WorkQueue] Error no manejado en el trabajo {job[0]}: {e}")
+        finally:
+            self.busy -= 1
+            service = time.monotonic() - started
+            self.service_avg = service if not self.completed else 0.9 * self.service_avg + 0.1 * service
+            if self._service_seconds is not None:
+                self._service_seconds.observe(service)
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "deferred": self._deferred_count,
+            "max_size": self.max_size,
+            "workers": self.workers,
+            "busy": self.busy,
+            "per_host": self.per_host,
+            "active_hosts": dict(self._active_per_host),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "wait_avg_s": round(self.wait_avg, 3),
+            "wait_max_s": round(self.wait_max, 3),
+            "service_avg_s": round(self.service_avg, 3),
+        }
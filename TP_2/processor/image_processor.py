@@ -1,53 +1,183 @@
 """
 Módulo de Procesamiento de Imágenes (SRP: Solo maneja imágenes).
 Descarga y crea thumbnails.
+
+Las descargas corren en paralelo (un hilo por imagen) sobre una sesión HTTP
+keep-alive compartida por el proceso. Cada imagen tiene su propio deadline y
+la tarea completa uno global; el thumbnail de cada imagen se genera apenas
+llega, así la tarea cuesta lo que la imagen más lenta y no la suma de todas.
+
+Con `configure_cache` los thumbnails terminados se guardan en una cache en
+disco compartida por los procesos (ver thumbnail_cache): una imagen
+repetida cuesta una lectura de archivo o, si venció, un GET condicional.
 """
 
 import requests
 import base64
 import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from PIL import Image, ImageFile
-from typing import List
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple, Union
+
+from processor.thumbnail_cache import ThumbnailCache, content_hash
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
-def process_images(image_urls: List[str]) -> List[str]:
+MAX_IMAGES = 5
+PER_IMAGE_TIMEOUT = 10.0
+TOTAL_TIMEOUT = 15.0
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36',
+    'Accept': 'image/*'
+}
+
+_session: Optional[requests.Session] = None
+_cache: Optional[ThumbnailCache] = None
+
+
+def configure_cache(directory: Optional[str], max_bytes: int):
+    """Activa la cache de thumbnails del proceso (initializer del Pool); sin directorio la desactiva."""
+    global _cache
+    _cache = ThumbnailCache(directory, max_bytes) if directory and max_bytes > 0 else None
+
+
+def _get_session() -> requests.Session:
+    """Sesión HTTP del proceso: reutiliza conexiones entre tareas y entre hilos."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=MAX_IMAGES * 2, pool_maxsize=MAX_IMAGES)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def _download(url: str, deadline: float,
+              headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[bytes], Dict[str, Optional[str]]]:
     """
-    Descarga imágenes (máximo 5) y genera thumbnails.
+    Descarga una imagen por chunks, abortando si se pasa de su deadline.
+    Devuelve (bytes, validadores); bytes es None si el servidor respondió 304.
     """
-    thumbnails = []
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36',
-        'Accept': 'image/*'
-    }
-    
-    for url in image_urls[:5]: 
-        try:
-            response = requests.get(url, headers=headers, timeout=10) 
-            response.raise_for_status()
-            
-            img_data = response.content
-            if not img_data:
-                continue
-
-            img = Image.open(io.BytesIO(img_data))
-            
-            if img.mode not in ('RGB', 'L'): 
-                img = img.convert('RGB')
-                
-            img.thumbnail((150, 150)) 
-            
-            out_buf = io.BytesIO()
-            img.save(out_buf, format='JPEG', quality=85) 
-            
-            b64_str = base64.b64encode(out_buf.getvalue()).decode('utf-8')
-            thumbnails.append(b64_str)
-            
-        except requests.RequestException:
-            pass 
-        except (IOError, Image.DecompressionBombError) as e:
-            pass 
-        except Exception as e:
-            pass
-            
-    return thumbnails
\ No newline at end of file
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(f"Deadline vencido antes de descargar {url}")
+
+    with _get_session().get(url, timeout=remaining, stream=True, headers=headers) as response:
+        response.raise_for_status()
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "cache_control": response.headers.get("Cache-Control"),
+        }
+        if response.status_code == 304:
+            return None, validators
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > MAX_IMAGE_BYTES:
+                raise ValueError(f"Imagen demasiado grande: {url}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Deadline vencido descargando {url}")
+        return b''.join(chunks), validators
+
+
+def _make_thumbnail(img_data: bytes) -> bytes:
+    """Genera un thumbnail JPEG 150x150 y devuelve sus bytes."""
+    img = Image.open(io.BytesIO(img_data))
+
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    img.thumbnail((150, 150))
+
+    out_buf = io.BytesIO()
+    img.save(out_buf, format='JPEG', quality=85)
+
+    return out_buf.getvalue()
+
+
+def _get_thumbnail(url: str, deadline: float) -> Optional[bytes]:
+    """Thumbnail de una URL, pasando por la cache en disco si está activa."""
+    cache = _cache
+    if cache is None:
+        img_data, _ = _download(url, deadline)
+        return _make_thumbnail(img_data) if img_data else None
+
+    entry = cache.lookup(url)
+    if entry is not None and cache.is_fresh(entry):
+        thumbnail = cache.read(entry["digest"])
+        if thumbnail is not None:
+            cache.hits += 1
+            return thumbnail
+
+    img_data, validators = _download(url, deadline, cache.conditional_headers(entry))
+    if img_data is None:
+        thumbnail = cache.read(entry["digest"]) if entry else None
+        if thumbnail is not None:
+            cache.revalidated += 1
+            cache.store_index(url, entry["digest"], validators)
+            return thumbnail
+        # 304 pero el thumbnail ya fue desalojado: se descarga completa
+        img_data, validators = _download(url, deadline)
+    if not img_data:
+        return None
+
+    digest = content_hash(img_data)
+    thumbnail = cache.read(digest)
+    if thumbnail is not None:
+        cache.content_hits += 1
+    else:
+        cache.misses += 1
+        thumbnail = _make_thumbnail(img_data)
+        cache.store(digest, thumbnail)
+    cache.store_index(url, digest, validators)
+    return thumbnail
+
+
+def process_images(image_urls: List[str], per_image_timeout: float = PER_IMAGE_TIMEOUT,
+                   total_timeout: float = TOTAL_TIMEOUT, as_bytes: bool = False) -> List[Union[str, bytes]]:
+    """
+    Descarga imágenes (máximo 5) en paralelo y genera thumbnails.
+    Devuelve los thumbnails (base64, o JPEG crudo si as_bytes=True) en el
+    orden de las URLs recibidas; las imágenes que fallan se omiten (y se loguean).
+
+    Si vence `total_timeout`, la función vuelve sin esperar a las descargas
+    en curso: esos hilos pueden seguir vivos un rato después de la llamada,
+    hasta que corte su propio deadline por imagen.
+    """
+    urls = image_urls[:MAX_IMAGES]
+    if not urls:
+        return []
+
+    start = time.monotonic()
+    total_deadline = start + total_timeout
+    image_deadline = min(start + per_image_timeout, total_deadline)
+    thumbnails: List[Optional[bytes]] = [None] * len(urls)
+
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    futures = {executor.submit(_get_thumbnail, url, image_deadline): i for i, url in enumerate(urls)}
+    try:
+        for future in as_completed(futures, timeout=total_timeout):
+            try:
+                thumbnails[futures[future]] = future.result()
+            except Exception as e:
+                print(f"[ImageProcessor] Se omite {urls[futures[future]]}: {type(e).__name__}: {e}")
+    except FuturesTimeoutError:
+        print(f"[ImageProcessor] Deadline total ({total_timeout}s) vencido, se devuelven los thumbnails listos.")
+    finally:
+        # Los que no arrancaron se cancelan; los que están descargando cortan
+        # solos al vencer su deadline (no se los espera)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    ready = [t for t in thumbnails if t]
+    if as_bytes:
+        return ready
+    return [base64.b64encode(t).decode('utf-8') for t in ready]
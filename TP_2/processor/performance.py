@@ -1,19 +1,28 @@
 """
 Módulo de Análisis de Rendimiento (SRP: Solo analiza performance).
+
+Si el Servidor A ya descargó y parseó la página, envía sus estadísticas
+(`page_stats`) y el análisis se calcula sin volver a descargar el HTML.
 """
 
 import requests
 import time
 from bs4 import BeautifulSoup
-from typing import Dict, Any
-from urllib.parse import urlparse, urljoin
+from typing import Dict, Any, Optional
 
 from common import ProcessingError, TaskTimeoutError
+from scraper.html_parser import count_internal_resources
 
-def analyze_performance(url: str) -> Dict[str, Any]:
+def analyze_performance(url: str, page_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Calcula tiempo de carga, tamaño y número de requests (estimado).
+
+    page_stats (opcional): {"load_time_ms", "total_size_kb", "resources": {"js", "css", "img"}}
+    medidos por el Servidor A en su propia descarga.
     """
+    if page_stats:
+        return _performance_from_stats(page_stats)
+
     try:
         start_time = time.time()
         headers = {
@@ -27,25 +36,13 @@ def analyze_performance(url: str) -> Dict[str, Any]:
         total_size_kb = len(response.content) / 1024
         
         soup = BeautifulSoup(response.content, 'lxml')
-        base_domain = urlparse(url).netloc
-        
-        def is_internal(resource_url):
-            if not resource_url:
-                return False
-            abs_url = urljoin(url, resource_url)
-            return urlparse(abs_url).netloc == base_domain
-
-        js_count = len([s['src'] for s in soup.find_all('script', src=True) if is_internal(s.get('src'))])
-        css_count = len([c['href'] for c in soup.find_all('link', rel='stylesheet', href=True) if is_internal(c.get('href'))])
-        img_count = len([i['src'] for i in soup.find_all('img', src=True) if is_internal(i.get('src'))])
-        
-        num_requests = 1 + js_count + css_count + img_count
+        resources = count_internal_resources(soup, url)
 
-        return {
-            "load_time_ms": round(load_time_ms, 2),
-            "total_size_kb": round(total_size_kb, 2),
-            "num_requests": num_requests
-        }
+        return _performance_from_stats({
+            "load_time_ms": load_time_ms,
+            "total_size_kb": total_size_kb,
+            "resources": resources
+        })
 
     except requests.Timeout as e:
         print(f"Error en Requests: Timeout al analizar performance de {url}")
@@ -57,4 +54,15 @@ def analyze_performance(url: str) -> Dict[str, Any]:
 
     except Exception as e:
         print(f"Error inesperado en Performance: {e}")
-        raise ProcessingError(f"Error inesperado en Performance: {e}") from e
\ No newline at end of file
+        raise ProcessingError(f"Error inesperado en Performance: {e}") from e
+
+def _performance_from_stats(page_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Arma el resultado de performance a partir de estadísticas ya medidas."""
+    resources = page_stats.get("resources", {})
+    num_requests = 1 + resources.get("js", 0) + resources.get("css", 0) + resources.get("img", 0)
+
+    return {
+        "load_time_ms": round(page_stats.get("load_time_ms", 0), 2),
+        "total_size_kb": round(page_stats.get("total_size_kb", 0), 2),
+        "num_requests": num_requests
+    }
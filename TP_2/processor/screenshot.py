@@ -1,9 +1,28 @@
 """
 Módulo de Screenshot (SRP: Solo toma screenshots).
+
+Cada proceso del Pool mantiene UNA sesión de Chrome "caliente" que se
+reutiliza entre screenshots: entre usos se borran las cookies y el storage
+de todos los orígenes (DevTools),
+se recicla cada MAX_PAGES_PER_DRIVER páginas y se descarta si se cae.
+
+Con un deadline, la carga de la página se limita al tiempo que le queda al
+request; si se pasa, el navegador se descarta (Chrome puede seguir cargando
+la página abandonada) y el proceso queda libre para la próxima tarea.
+
+La captura usa el protocolo DevTools (Page.captureScreenshot con un clip):
+la página completa se captura sin agrandar la ventana ni esperar a que se
+re-renderice. Con ScreenshotOptions se puede capturar sólo el viewport,
+reducir el ancho y codificar en JPEG/WebP; la respuesta informa cuántos
+bytes se ahorraron respecto del PNG original.
 """
 
 import base64
+import io
 import time 
+from multiprocessing import util
+from typing import Any, Dict, Optional, Set, Tuple, Union
+from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -11,6 +30,7 @@ from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import WebDriverException, TimeoutException
 
 from common import ProcessingError, TaskTimeoutError
+from common.screenshot_options import ScreenshotOptions, MAX_FULL_HEIGHT
 
 options = Options()
 options.add_argument("--headless")
@@ -26,47 +46,196 @@ try:
 except Exception as e:
     print(f"[ScreenshotModule] ADVERTENCIA: No se pudo pre-descargar ChromeDriver: {e}")
 
-def take_screenshot(url: str) -> str:
-    """Toma un screenshot headless de PÁGINA COMPLETA y devuelve un string base64."""
+MAX_PAGES_PER_DRIVER = 50
+PAGE_LOAD_TIMEOUT = 30
+
+_driver: Optional[webdriver.Chrome] = None
+_pages_served = 0
+
+
+def configure(max_pages_per_driver: int):
+    """Initializer del Pool: define cada cuántas páginas se recicla el navegador."""
+    global MAX_PAGES_PER_DRIVER
+    MAX_PAGES_PER_DRIVER = max(1, max_pages_per_driver)
+
+
+def _get_driver() -> webdriver.Chrome:
+    """Devuelve el navegador del proceso, creándolo o reciclándolo si hace falta."""
+    global _driver, _pages_served
     
-    driver = None
-    try:
+    if _driver is not None and _pages_served >= MAX_PAGES_PER_DRIVER:
+        print(f"[ScreenshotModule] Reciclando navegador tras {_pages_served} páginas.")
+        _discard_driver()
+    
+    if _driver is None:
         service = Service(DRIVER_PATH) if DRIVER_PATH else Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        driver.set_page_load_timeout(30)
-        
-        driver.get(url)
+        _driver = webdriver.Chrome(service=service, options=options)
+        _driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        _pages_served = 0
+    
+    return _driver
 
-        original_width = driver.get_window_size()['width']
 
-        total_height = driver.execute_script("return document.body.parentNode.scrollHeight")
-        
-        if total_height > 15000:
-            print(f"[ScreenshotModule] ADVERTENCIA: Página {url} es muy alta ({total_height}px), truncando a 15000px.")
-            total_height = 15000
+def _discard_driver():
+    """Cierra el navegador del proceso (si existe) ignorando errores."""
+    global _driver
+    driver, _driver = _driver, None
+    if driver:
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"[ScreenshotModule] Error al cerrar el navegador: {e}")
+
+
+def _frame_origins(tree: Dict[str, Any]) -> Set[str]:
+    """Orígenes de un frame y de todos sus subframes (Page.getFrameTree)."""
+    origin = tree.get("frame", {}).get("securityOrigin")
+    origins = {origin} if origin and origin != "null" and "://" in origin else set()
+    for child in tree.get("childFrames", []):
+        origins |= _frame_origins(child)
+    return origins
+
+
+def _reset_driver(driver: webdriver.Chrome):
+    """
+    Borra todo el estado del navegador antes del próximo uso, vía DevTools:
+    las cookies de todos los dominios y el storage (localStorage,
+    IndexedDB, cache storage, service workers...) de todos los orígenes
+    ("*") y, por las dudas, de cada frame de la página actual (incluidos
+    los de terceros). Después vuelve a about:blank.
+    """
+    origins = {"*"} | _frame_origins(driver.execute_cdp_cmd("Page.getFrameTree", {}).get("frameTree", {}))
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    for origin in sorted(origins):
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+    driver.get("about:blank")
 
-        driver.set_window_size(original_width, total_height)
+
+# Los workers del Pool terminan por multiprocessing (no corren atexit):
+# un Finalize con prioridad garantiza que Chrome se cierre al salir.
+util.Finalize(None, _discard_driver, exitpriority=10)
+
+
+def _remaining(deadline: Optional[float]) -> float:
+    """Segundos hasta el deadline (time.time()); sin deadline, el timeout de carga normal."""
+    if deadline is None:
+        return PAGE_LOAD_TIMEOUT
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TaskTimeoutError("Deadline vencido antes de terminar el screenshot")
+    return remaining
+
+
+def _capture_png(driver: webdriver.Chrome, url: str, mode: str) -> bytes:
+    """Captura el viewport o la página completa (hasta MAX_FULL_HEIGHT px) como PNG vía DevTools."""
+    metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    viewport = metrics.get("cssLayoutViewport") or metrics["layoutViewport"]
+    width, height = viewport["clientWidth"], viewport["clientHeight"]
+
+    if mode == "full":
+        content = metrics.get("cssContentSize") or metrics["contentSize"]
+        height = max(height, content["height"])
+        if height > MAX_FULL_HEIGHT:
+            print(f"[ScreenshotModule] ADVERTENCIA: Página {url} es muy alta ({height}px), truncando a {MAX_FULL_HEIGHT}px.")
+            height = MAX_FULL_HEIGHT
+
+    shot = driver.execute_cdp_cmd("Page.captureScreenshot", {
+        "format": "png",
+        "captureBeyondViewport": mode == "full",
+        "clip": {"x": 0, "y": 0, "width": width, "height": height, "scale": 1},
+    })
+    return base64.b64decode(shot["data"])
+
+
+def _encode(png_data: bytes, options: ScreenshotOptions) -> Tuple[bytes, int, int]:
+    """Reduce al ancho pedido y recodifica; devuelve (bytes, ancho, alto). Sin cambios, el PNG tal cual."""
+    img = Image.open(io.BytesIO(png_data))
+    width, height = img.size
+    resize = options.width is not None and options.width < width
+    if options.format == "png" and not resize:
+        return png_data, width, height
+
+    if resize:
+        height = max(1, round(height * options.width / width))
+        width = options.width
+        img = img.resize((width, height), Image.LANCZOS)
+    if options.format == "jpeg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    out_buf = io.BytesIO()
+    if options.format == "png":
+        img.save(out_buf, format="PNG")
+    else:
+        img.save(out_buf, format=options.format.upper(), quality=options.quality)
+    return out_buf.getvalue(), width, height
+
+
+def take_screenshot(url: str, as_bytes: bool = False, deadline: Optional[float] = None,
+                    options: Optional[ScreenshotOptions] = None) -> Union[str, bytes, Dict[str, Any]]:
+    """
+    Toma un screenshot headless de PÁGINA COMPLETA y devuelve un string base64
+    (o el PNG crudo si as_bytes=True, para el codec binario).
+    `deadline` (time.time()) acota la carga de la página.
+
+    Con `options` devuelve un dict con la imagen ('image'), su formato,
+    tamaño y los bytes ahorrados respecto del PNG capturado.
+    """
+    global _pages_served
+    
+    driver = None
+    healthy = True
+    try:
+        driver = _get_driver()
+        _pages_served += 1
         
-        time.sleep(0.5) 
+        driver.set_page_load_timeout(max(1, min(PAGE_LOAD_TIMEOUT, _remaining(deadline))))
+        driver.get(url)
+        _remaining(deadline)  # si venció mientras cargaba, no vale la pena capturar
         
-        png_data = driver.get_screenshot_as_png()
+        opts = options or ScreenshotOptions()
+        png_data = _capture_png(driver, url, opts.mode)
+        if options is None:
+            return png_data if as_bytes else base64.b64encode(png_data).decode('utf-8')
         
-        return base64.b64encode(png_data).decode('utf-8')
+        data, width, height = _encode(png_data, opts)
+        return {
+            "image": data if as_bytes else base64.b64encode(data).decode('utf-8'),
+            "format": opts.format,
+            "mode": opts.mode,
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+            "original_bytes": len(png_data),
+            "bytes_saved": len(png_data) - len(data),
+        }
         
     except TimeoutException as e:
-        print(f"Error en Selenium: Timeout (30s) al cargar {url}")
+        # La página sigue cargando en Chrome: se descarta el navegador
+        healthy = False
+        print(f"Error en Selenium: Timeout al cargar {url}")
         raise TaskTimeoutError(f"Timeout al cargar {url} para screenshot") from e
+    
+    except TaskTimeoutError:
+        print(f"[ScreenshotModule] Deadline vencido para {url}, se abandona el screenshot.")
+        raise
         
     except WebDriverException as e:
+        healthy = False
         print(f"Error en Selenium al tomar screenshot de {url}: {e}")
         raise ProcessingError(f"Error de WebDriver: {str(e)[:100]}") from e
         
     except Exception as e:
+        healthy = False
         print(f"Error inesperado en Screenshot: {e}")
         raise ProcessingError(f"Error inesperado en Screenshot: {e}") from e
     
     finally:
         if driver:
-            driver.set_window_size(1280, 720) 
-            driver.quit()
\ No newline at end of file
+            if healthy:
+                try:
+                    _reset_driver(driver)
+                except Exception as e:
+                    print(f"[ScreenshotModule] No se pudo resetear el navegador, se descarta: {e}")
+                    healthy = False
+            if not healthy:
+                _discard_driver()
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+Módulo de Cache de Thumbnails en disco (SRP: Solo guarda y desaloja thumbnails).
+
+Los sitios repiten los mismos logos e imágenes en muchas páginas. En vez de
+descargar, decodificar y recodificar cada vez, se guarda el JPEG 150x150
+terminado en disco, direccionado por el SHA-256 de la imagen original:
+
+    <dir>/thumbs/<sha256>.jpg   thumbnail terminado (uno por contenido)
+    <dir>/index/<sha256(url)>.json
+                                validadores de la URL (ETag, Last-Modified),
+                                hash del contenido y hasta cuándo está fresca
+
+Una URL fresca cuesta leer su índice y el thumbnail, sin red. Una vencida se
+revalida con If-None-Match / If-Modified-Since: un 304 reutiliza el
+thumbnail. Si la imagen cambió de URL pero no de contenido (CDNs, query
+strings), el hash la encuentra igual y sólo se pierde la descarga.
+
+La cache la comparten todos los procesos de los Pools: cada archivo se
+escribe en un temporal y se publica con os.replace (atómico), y un lector
+que no encuentra un archivo lo trata como miss. El tamaño total se acota
+desalojando los archivos usados hace más tiempo (el mtime se actualiza en
+cada hit). Todos los procesos suman lo que escriben en un contador común
+(`<dir>/.size`, protegido con flock); el que lo hace pasar del límite
+desaloja mientras tiene el lock y deja el contador con el total real. Sin
+fcntl (Windows) el contador se actualiza sin lock: puede desviarse un poco,
+pero cada desalojo lo corrige re-escaneando el directorio.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # plataformas no POSIX: sin flock
+    fcntl = None
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_FRESH_SECONDS = 300.0
+MAX_FRESH_SECONDS = 24 * 3600.0
+LOW_WATER = 0.9  # al desalojar se baja hasta el 90% del límite
+
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def fresh_seconds(cache_control: Optional[str], default: float = DEFAULT_FRESH_SECONDS) -> float:
+    """Segundos que una respuesta puede servirse sin revalidar, según su Cache-Control."""
+    if not cache_control:
+        return default
+    directives = cache_control.lower()
+    if "no-cache" in directives or "no-store" in directives:
+        return 0.0
+    match = _MAX_AGE.search(directives)
+    if match:
+        return min(float(match.group(1)), MAX_FRESH_SECONDS)
+    return default
+
+
+class ThumbnailCache:
+    """Cache de thumbnails en disco, direccionada por contenido y compartida entre procesos."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 default_fresh: float = DEFAULT_FRESH_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_fresh = default_fresh
+        self.thumbs_dir = os.path.join(directory, "thumbs")
+        self.index_dir = os.path.join(directory, "index")
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._size_path = os.path.join(directory, ".size")
+        # Último valor visto del contador compartido
+        self._estimated_bytes: Optional[int] = None
+        self.hits = 0
+        self.revalidated = 0
+        self.content_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _thumb_path(self, digest: str) -> str:
+        return os.path.join(self.thumbs_dir, f"{digest}.jpg")
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.index_dir, f"{content_hash(url.encode('utf-8'))}.json")
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            try:
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        # Al sobrescribir (ej. un índice revalidado) sólo cambia la diferencia
+        self._account(len(data) - replaced)
+
+    # --- Índice por URL ---
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Entrada del índice de la URL (validadores, hash, fresh_until) o None."""
+        try:
+            with open(self._index_path(url), "rb") as f:
+                entry = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) and entry.get("digest") else None
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() < entry.get("fresh_until", 0)
+
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Headers para revalidar una entrada (vacío si no tiene validadores)."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store_index(self, url: str, digest: str, validators: Dict[str, Optional[str]]):
+        """Asocia la URL a un contenido, con los validadores de la última respuesta."""
+        entry = {
+            "url": url,
+            "digest": digest,
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+            "fresh_until": time.time() + fresh_seconds(validators.get("cache_control"), self.default_fresh),
+        }
+        self._write_atomic(self._index_path(url), json.dumps(entry).encode("utf-8"))
+
+    # --- Thumbnails por contenido ---
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Thumbnail del contenido `digest` (y lo marca como recién usado) o None."""
+        path = self._thumb_path(digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data or None
+
+    def store(self, digest: str, thumbnail: bytes):
+        self._write_atomic(self._thumb_path(digest), thumbnail)
+
+    # --- Desalojo ---
+
+    @contextmanager
+    def _size_counter(self) -> Iterator[BinaryIO]:
+        """Abre el contador de bytes compartido con un lock exclusivo (si hay fcntl)."""
+        fd = os.open(self._size_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_counter(f: BinaryIO) -> Optional[int]:
+        f.seek(0)
+        raw = f.read().strip()
+        return int(raw) if raw.isdigit() else None
+
+    @staticmethod
+    def _write_counter(f: BinaryIO, total: int):
+        f.seek(0)
+        f.truncate()
+        f.write(str(total).encode("ascii"))
+        f.flush()
+
+    def _account(self, size: int):
+        """Suma `size` (puede ser negativo) al contador común y desaloja si quedó sobre el límite."""
+        with self._size_counter() as f:
+            total = self._read_counter(f)
+            if total is None:
+                total = self._scan_size()  # recién creado: ya incluye este archivo
+            else:
+                total = max(0, total + size)
+            if total > self.max_bytes:
+                total = self._evict_locked()
+            self._write_counter(f, total)
+        self._estimated_bytes = total
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for directory in (self.thumbs_dir, self.index_dir):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith(".tmp-"):
+                    continue  # escritura en curso de algún proceso: no se cuenta ni se borra
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # otro proceso lo borró o reemplazó
+                files.append((st.st_mtime, st.st_size, entry.path))
+        return files
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict_locked(self) -> int:
+        """Desaloja hasta bajar del 90% del límite; devuelve el total que queda. Requiere el lock."""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * LOW_WATER)
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        return total
+
+    def evict(self) -> int:
+        """
+        Borra los archivos usados hace más tiempo hasta bajar del 90% del
+        límite y corrige el contador común. Devuelve la cantidad de archivos borrados.
+        """
+        before = self.evictions
+        with self._size_counter() as f:
+            total = self._evict_locked()
+            self._write_counter(f, total)
+        self._estimated_bytes = total
+        return self.evictions - before
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "estimated_bytes": self._estimated_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "content_hits": self.content_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,25 +1,153 @@
 """
 Módulo Cliente HTTP Asíncrono (SRP: Solo maneja requests HTTP).
+
+El cuerpo se lee en streaming con un presupuesto de bytes que se controla
+mientras llega (no sólo con Content-Length, que en respuestas chunked no
+existe). El charset se toma del header Content-Type, del BOM o del
+<meta charset> del documento, en ese orden. Si sólo interesan los
+metadatos, la lectura corta apenas se vio el fin del <head> más
+`body_after_head` bytes.
+
+La sesión usa un TCPConnector con límites totales y por host, cache de DNS
+con TTL y keep-alive configurable: al scrapear muchas URLs de pocos
+dominios se reutilizan conexiones (sin repetir DNS ni handshake TLS).
+Un TraceConfig cuenta conexiones nuevas, reutilizadas, esperas por límite
+y hits/misses de DNS; `stats()` los expone junto con las abiertas/ociosas.
+
+Con un HTTPCache, los documentos frescos se sirven sin red y los vencidos
+se piden con If-None-Match / If-Modified-Since: un 304 devuelve el cuerpo
+guardado (marcado `cached`), sin volver a transferirlo.
 """
 
 import aiohttp
 import asyncio
-from typing import Optional, Tuple
+import codecs
+import re
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 
 from common import ScrapingError, TaskTimeoutError
+from scraper.http_cache import HTTPCache, CachedDocument
+
+MAX_HTML_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+BODY_AFTER_HEAD = 4 * 1024
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 8
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30.0
+SNIFF_BYTES = 4096
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+_HEAD_END_RE = re.compile(rb'</head\s*>|<body[\s>]', re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+class FetchedPage(NamedTuple):
+    """
+    Documento descargado: bytes crudos, URL final, charset, si se cortó antes
+    del final y si salió de la cache HTTP (fresco o revalidado con un 304).
+    """
+    body: bytes
+    url: str
+    encoding: str
+    truncated: bool = False
+    cached: bool = False
+
+    def text(self) -> str:
+        return self.body.decode(self.encoding, errors='replace')
+
+
+def detect_charset(body: bytes, header_charset: Optional[str] = None) -> str:
+    """Charset del documento: header, BOM, <meta charset> o UTF-8 por defecto."""
+    candidates = [header_charset]
+    candidates += [name for bom, name in _BOMS if body.startswith(bom)]
+    match = _META_CHARSET_RE.search(body[:SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1).decode('ascii', errors='ignore'))
+
+    for name in candidates:
+        if not name:
+            continue
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
 
 class AsyncHTTPClient:
     """Wrapper para aiohttp.ClientSession con manejo de errores."""
-    
-    def __init__(self, timeout: int = 30):
+
+    def __init__(self, timeout: int = 30, max_bytes: int = MAX_HTML_BYTES,
+                 limit: int = CONNECTION_LIMIT, limit_per_host: int = CONNECTION_LIMIT_PER_HOST,
+                 dns_ttl: int = DNS_CACHE_TTL, keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+                 http_cache: Optional[HTTPCache] = None):
         self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_bytes = max_bytes
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.http_cache = http_cache
         self.session: Optional[aiohttp.ClientSession] = None
+        self.counters = {
+            "requests": 0, "new_connections": 0, "reused_connections": 0,
+            "queued": 0, "dns_cache_hits": 0, "dns_cache_misses": 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Cuenta los eventos del connector que importan para medir la reutilización."""
+        trace = aiohttp.TraceConfig()
+
+        def count(name: str):
+            async def callback(session, ctx, params):
+                self.counters[name] += 1
+            return callback
+
+        trace.on_request_start.append(count("requests"))
+        trace.on_connection_create_end.append(count("new_connections"))
+        trace.on_connection_reuseconn.append(count("reused_connections"))
+        trace.on_connection_queued_start.append(count("queued"))
+        trace.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace
 
     async def create_session(self):
         """Crea la aiohttp.ClientSession."""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(timeout=self.timeout)
-            print("[AsyncHTTPClient] Sesión aiohttp creada.")
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self.session = aiohttp.ClientSession(
+                timeout=self.timeout, connector=connector, trace_configs=[self._trace_config()]
+            )
+            print(f"[AsyncHTTPClient] Sesión aiohttp creada (límite {self.limit}, {self.limit_per_host} por host, "
+                  f"DNS TTL {self.dns_ttl}s, keep-alive {self.keepalive_timeout}s).")
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de conexiones y DNS, más las conexiones abiertas y ociosas ahora."""
+        stats: Dict[str, Any] = dict(self.counters)
+        connections = stats["new_connections"] + stats["reused_connections"]
+        stats["reuse_ratio"] = round(stats["reused_connections"] / connections, 3) if connections else 0.0
+
+        connector = self.session.connector if self.session and not self.session.closed else None
+        # El connector no expone estos conteos: se leen sus estructuras internas
+        idle_by_host = getattr(connector, "_conns", {}) or {}
+        idle = sum(len(conns) for conns in idle_by_host.values())
+        in_use = len(getattr(connector, "_acquired", ()) or ())
+        stats["in_use"] = in_use
+        stats["idle"] = idle
+        stats["open"] = in_use + idle
+        stats["idle_hosts"] = sorted({key.host for key in idle_by_host if idle_by_host[key]})
+        stats["limits"] = {"total": self.limit, "per_host": self.limit_per_host,
+                           "dns_ttl": self.dns_ttl, "keepalive_timeout": self.keepalive_timeout}
+        if self.http_cache is not None:
+            stats["cache"] = self.http_cache.stats()
+        return stats
 
     async def close_session(self):
         """Cierra la aiohttp.ClientSession."""
@@ -30,40 +158,95 @@ class AsyncHTTPClient:
     async def fetch_html(self, url: str) -> Tuple[str, str]:
         """
         Obtiene el contenido HTML de una URL de forma asíncrona.
-        
+
         Devuelve:
             Tuple[str, str]: (contenido_html, url_final)
         """
+        page = await self.fetch_document(url)
+        return page.text(), page.url
+
+    async def fetch_document(self, url: str, head_only: bool = False,
+                             body_after_head: int = BODY_AFTER_HEAD,
+                             bypass_cache: bool = False) -> FetchedPage:
+        """
+        Descarga un documento en streaming sin superar `max_bytes`.
+        Con head_only=True corta después del </head> (más `body_after_head` bytes).
+        Si hay cache HTTP, un documento fresco no usa la red y uno vencido se
+        revalida con un request condicional. Con bypass_cache=True siempre se
+        descarga completo (ej. para medir el tiempo de carga); la respuesta
+        igual se guarda en la cache.
+        """
+        cache = self.http_cache if self.http_cache is not None and self.http_cache.enabled else None
+        cached = cache.get(url) if cache and not bypass_cache else None
+        if cached is not None and cache.is_fresh(cached):
+            cache.fresh_hits += 1
+            return self._page_from_cache(cached)
+
         if not self.session:
             await self.create_session()
-        
+
         try:
-            async with self.session.get(url, allow_redirects=True) as response:
+            headers = cache.conditional_headers(cached) if cache else None
+            async with self.session.get(url, allow_redirects=True, headers=headers) as response:
                 response.raise_for_status()
-                
+                if response.status == 304 and cached is not None:
+                    return self._page_from_cache(cache.refresh(url, cached, response.headers))
+
                 content_length = response.headers.get('Content-Length')
-                if content_length and int(content_length) > 10 * 1024 * 1024: 
+                if content_length and int(content_length) > self.max_bytes and not head_only:
                     raise ValueError(f"Página demasiado grande: {content_length} bytes")
 
-                html = await response.text(encoding='utf-8')
-                return html, str(response.url)
-        
+                body, truncated = await self._read_body(response, head_only, body_after_head)
+                encoding = detect_charset(body, response.charset)
+                if cache and not truncated:
+                    cache.store(url, body, str(response.url), response.charset, response.headers)
+                return FetchedPage(body, str(response.url), encoding, truncated)
+
         except aiohttp.ClientConnectorError as e:
             print(f"Error de conexión al scrapear {url}: {e}")
             raise ScrapingError(f"No se pudo conectar a {url} (DNS o error de conexión)") from e
-        
+
         except aiohttp.ClientResponseError as e:
             print(f"Error HTTP {e.status} al scrapear {url}: {e.message}")
             raise ScrapingError(f"Error HTTP {e.status} en {url}") from e
-        
+
         except asyncio.TimeoutError as e:
             print(f"Timeout (30s) al scrapear {url}")
             raise TaskTimeoutError(f"Timeout al scrapear {url}") from e
-        
-        except ValueError as e: 
+
+        except ValueError as e:
             print(f"Error de valor para {url}: {e}")
             raise ScrapingError(f"Error al procesar {url}: {e}") from e
-        
+
         except Exception as e:
             print(f"Error inesperado de aiohttp con {url}: {e}")
-            raise ScrapingError(f"Error inesperado al scrapear {url}: {e}") from e
\ No newline at end of file
+            raise ScrapingError(f"Error inesperado al scrapear {url}: {e}") from e
+
+    @staticmethod
+    def _page_from_cache(doc: CachedDocument) -> FetchedPage:
+        return FetchedPage(doc.body, doc.url, detect_charset(doc.body, doc.charset), cached=True)
+
+    async def _read_body(self, response: aiohttp.ClientResponse, head_only: bool,
+                         body_after_head: int) -> Tuple[bytes, bool]:
+        """Lee el cuerpo por chunks; devuelve (bytes, truncado)."""
+        buf = bytearray()
+        head_end: Optional[int] = None
+
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            # Se busca desde un poco antes del chunk nuevo por si la etiqueta quedó partida
+            search_from = max(0, len(buf) - 8)
+            buf += chunk
+
+            if head_only and head_end is None:
+                match = _HEAD_END_RE.search(buf, search_from)
+                if match:
+                    head_end = match.end()
+            if head_end is not None and len(buf) >= head_end + body_after_head:
+                return bytes(buf[:head_end + body_after_head]), True
+
+            if len(buf) > self.max_bytes:
+                if head_only:
+                    return bytes(buf[:self.max_bytes]), True
+                raise ValueError(f"Página demasiado grande: más de {self.max_bytes} bytes")
+
+        return bytes(buf), False
@@ -0,0 +1,33 @@
+"""
+Resumen del documento en UNA sola pasada de parsing (SRP: Solo arma el resumen).
+
+Parsea el HTML una única vez con BeautifulSoup/lxml y deriva de ese árbol
+todo lo que necesitan el resultado final y el Servidor B: título, links,
+estructura, imágenes, meta tags y conteo de recursos para performance.
+"""
+
+from bs4 import BeautifulSoup
+from typing import Dict, Any, Optional, Union
+
+from scraper.html_parser import parse_basic_data_from_soup, count_internal_resources
+from scraper.metadata_extractor import extract_metadata_from_soup
+
+
+def build_document_summary(html: Union[str, bytes], base_url: str,
+                           encoding: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Devuelve un resumen compacto del documento:
+    title, links, images_count, structure, image_urls_for_processing,
+    meta_tags y resources (js/css/img internos).
+
+    Acepta el HTML como str o como bytes (con su `encoding`, si se conoce).
+    """
+    if isinstance(html, (bytes, bytearray)):
+        soup = BeautifulSoup(html, 'lxml', from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html, 'lxml')
+
+    summary = parse_basic_data_from_soup(soup, base_url)
+    summary["meta_tags"] = extract_metadata_from_soup(soup)
+    summary["resources"] = count_internal_resources(soup, base_url)
+    return summary
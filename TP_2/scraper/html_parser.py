@@ -6,7 +6,7 @@ y URLs de imágenes para el procesador.
 
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, List
 import re
 
 def parse_basic_data(html: str, base_url: str) -> Dict[str, Any]:
@@ -14,7 +14,10 @@ def parse_basic_data(html: str, base_url: str) -> Dict[str, Any]:
     Extrae título, links, conteo de imágenes y estructura de headers.
     """
     soup = BeautifulSoup(html, 'lxml')
-    
+    return parse_basic_data_from_soup(soup, base_url)
+
+def parse_basic_data_from_soup(soup: BeautifulSoup, base_url: str) -> Dict[str, Any]:
+    """Igual que parse_basic_data pero sobre un árbol ya parseado."""
     title = _extract_title(soup)
     links = _extract_links(soup, base_url)
     images_count = _count_images(soup)
@@ -44,8 +47,8 @@ def _extract_title(soup: BeautifulSoup) -> str:
     return "Sin Título"
 
 def _extract_links(soup: BeautifulSoup, base_url: str) -> List[str]:
-    """Extrae todos los enlaces HTTP/HTTPS absolutos y únicos."""
-    links: Set[str] = set()
+    """Extrae todos los enlaces HTTP/HTTPS absolutos y únicos, en orden de aparición."""
+    links: Dict[str, None] = {}
     for tag in soup.find_all('a', href=True):
         href = tag['href']
         if not href or href.startswith(('#', 'mailto:', 'tel:', 'javascript:')):
@@ -55,7 +58,7 @@ def _extract_links(soup: BeautifulSoup, base_url: str) -> List[str]:
             abs_url = urljoin(base_url, href)
             parsed_url = urlparse(abs_url)
             if parsed_url.scheme in ['http', 'https'] and parsed_url.netloc:
-                links.add(abs_url)
+                links[abs_url] = None
         except Exception:
             continue 
     return list(links)
@@ -89,8 +92,8 @@ def _extract_structure(soup: BeautifulSoup) -> Dict[str, int]:
     return structure
 
 def _extract_image_urls(soup: BeautifulSoup, base_url: str, limit: int) -> List[str]:
-    """Extrae URLs de imágenes para procesar."""
-    image_urls: Set[str] = set()
+    """Extrae URLs de imágenes para procesar, en orden de aparición."""
+    image_urls: Dict[str, None] = {}
     for tag in soup.find_all('img', src=True):
         src = tag['src']
         if not src or src.startswith('data:image'): 
@@ -100,9 +103,25 @@ def _extract_image_urls(soup: BeautifulSoup, base_url: str, limit: int) -> List[
             abs_url = urljoin(base_url, src)
             parsed_url = urlparse(abs_url)
             if parsed_url.scheme in ['http', 'https'] and parsed_url.netloc:
-                image_urls.add(abs_url)
+                image_urls[abs_url] = None
                 if len(image_urls) >= limit:
                     break
         except Exception:
             continue
-    return list(image_urls)
\ No newline at end of file
+    return list(image_urls)
+
+def count_internal_resources(soup: BeautifulSoup, base_url: str) -> Dict[str, int]:
+    """Cuenta scripts, hojas de estilo e imágenes servidas desde el mismo dominio."""
+    base_domain = urlparse(base_url).netloc
+
+    def is_internal(resource_url: str) -> bool:
+        if not resource_url:
+            return False
+        abs_url = urljoin(base_url, resource_url)
+        return urlparse(abs_url).netloc == base_domain
+
+    return {
+        "js": len([s for s in soup.find_all('script', src=True) if is_internal(s.get('src'))]),
+        "css": len([c for c in soup.find_all('link', rel='stylesheet', href=True) if is_internal(c.get('href'))]),
+        "img": len([i for i in soup.find_all('img', src=True) if is_internal(i.get('src'))]),
+    }
@@ -0,0 +1,113 @@
+"""
+Cache HTTP de Documentos (SRP: Solo guarda documentos y sus validadores).
+
+Guarda el cuerpo de cada página junto con su ETag, Last-Modified y
+Cache-Control. Mientras una entrada esté fresca (max-age) se sirve sin red;
+después se revalida con If-None-Match / If-Modified-Since y un 304 reutiliza
+el cuerpo guardado: re-scrapear una página que no cambió cuesta un
+intercambio de headers en vez de la transferencia completa.
+
+Sólo se guardan respuestas completas (no las cortadas por head_only) que
+traen algún validador o un max-age, y nunca las marcadas no-store. Las
+entradas vencidas se conservan `stale_ttl` segundos para poder revalidarlas.
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from common.cache import TTLCache, normalize_url
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+STALE_TTL = 3600.0
+
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class CachedDocument(NamedTuple):
+    body: bytes
+    url: str
+    charset: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh_until: float
+
+
+def max_age(cache_control: Optional[str]) -> Optional[float]:
+    """Segundos de frescura según Cache-Control (0 con no-cache, None si no dice nada)."""
+    if not cache_control:
+        return None
+    directives = cache_control.lower()
+    if "no-cache" in directives:
+        return 0.0
+    match = _MAX_AGE_RE.search(directives)
+    return float(match.group(1)) if match else None
+
+
+class HTTPCache:
+    """Cache LRU en memoria de documentos HTTP con revalidación condicional."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = 4096,
+                 stale_ttl: float = STALE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.entries = TTLCache(max_entries, max_bytes, size_of=lambda doc: len(doc.body) + 512, clock=clock)
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.stored = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.entries.max_entries > 0 and (self.entries.max_bytes or 0) > 0
+
+    def get(self, url: str) -> Optional[CachedDocument]:
+        return self.entries.get(normalize_url(url))
+
+    def is_fresh(self, doc: CachedDocument) -> bool:
+        return self.clock() < doc.fresh_until
+
+    def conditional_headers(self, doc: Optional[CachedDocument]) -> Dict[str, str]:
+        """Headers para revalidar un documento guardado (vacío si no hay nada guardado)."""
+        headers = {}
+        if doc is not None and doc.etag:
+            headers["If-None-Match"] = doc.etag
+        if doc is not None and doc.last_modified:
+            headers["If-Modified-Since"] = doc.last_modified
+        return headers
+
+    def store(self, url: str, body: bytes, final_url: str, charset: Optional[str],
+              headers: Any) -> Optional[CachedDocument]:
+        """Guarda una respuesta 200 completa si es cacheable; devuelve la entrada o None."""
+        cache_control = headers.get("Cache-Control")
+        if cache_control and "no-store" in cache_control.lower():
+            self.entries.pop(normalize_url(url))
+            return None
+
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        fresh_for = max_age(cache_control)
+        if not etag and not last_modified and not fresh_for:
+            return None
+
+        doc = CachedDocument(body, final_url, charset, etag, last_modified, self.clock() + (fresh_for or 0.0))
+        self.entries.put(normalize_url(url), doc, max(self.stale_ttl, fresh_for or 0.0))
+        self.stored += 1
+        return doc
+
+    def refresh(self, url: str, doc: CachedDocument, headers: Any) -> CachedDocument:
+        """Tras un 304: renueva frescura y validadores, conservando el cuerpo."""
+        fresh_for = max_age(headers.get("Cache-Control"))
+        doc = doc._replace(
+            etag=headers.get("ETag") or doc.etag,
+            last_modified=headers.get("Last-Modified") or doc.last_modified,
+            fresh_until=self.clock() + (fresh_for or 0.0),
+        )
+        self.entries.put(normalize_url(url), doc, max(self.stale_ttl, fresh_for or 0.0))
+        self.revalidated += 1
+        return doc
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.entries.stats()
+        stats["fresh_hits"] = self.fresh_hits
+        stats["revalidated"] = self.revalidated
+        stats["stored"] = self.stored
+        return stats
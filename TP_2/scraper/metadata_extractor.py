@@ -12,6 +12,10 @@ def extract_metadata(html: str) -> Dict[str, Any]:
     Extrae meta tags relevantes (description, keywords, Open Graph).
     """
     soup = BeautifulSoup(html, 'lxml')
+    return extract_metadata_from_soup(soup)
+
+def extract_metadata_from_soup(soup: BeautifulSoup) -> Dict[str, Any]:
+    """Igual que extract_metadata pero sobre un árbol ya parseado."""
     metadata: Dict[str, Any] = {}
 
     desc_tag = soup.find('meta', attrs={'name': re.compile(r'^description$', re.I)})
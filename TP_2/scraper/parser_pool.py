@@ -0,0 +1,104 @@
+"""
+Pool de Parsing (SRP: Solo decide dónde se parsea el HTML).
+
+El parsing con BeautifulSoup/lxml es CPU puro: en el pool de hilos por
+defecto compite por el GIL con el event loop. Las páginas grandes se
+parsean en un ProcessPoolExecutor dedicado, recibiendo el HTML como bytes;
+las chicas (menos de `inline_threshold` bytes) se parsean en el pool de
+hilos por defecto de este proceso, porque el costo de IPC sería mayor que
+el del parsing. Nunca se parsea en el hilo del event loop. Con `workers=0`
+las grandes también van al pool de hilos.
+
+Los resúmenes se guardan por hash del contenido (más URL base y charset):
+una página que no cambió (un 304 de la cache HTTP, o un 200 con el mismo
+cuerpo) no se vuelve a parsear. El hash de una página grande se calcula
+en un hilo (sha256 libera el GIL); el de una chica cuesta microsegundos y
+se calcula en el loop.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from common import ScrapingError
+from common.cache import TTLCache
+from scraper.document_summary import build_document_summary
+
+INLINE_THRESHOLD = 32 * 1024
+SUMMARY_CACHE_SIZE = 256
+SUMMARY_TTL = 3600.0
+
+
+def _digest(html: bytes) -> bytes:
+    return hashlib.sha256(html).digest()
+
+
+class ParserPool:
+    """Parsea documentos en hilos o en procesos según su tamaño."""
+
+    def __init__(self, workers: int = 2, inline_threshold: int = INLINE_THRESHOLD,
+                 summary_cache_size: int = SUMMARY_CACHE_SIZE):
+        self.workers = workers
+        self.inline_threshold = inline_threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._summaries = TTLCache(summary_cache_size)
+        self.inline_count = 0
+        self.pool_count = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # forkserver: los procesos no heredan los hilos ni el event loop del servidor
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+        return self._executor
+
+    async def summarize(self, html: bytes, base_url: str, encoding: Optional[str] = None) -> Dict[str, Any]:
+        """Devuelve el resumen del documento (ver build_document_summary)."""
+        if len(html) < self.inline_threshold:
+            digest = hashlib.sha256(html).digest()
+        else:
+            digest = await asyncio.get_running_loop().run_in_executor(None, _digest, html)
+        key = (digest, base_url, encoding)
+        summary = self._summaries.get(key)
+        if summary is None:
+            summary = await self._summarize(html, base_url, encoding)
+            self._summaries.put(key, summary, SUMMARY_TTL)
+        return summary
+
+    async def _summarize(self, html: bytes, base_url: str, encoding: Optional[str]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if len(html) < self.inline_threshold:
+            self.inline_count += 1
+            return await loop.run_in_executor(None, build_document_summary, html, base_url, encoding)
+
+        self.pool_count += 1
+        if self.workers <= 0:
+            return await loop.run_in_executor(None, build_document_summary, html, base_url, encoding)
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), build_document_summary, html, base_url, encoding
+            )
+        except BrokenProcessPool as e:
+            # Un proceso de parsing murió: se descarta el pool y el próximo se crea de nuevo
+            print(f"[ParserPool] Pool de parsing roto, se recrea: {e}")
+            self._executor = None
+            raise ScrapingError(f"Falló el parsing de {base_url}: {e}") from e
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "inline_threshold": self.inline_threshold,
+            "inline": self.inline_count,
+            "pool": self.pool_count,
+            "reused": self._summaries.hits,
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,253 @@
+"""
+Cache de Resultados de Scraping (SRP: Solo cachea resultados de /scrape).
+
+Guarda cada resultado partido en componentes (title, links, meta_tags,
+structure, images_count, screenshot, performance, thumbnails), cada uno con
+su propio TTL: un screenshot envejece antes que los links. La clave es la
+URL final normalizada; la URL pedida queda como alias de la final.
+
+Un pedido puede querer sólo algunos componentes. Si todos los pedidos están
+frescos es un hit; si no, se calculan SÓLO los que faltan o vencieron y se
+combinan con los frescos (refresco parcial).
+
+También colapsa misses concurrentes: si llegan N pedidos por la misma URL
+(y los mismos componentes faltantes) mientras se está scrapeando, se hace
+UN solo scraping y todos reciben su resultado.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from common.cache import TTLCache, normalize_url
+
+SCRAPING_COMPONENTS = ("title", "links", "meta_tags", "structure", "images_count")
+PROCESSING_COMPONENTS = ("screenshot", "performance", "thumbnails")
+COMPONENTS = SCRAPING_COMPONENTS + PROCESSING_COMPONENTS
+METADATA_COMPONENTS = frozenset({"title", "meta_tags"})
+COMPONENT_ALIASES = {"meta": "meta_tags", "images": "images_count"}
+
+DEFAULT_TTLS = {
+    "title": 300.0,
+    "links": 300.0,
+    "meta_tags": 300.0,
+    "structure": 300.0,
+    "images_count": 300.0,
+    "screenshot": 120.0,
+    "performance": 60.0,
+    "thumbnails": 600.0,
+}
+
+
+class _LeaderCancelled(Exception):
+    """El pedido que calculaba el resultado fue cancelado: los que esperaban lo reintentan."""
+
+
+def parse_components(value: Any) -> FrozenSet[str]:
+    """
+    Interpreta el parámetro `components` (lista o texto separado por comas).
+    Vacío o None significa todos. Lanza ValueError si hay nombres desconocidos.
+    """
+    if value is None:
+        return frozenset(COMPONENTS)
+    names = value.split(",") if isinstance(value, str) else value
+    if not isinstance(names, (list, tuple)):
+        raise ValueError("components must be a list or a comma-separated string")
+
+    parsed = set()
+    for name in names:
+        name = str(name).strip().lower()
+        if not name:
+            continue
+        name = COMPONENT_ALIASES.get(name, name)
+        if name not in COMPONENTS:
+            valid = ", ".join(sorted(set(COMPONENTS) | set(COMPONENT_ALIASES)))
+            raise ValueError(f"Unknown component '{name}' (valid: {valid})")
+        parsed.add(name)
+    return frozenset(parsed) or frozenset(COMPONENTS)
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    """Tamaño aproximado de una entrada: lo que pesan screenshot y thumbnails."""
+    components = entry.get("components", {})
+    size = len(components.get("screenshot") or "")
+    size += sum(len(t) for t in components.get("thumbnails") or [] if isinstance(t, (str, bytes)))
+    size += sum(len(link) for link in components.get("links") or [])
+    return size + 1024
+
+
+def _is_error(value: Any) -> bool:
+    return isinstance(value, dict) and "error" in value
+
+
+def result_components(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Componentes presentes en un resultado de /scrape."""
+    components = {}
+    for section, names in (("scraping_data", SCRAPING_COMPONENTS), ("processing_data", PROCESSING_COMPONENTS)):
+        data = result.get(section, {})
+        components.update({name: data[name] for name in names if name in data})
+    return components
+
+
+def assemble_result(url: str, timestamp: Optional[str], components: Dict[str, Any],
+                    requested: Iterable[str] = COMPONENTS) -> Dict[str, Any]:
+    """Arma el JSON de /scrape con los componentes pedidos (mismo formato que el scraping)."""
+    requested = set(requested)
+    return {
+        "url": url,
+        "timestamp": timestamp,
+        "scraping_data": {name: components.get(name) for name in SCRAPING_COMPONENTS if name in requested},
+        "processing_data": {name: components.get(name) for name in PROCESSING_COMPONENTS if name in requested},
+        "status": "success"
+    }
+
+
+class ScrapeResultCache:
+    """Cache LRU/TTL de resultados de scraping, por componente."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: Optional[int] = 256 * 1024 * 1024,
+                 ttls: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.clock = clock
+        self.entries = TTLCache(max_entries, max_bytes, size_of=_entry_size, clock=clock)
+        self.aliases = TTLCache(max_entries * 4, clock=clock)
+        self._in_flight: Dict[Tuple[str, FrozenSet[str]], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.partial = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.entries.max_entries > 0
+
+    def _resolve(self, url: str) -> str:
+        key = normalize_url(url)
+        return self.aliases.get(key, count=False) or key
+
+    def _lookup(self, url: str) -> Tuple[Optional[Dict[str, Any]], FrozenSet[str]]:
+        """Devuelve (entrada, componentes frescos)."""
+        entry = self.entries.get(self._resolve(url), count=False)
+        if entry is None:
+            return None, frozenset()
+        now = self.clock()
+        fresh = frozenset(name for name, stored_at in entry["stored_at"].items()
+                          if now - stored_at < self.ttls[name])
+        return entry, fresh
+
+    def get(self, url: str, components: Iterable[str] = COMPONENTS) -> Optional[Dict[str, Any]]:
+        """Devuelve el resultado cacheado si TODOS los componentes pedidos siguen frescos."""
+        requested = frozenset(components)
+        entry, fresh = self._lookup(url)
+        if entry is None or not requested <= fresh:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return assemble_result(entry["url"], entry["timestamp"], entry["components"], requested)
+
+    def put(self, url: str, result: Dict[str, Any]):
+        """
+        Guarda los componentes de un resultado exitoso bajo su URL final (y la
+        pedida como alias), combinándolos con los que ya había.
+        """
+        if not self.enabled or result.get("status") != "success":
+            return
+
+        final_key = normalize_url(result.get("url") or url)
+        if final_key == normalize_url(url):
+            # Sin redirección conocida (ej. no hubo fetch): se respeta el alias existente
+            final_key = self._resolve(url)
+        new_components = result_components(result)
+        now = self.clock()
+
+        previous = self.entries.get(final_key, count=False)
+        entry = {
+            "url": result.get("url") or url,
+            "timestamp": result.get("timestamp"),
+            "components": dict(previous["components"]) if previous else {},
+            "stored_at": dict(previous["stored_at"]) if previous else {},
+        }
+        # Un componente que falló en el Servidor B se guarda ya vencido
+        for name, value in new_components.items():
+            entry["components"][name] = value
+            entry["stored_at"][name] = float("-inf") if _is_error(value) else now
+
+        ttl = max(self.ttls.values())
+        self.entries.put(final_key, entry, ttl)
+
+        requested_key = normalize_url(url)
+        if requested_key != final_key:
+            self.aliases.put(requested_key, final_key, ttl)
+
+    async def get_or_compute(self, url: str,
+                             compute: Callable[[FrozenSet[str]], Awaitable[Dict[str, Any]]],
+                             components: Iterable[str] = COMPONENTS) -> Tuple[Dict[str, Any], str]:
+        """
+        Devuelve (resultado, origen) donde origen es 'hit', 'partial' (se
+        recalcularon sólo algunos componentes), 'coalesced' o 'miss'.
+        `compute` recibe el conjunto de componentes que hay que calcular.
+        """
+        requested = frozenset(components)
+        entry, fresh = self._lookup(url)
+        if entry is not None and requested <= fresh:
+            self.hits += 1
+            return assemble_result(entry["url"], entry["timestamp"], entry["components"], requested), "hit"
+
+        missing = requested - fresh
+        reused = requested & fresh
+        key = (normalize_url(url), missing)
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                result = await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # La cancelación era del otro pedido, no de éste: se calcula de nuevo
+                self.coalesced -= 1
+                return await self.get_or_compute(url, compute, requested)
+            return self._combine(entry, reused, result, requested), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute(missing)
+            self.put(url, result)
+            future.set_result(result)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # evita el warning si nadie más esperaba
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        if reused:
+            self.partial += 1
+            return self._combine(entry, reused, result, requested), "partial"
+        self.misses += 1
+        return self._combine(None, reused, result, requested), "miss"
+
+    def _combine(self, entry: Optional[Dict[str, Any]], reused: FrozenSet[str],
+                 result: Dict[str, Any], requested: FrozenSet[str]) -> Dict[str, Any]:
+        """Junta los componentes frescos de la cache con los recién calculados."""
+        if not reused or entry is None:
+            return assemble_result(result.get("url"), result.get("timestamp"),
+                                   result_components(result), requested)
+        components = {name: entry["components"][name] for name in reused}
+        components.update(result_components(result))
+        return assemble_result(result.get("url") or entry["url"], result.get("timestamp"),
+                               components, requested)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.entries.stats()
+        stats["hits"] = self.hits
+        stats["misses"] = self.misses
+        stats["partial"] = self.partial
+        stats["coalesced"] = self.coalesced
+        stats["in_flight"] = len(self._in_flight)
+        return stats
@@ -1,100 +1,470 @@
 """
-Parte B: Servidor de Procesamiento con Multiprocessing y SocketServer.
+Parte B: Servidor de Procesamiento con Multiprocessing y asyncio.
+
+El front-end de red es un único event loop (asyncio): cada conexión se
+atiende con una corrutina sobre un socket no bloqueante (loop.sock_*, los
+payloads se reciben directo en su buffer) y las tareas se envían al Pool
+con apply_async.
+Los callbacks del Pool completan Futures del loop, por lo que ningún hilo
+queda bloqueado esperando una tarea. La cantidad de tareas en vuelo está
+acotada por un semáforo (backlog), no por la cantidad de hilos.
+
+Cada tipo de tarea corre en su propio carril (`TaskLane`): un Pool de
+procesos dedicado con su propio tope de tareas en vuelo. Así un análisis de
+performance no espera detrás de screenshots de 30 segundos: los screenshots
+sólo saturan sus propios procesos.
+
+Los requests traen el tiempo que le queda al Servidor A antes de
+abandonarlos (deadline). Una tarea vencida no se ejecuta: se descarta si
+venció esperando su carril, `run_task` la rechaza si venció en la cola del
+Pool, y los screenshots limitan la carga de la página al tiempo restante
+(el navegador que se pasa se descarta). Las respuestas vencidas no se envían.
+
+Los workers se reciclan: cada uno sale tras `--max-tasks-per-child` tareas
+(maxtasksperchild) y cada respuesta del Pool trae el RSS del worker. Si uno
+supera `--max-worker-mb`, su carril pasa a un Pool nuevo y el viejo se
+cierra ordenadamente (termina lo que tenía y sus procesos salen). Se
+reemplaza el Pool entero, no sólo ese worker, a propósito: multiprocessing.Pool
+no permite que un worker salga entre tareas salvo por maxtasksperchild, y
+matarlo desde afuera no es seguro (un worker ocioso puede tener tomado el
+lock de lectura de la cola de tareas y el Pool quedaría trabado). TASK_STATS
+devuelve el estado de carriles y workers sin pasar por el Pool, junto con
+los histogramas de espera por carril, duración por tipo de tarea y
+serialización.
 """
 
-import socketserver
+import asyncio
 import multiprocessing
 import argparse
+import functools
+import os
+import resource
 import sys
 import socket
-from typing import Tuple, Dict, Any
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 
 from common.protocol import (
-    ProtocolHandler, 
-    TASK_SCREENSHOT, TASK_PERFORMANCE, TASK_IMAGES,
+    ProtocolHandler, ProtocolException, Frame,
+    TASK_SCREENSHOT, TASK_PERFORMANCE, TASK_IMAGES, TASK_STATS, TASK_NAMES,
     RESP_SUCCESS, RESP_ERROR
 )
 from common import ProcessingError, TaskTimeoutError, ProtocolError
+from common.serialization import CODEC_BINARY
+from common.metrics import MetricsRegistry
+from common.screenshot_options import parse_screenshot_options
 
 from processor import screenshot, performance, image_processor
 
-mp_pool = None
+class TaskSpec(NamedTuple):
+    """Función que resuelve un tipo de tarea y el carril (Pool) en el que corre."""
+    func: Callable[..., Any]
+    lane: str
+
 
 TASK_MAP = {
-    TASK_SCREENSHOT: screenshot.take_screenshot,
-    TASK_PERFORMANCE: performance.analyze_performance,
-    TASK_IMAGES: image_processor.process_images,
+    TASK_SCREENSHOT: TaskSpec(screenshot.take_screenshot, "screenshot"),
+    TASK_PERFORMANCE: TaskSpec(performance.analyze_performance, "performance"),
+    TASK_IMAGES: TaskSpec(image_processor.process_images, "images"),
 }
 
-def run_task(msg_type: int, payload: Dict[str, Any]) -> Any:
+# Procesos por carril; None usa el tamaño de -n/--processes
+DEFAULT_LANE_PROCESSES = {"screenshot": None, "performance": 1, "images": 1}
+MAX_TASKS_PER_CHILD = 200
+MAX_WORKER_RSS_MB = 1024
+THUMB_CACHE_DIR = os.path.join(tempfile.gettempdir(), "tp2-thumbnails")
+THUMB_CACHE_MB = 256
+
+_tasks_done = 0  # tareas atendidas por este worker (vive en cada proceso del Pool)
+
+
+class WorkerReply(NamedTuple):
+    """Resultado (o error) de una tarea más el estado del worker que la corrió."""
+    value: Any
+    error: Optional[BaseException]
+    pid: int
+    rss_bytes: int
+    tasks: int
+
+
+def current_rss() -> int:
+    """RSS actual del proceso en bytes (el pico de RSS si no hay /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def run_task(msg_type: int, payload: Dict[str, Any], raw_bytes: bool = False,
+             deadline: Optional[float] = None) -> Any:
     """
     Función única que el Pool ejecuta.
+    Con raw_bytes=True (codec binario) las imágenes se devuelven como bytes
+    crudos en lugar de base64. `deadline` es un instante de time.time() (el
+    reloj de pared se puede comparar entre procesos): si ya pasó, la tarea
+    no se ejecuta.
     """
-    task_func = TASK_MAP.get(msg_type)
-    if not task_func:
+    spec = TASK_MAP.get(msg_type)
+    if not spec:
         raise ValueError(f"Tipo de tarea desconocido: {msg_type}")
+    task_func = spec.func
+
+    remaining = None
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TaskTimeoutError(f"Deadline vencido hace {-remaining:.1f}s en la cola del Pool")
 
     if msg_type == TASK_IMAGES:
-        return task_func(payload.get('image_urls', []))
+        if remaining is not None:
+            return task_func(payload.get('image_urls', []), as_bytes=raw_bytes,
+                             total_timeout=min(image_processor.TOTAL_TIMEOUT, remaining))
+        return task_func(payload.get('image_urls', []), as_bytes=raw_bytes)
+    elif msg_type == TASK_PERFORMANCE:
+        url = payload.get('url')
+        if not url:
+            raise ValueError("Payload no contiene 'url'")
+        return task_func(url, payload.get('page_stats'))
     else:
         url = payload.get('url')
         if not url:
             raise ValueError("Payload no contiene 'url'")
-        return task_func(url)
+        options = parse_screenshot_options(payload.get('options') or {}, prefix="")
+        return task_func(url, as_bytes=raw_bytes, deadline=deadline, options=options)
+
+
+def run_task_in_worker(msg_type: int, payload: Dict[str, Any], raw_bytes: bool = False,
+                       deadline: Optional[float] = None) -> WorkerReply:
+    """Lo que ejecuta el Pool: corre run_task y adjunta memoria y tareas del worker."""
+    global _tasks_done
+    _tasks_done += 1
+    try:
+        value, error = run_task(msg_type, payload, raw_bytes, deadline), None
+    except Exception as e:
+        value, error = None, e
+    return WorkerReply(value, error, os.getpid(), current_rss(), _tasks_done)
 
 
-class TaskHandler(socketserver.BaseRequestHandler):
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TaskLane:
+    """Pool de procesos dedicado a uno o más tipos de tarea, con su propio tope en vuelo."""
+
+    def __init__(self, name: str, pool: multiprocessing.Pool, processes: int, max_pending: int,
+                 pool_factory: Optional[Callable[[], multiprocessing.Pool]] = None,
+                 max_rss_bytes: Optional[int] = None):
+        self.name = name
+        self.pool = pool
+        self.processes = processes
+        self.max_pending = max_pending
+        self.pool_factory = pool_factory
+        self.max_rss_bytes = max_rss_bytes
+        self.workers: Dict[int, Dict[str, Any]] = {}
+        self.recycles = 0
+        self._retired: List[threading.Thread] = []
+        self.slots = asyncio.Semaphore(max_pending)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        self.wait_avg = 0.0
+        self.service_avg = 0.0
+
+    def record(self, wait: float, service: float, ok: bool):
+        """Actualiza los promedios móviles de espera y servicio del carril."""
+        first = not (self.completed + self.failed)
+        self.wait_avg = wait if first else 0.9 * self.wait_avg + 0.1 * wait
+        self.service_avg = service if first else 0.9 * self.service_avg + 0.1 * service
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def observe(self, reply: WorkerReply, pool: multiprocessing.Pool):
+        """Registra el estado del worker y recicla el Pool si superó el techo de memoria."""
+        if pool is not self.pool:
+            return  # viene de un Pool ya retirado
+        self.workers[reply.pid] = {"rss_mb": round(reply.rss_bytes / 2**20, 1), "tasks": reply.tasks}
+        if self.max_rss_bytes and reply.rss_bytes > self.max_rss_bytes:
+            self.recycle(f"el worker {reply.pid} usa {reply.rss_bytes / 2**20:.0f} MB")
+
+    def recycle(self, reason: str):
+        """
+        Pasa a un Pool nuevo. El viejo se cierra: termina las tareas que ya
+        tenía y sus procesos salen, así ninguna tarea se pierde.
+
+        Se descartan también los workers sanos (y en el carril de screenshots,
+        su Chrome ya abierto): es el costo de no matar un worker suelto, que
+        podría estar bloqueado en la cola del Pool con su lock tomado. El
+        desgaste normal lo cubre maxtasksperchild, worker por worker.
+        """
+        if self.pool_factory is None:
+            return
+        print(f"[ProcServer] Reciclando el carril '{self.name}': {reason}.")
+        old, self.pool = self.pool, self.pool_factory()
+        self.workers.clear()
+        self.recycles += 1
+        old.close()
+        joiner = threading.Thread(target=old.join, name=f"retire-{self.name}", daemon=True)
+        joiner.start()
+        self._retired = [t for t in self._retired if t.is_alive()] + [joiner]
+
+    def close(self):
+        """Cierra el Pool del carril y espera a sus procesos (y a los de Pools retirados)."""
+        self.pool.close()
+        self.pool.join()
+        for joiner in self._retired:
+            joiner.join()
+
+    def stats(self) -> Dict[str, Any]:
+        self.workers = {pid: info for pid, info in self.workers.items() if _pid_alive(pid)}
+        return {
+            "processes": self.processes,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired,
+            "wait_avg_ms": round(self.wait_avg * 1000, 1),
+            "service_avg_ms": round(self.service_avg * 1000, 1),
+            "recycles": self.recycles,
+            "max_rss_mb": round(self.max_rss_bytes / 2**20) if self.max_rss_bytes else None,
+            "workers": [dict(info, pid=pid) for pid, info in sorted(self.workers.items())],
+        }
+
+
+class ProcessingServer:
     """
-    Handler para cada conexión de socket. Se ejecuta en un HILO separado.
+    Front-end asíncrono del Servidor B.
+
+    Lee frames de cada conexión persistente, los despacha al carril de su
+    tipo de tarea sin bloquear y responde con el mismo request_id apenas
+    cada tarea termina. Cuando el backlog global está lleno deja de leer del
+    socket, lo que aplica backpressure por TCP al Servidor A; dentro del
+    backlog, cada carril sólo ejecuta hasta su propio tope.
+
+    `pool` atiende los tipos de tarea sin carril propio en `lanes` (puede
+    ser None si todos lo tienen).
     """
-    
-    def handle(self):
-        print(f"[ProcServer] Conexión recibida de {self.client_address}")
-        proto = ProtocolHandler()
-        
+
+    def __init__(self, pool: Optional[multiprocessing.Pool], max_in_flight: int,
+                 lanes: Optional[Dict[str, TaskLane]] = None):
+        self.max_in_flight = max_in_flight
+        self.metrics = MetricsRegistry()
+        self._lane_wait_seconds = self.metrics.histogram(
+            "processing_lane_wait_seconds", "Espera por un lugar en el carril", ("lane",))
+        self._task_seconds = self.metrics.histogram(
+            "processing_task_seconds", "Duración de cada tarea en el Pool (incluye IPC)", ("task",))
+        self._tasks_total = self.metrics.counter(
+            "processing_tasks_total", "Tareas por tipo y resultado", ("task", "outcome"))
+        self.proto = ProtocolHandler(metrics=self.metrics)
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.lanes: Dict[str, TaskLane] = dict(lanes or {})
+        if pool is not None:
+            self.lanes.setdefault("default", TaskLane("default", pool, 0, max_in_flight))
+
+    def lane_for(self, msg_type: int) -> TaskLane:
+        """Carril que corre un tipo de tarea (el 'default' si no tiene uno propio)."""
+        spec = TASK_MAP.get(msg_type)
+        lane = self.lanes.get(spec.lane) if spec else None
+        if lane is None:
+            lane = self.lanes.get("default")
+        if lane is None:
+            raise ValueError(f"Tipo de tarea desconocido: {msg_type}")
+        return lane
+
+    def lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Respuesta de TASK_STATS: backlog global y estado de cada carril y sus workers."""
+        return {
+            "pid": os.getpid(),
+            "max_in_flight": self.max_in_flight,
+            "lanes": self.lane_stats(),
+            "metrics": self.metrics.snapshot(),
+        }
+
+    async def serve_forever(self, listen_sock: socket.socket):
+        """Acepta conexiones del socket de escucha y atiende cada una en una corrutina."""
+        loop = asyncio.get_running_loop()
+        connections = set()
+        while True:
+            conn, client_address = await loop.sock_accept(listen_sock)
+            conn.setblocking(False)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            task = asyncio.create_task(self.handle_connection(conn, client_address))
+            connections.add(task)
+            task.add_done_callback(connections.discard)
+
+    async def handle_connection(self, conn: socket.socket, client_address: Any):
+        print(f"[ProcServer] Conexión recibida de {client_address}")
+        send_lock = asyncio.Lock()
+        tasks = set()
+
+        try:
+            while True:
+                await self.slots.acquire()
+                try:
+                    frame = await self.proto.async_sock_read_frame(conn)
+                except (ProtocolException, ProtocolError, OSError) as e:
+                    self.slots.release()
+                    print(f"[ProcServer] Fin de la conexión: {e}")
+                    break
+
+                deadline = None
+                if frame.deadline_ms is not None:
+                    deadline = time.time() + frame.deadline_ms / 1000
+                print(f"[ProcServer] Tarea {frame.msg_type} (id={frame.request_id}) recibida para: {frame.payload.get('url')}")
+                task = asyncio.create_task(self._dispatch(conn, send_lock, frame, deadline))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            # Las tareas pendientes siguen ocupando su lugar en el backlog
+            # hasta que el Pool las termine; su respuesta se descarta.
+            conn.close()
+            print(f"[ProcServer] Conexión cerrada con {client_address}")
+
+    async def _dispatch(self, conn: socket.socket, send_lock: asyncio.Lock, frame: Frame,
+                        deadline: Optional[float] = None):
+        """Ejecuta una tarea en el Pool y envía su respuesta (o error) con el codec del request."""
         try:
-            msg_type, payload = proto.sync_read_message(self.request)
-            
-            print(f"[ProcServer] Tarea {msg_type} recibida para: {payload.get('url')}")
-            
-            result = mp_pool.apply(run_task, args=(msg_type, payload))
-            
-            print(f"[ProcServer] Tarea {msg_type} completada. Enviando respuesta.")
-            proto.sync_send_message(self.request, RESP_SUCCESS, {"data": result})
+            if frame.msg_type == TASK_STATS:
+                result = self.stats()
+            else:
+                result = await self._run_in_lane(frame.msg_type, frame.payload, frame.codec == CODEC_BINARY, deadline)
+            print(f"[ProcServer] Tarea {frame.msg_type} (id={frame.request_id}) completada. Enviando respuesta.")
+            await self._send(conn, send_lock, RESP_SUCCESS, {"data": result}, frame, deadline)
 
         except (ProcessingError, TaskTimeoutError, ValueError) as e:
             print(f"[ProcServer] Error de Tarea: {e}")
-            self._send_error(proto, f"Error de Tarea: {e}")
-        
-        except ProtocolError as e:
-            print(f"[ProcServer] Error de Protocolo: {e}")
-        
+            await self._send(conn, send_lock, RESP_ERROR, {"error": f"Error de Tarea: {e}"}, frame, deadline)
+
+        except asyncio.CancelledError:
+            raise
+
         except Exception as e:
             print(f"[ProcServer] Error interno inesperado: {e}")
-            self._send_error(proto, f"Error interno del servidor: {e}")
-        
-        print(f"[ProcServer] Conexión cerrada con {self.client_address}")
+            await self._send(conn, send_lock, RESP_ERROR, {"error": f"Error interno del servidor: {e}"}, frame, deadline)
+
+        finally:
+            self.slots.release()
 
-    def _send_error(self, proto: ProtocolHandler, error_msg: str):
-        """Intenta enviar un mensaje de error al cliente si es posible."""
+    async def _run_in_lane(self, msg_type: int, payload: Dict[str, Any], raw_bytes: bool = False,
+                           deadline: Optional[float] = None) -> Any:
+        """
+        Espera un lugar en el carril del tipo de tarea y la ejecuta en su Pool.
+        Si el deadline vence mientras espera, la tarea se abandona sin ejecutarse.
+        """
+        lane = self.lane_for(msg_type)
+        task = TASK_NAMES.get(msg_type, str(msg_type))
+        queued_at = time.monotonic()
+        lane.waiting += 1
         try:
-            proto.sync_send_message(self.request, RESP_ERROR, {"error": error_msg})
-        except Exception as se:
-            print(f"[ProcServer] No se pudo enviar mensaje de error (conexión cerrada?): {se}")
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            await asyncio.wait_for(lane.slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            lane.expired += 1
+            self._tasks_total.inc(task=task, outcome="expired")
+            raise TaskTimeoutError("Deadline vencido esperando un proceso libre") from None
+        finally:
+            lane.waiting -= 1
 
+        started = time.monotonic()
+        self._lane_wait_seconds.observe(started - queued_at, lane=lane.name)
+        lane.running += 1
+        outcome = "error"
+        try:
+            pool = lane.pool
+            reply = await self._submit(pool, msg_type, payload, raw_bytes, deadline)
+            lane.observe(reply, pool)
+            if reply.error is not None:
+                raise reply.error
+            outcome = "success"
+            return reply.value
+        except TaskTimeoutError:
+            lane.expired += 1
+            outcome = "expired"
+            raise
+        finally:
+            service = time.monotonic() - started
+            lane.running -= 1
+            lane.slots.release()
+            lane.record(started - queued_at, service, outcome == "success")
+            self._task_seconds.observe(service, task=task)
+            self._tasks_total.inc(task=task, outcome=outcome)
 
-class ProcessingTCPServer(socketserver.ThreadingTCPServer):
-    allow_reuse_address = True
-    
-    def __init__(self, server_address: Tuple[str, int], RequestHandlerClass: Any, pool: multiprocessing.Pool):
-        super().__init__(server_address, RequestHandlerClass)
-        self.mp_pool = pool
+    def _submit(self, pool: multiprocessing.Pool, msg_type: int, payload: Dict[str, Any],
+                raw_bytes: bool = False, deadline: Optional[float] = None) -> asyncio.Future:
+        """
+        Envía la tarea al Pool con apply_async y devuelve un Future del loop.
+        Los callbacks corren en el hilo de resultados del Pool, por eso se
+        usa call_soon_threadsafe para completar el Future.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def _set_result(result: Any):
+            if not future.done():
+                future.set_result(result)
+
+        def _set_exception(error: BaseException):
+            if not future.done():
+                future.set_exception(error)
+
+        pool.apply_async(
+            run_task_in_worker, args=(msg_type, payload, raw_bytes, deadline),
+            callback=lambda result: loop.call_soon_threadsafe(_set_result, result),
+            error_callback=lambda error: loop.call_soon_threadsafe(_set_exception, error)
+        )
+        return future
+
+    async def _send(self, conn: socket.socket, send_lock: asyncio.Lock,
+                    msg_type: int, payload: Dict[str, Any], request: Frame,
+                    deadline: Optional[float] = None):
+        """Envía una respuesta; si el Servidor A ya no escucha (o ya la abandonó), solo lo registra."""
+        if conn.fileno() == -1:
+            print(f"[ProcServer] Respuesta id={request.request_id} descartada: la conexión ya se cerró.")
+            return
+        if deadline is not None and time.time() > deadline:
+            print(f"[ProcServer] Respuesta id={request.request_id} descartada: el deadline ya venció.")
+            return
+        try:
+            async with send_lock:
+                await self.proto.async_sock_send_message(conn, msg_type, payload, request.request_id, request.codec)
+        except (ProtocolException, OSError) as e:
+            print(f"[ProcServer] No se pudo enviar la respuesta (conexión cerrada?): {e}")
+
+
+def create_listening_socket(ip: str, port: int) -> socket.socket:
+    """
+    Crea el socket de escucha respetando la familia que resuelve getaddrinfo.
+    En IPv6 se desactiva IPV6_V6ONLY para mantener el modo dual-stack.
+    """
+    addr_info = socket.getaddrinfo(ip, port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
+    family, socktype, proto, _, server_address = addr_info[0]
 
-    def server_close(self):
-        print("[ProcServer] Cerrando pool de procesos...")
-        self.mp_pool.close()
-        self.mp_pool.join()
-        super().server_close()
+    sock = socket.socket(family, socktype, proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if family == socket.AF_INET6 and hasattr(socket, 'IPV6_V6ONLY'):
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+    sock.bind(server_address)
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
 
 
 def parse_args():
@@ -104,44 +474,124 @@ def parse_args():
     )
     parser.add_argument('-i', '--ip', type=str, required=True, help='Dirección de escucha (ej: 0.0.0.0 o ::)')
     parser.add_argument('-p', '--port', type=int, required=True, help='Puerto de escucha')
-    parser.add_argument('-n', '--processes', type=int, default=None, help=f'Número de procesos en el pool (default: {multiprocessing.cpu_count()})')
+    parser.add_argument('-n', '--processes', type=int, default=None, help=f'Procesos del carril de screenshots (default: {multiprocessing.cpu_count()})')
+    parser.add_argument('--screenshot-max-pages', type=int, default=screenshot.MAX_PAGES_PER_DRIVER, help='Páginas que sirve cada navegador antes de reciclarse (default: %(default)s)')
+    parser.add_argument('--max-pending', type=int, default=None, help='Máximo de tareas en vuelo entre todos los carriles (default: suma de los topes de los carriles)')
+    parser.add_argument('--lanes', type=str, default=None, metavar='CARRIL=PROCS,...',
+                        help='Procesos por carril, ej: screenshot=4,performance=1,images=2 '
+                             '(default: screenshot=-n, performance=1, images=1)')
+    parser.add_argument('--lane-pending', type=int, default=4, help='Tareas en vuelo por proceso de cada carril (default: %(default)s)')
+    parser.add_argument('--max-tasks-per-child', type=int, default=MAX_TASKS_PER_CHILD, help='Tareas que atiende un worker antes de ser reemplazado, 0 = sin límite (default: %(default)s)')
+    parser.add_argument('--max-worker-mb', type=int, default=MAX_WORKER_RSS_MB, help='RSS de un worker que dispara el reciclado de su carril, 0 = sin límite (default: %(default)s)')
+    parser.add_argument('--thumb-cache-dir', type=str, default=THUMB_CACHE_DIR, help='Directorio de la cache de thumbnails compartida por los workers (default: %(default)s)')
+    parser.add_argument('--thumb-cache-mb', type=int, default=THUMB_CACHE_MB, help='Tamaño máximo de la cache de thumbnails, 0 = desactivada (default: %(default)s)')
     return parser.parse_args()
 
 
+def parse_lane_sizes(value: Optional[str], default_processes: int) -> Dict[str, int]:
+    """Interpreta --lanes ('carril=procesos,...') sobre los tamaños por defecto."""
+    sizes = {name: procs or default_processes for name, procs in DEFAULT_LANE_PROCESSES.items()}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        name, _, procs = item.partition("=")
+        name = name.strip()
+        if name not in sizes:
+            raise ValueError(f"Carril desconocido '{name}' (válidos: {', '.join(sizes)})")
+        try:
+            sizes[name] = int(procs)
+        except ValueError:
+            raise ValueError(f"Cantidad de procesos inválida para '{name}': {procs!r}") from None
+        if sizes[name] < 1:
+            raise ValueError(f"El carril '{name}' necesita al menos 1 proceso")
+    return sizes
+
+
+def init_worker(screenshot_max_pages: int, thumb_cache_dir: Optional[str], thumb_cache_mb: int):
+    """Initializer del Pool: configura el navegador y la cache de thumbnails del worker."""
+    screenshot.configure(screenshot_max_pages)
+    image_processor.configure_cache(thumb_cache_dir, thumb_cache_mb * 2**20)
+
+
+def create_pool(processes: int, screenshot_max_pages: int, max_tasks_per_child: Optional[int],
+                thumb_cache_dir: Optional[str] = None, thumb_cache_mb: int = 0) -> multiprocessing.Pool:
+    """Crea el Pool de un carril; sus workers se reemplazan cada `max_tasks_per_child` tareas."""
+    return multiprocessing.Pool(
+        processes=processes,
+        initializer=init_worker,
+        initargs=(screenshot_max_pages, thumb_cache_dir, thumb_cache_mb),
+        maxtasksperchild=max_tasks_per_child or None
+    )
+
+
+def create_lanes(sizes: Dict[str, int], lane_pending: int, screenshot_max_pages: int,
+                 max_tasks_per_child: Optional[int], max_worker_mb: Optional[int],
+                 thumb_cache_dir: Optional[str] = None, thumb_cache_mb: int = 0) -> Dict[str, TaskLane]:
+    """Crea un carril (con su Pool) por cada entrada de `sizes`."""
+    lanes = {}
+    for name, procs in sizes.items():
+        factory = functools.partial(create_pool, procs, screenshot_max_pages, max_tasks_per_child,
+                                    thumb_cache_dir, thumb_cache_mb)
+        lanes[name] = TaskLane(name, factory(), procs, procs * lane_pending, pool_factory=factory,
+                               max_rss_bytes=max_worker_mb * 2**20 if max_worker_mb else None)
+    return lanes
+
+
+async def serve(sock: socket.socket, lanes: Dict[str, TaskLane], max_in_flight: int):
+    """Atiende conexiones en el event loop hasta que se interrumpa."""
+    processing_server = ProcessingServer(None, max_in_flight, lanes)
+    await processing_server.serve_forever(sock)
+
+
 def main():
-    global mp_pool 
     args = parse_args()
     
     try:
-        addr_info = socket.getaddrinfo(args.ip, args.port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
-        family = addr_info[0][0]
-        server_address = addr_info[0][4]
+        sock = create_listening_socket(args.ip, args.port)
     except socket.gaierror as e:
         print(f"Error resolviendo dirección {args.ip}: {e}")
         sys.exit(1)
+    except OSError as e:
+        print(f"Error de OS al abrir {args.ip}:{args.port}: {e}")
+        sys.exit(1)
 
-    ProcessingTCPServer.address_family = family
     pool_size = args.processes or multiprocessing.cpu_count()
+    try:
+        sizes = parse_lane_sizes(args.lanes, pool_size)
+    except ValueError as e:
+        print(f"Error en --lanes: {e}")
+        sys.exit(2)
+    max_in_flight = args.max_pending or sum(sizes.values()) * args.lane_pending
     
     try:
         multiprocessing.set_start_method('spawn', force=True)
     except RuntimeError:
         pass 
         
-    mp_pool = multiprocessing.Pool(processes=pool_size)
+    lanes = create_lanes(sizes, args.lane_pending, args.screenshot_max_pages,
+                         args.max_tasks_per_child, args.max_worker_mb,
+                         args.thumb_cache_dir, args.thumb_cache_mb)
     
     print("=" * 60)
     print("Servidor de Procesamiento (Parte B)")
-    print(f"Iniciando en: {server_address} (Familia: {family})")
-    print(f"Tamaño del Pool de Procesos: {pool_size}")
+    print(f"Iniciando en: {sock.getsockname()} (Familia: {sock.family})")
+    print("Carriles: " + ", ".join(f"{name}={procs} procesos" for name, procs in sizes.items()))
+    print(f"Máximo de tareas en vuelo: {max_in_flight} ({args.lane_pending} por proceso en cada carril)")
+    print(f"Reciclado de workers: cada {args.max_tasks_per_child or '∞'} tareas o al superar "
+          f"{args.max_worker_mb or '∞'} MB")
+    if args.thumb_cache_mb > 0:
+        print(f"Cache de thumbnails: {args.thumb_cache_dir} (hasta {args.thumb_cache_mb} MB)")
     print("=" * 60)
     
     try:
-        with ProcessingTCPServer(server_address, TaskHandler, mp_pool) as server:
-            server.serve_forever()
+        asyncio.run(serve(sock, lanes, max_in_flight))
     except KeyboardInterrupt:
         print("\n[ProcServer] Apagando servidor...")
-        server.shutdown()
+    finally:
+        print("[ProcServer] Cerrando pools de procesos...")
+        for lane in lanes.values():
+            lane.close()
+        sock.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
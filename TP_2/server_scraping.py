@@ -1,129 +1,251 @@
 """
 Parte A: Servidor de Scraping Web Asíncrono (aiohttp).
+
+Con `-w N` (N > 1) el proceso principal queda como supervisor y lanza N
+procesos worker, cada uno con su propio event loop escuchando en el mismo
+puerto con SO_REUSEPORT (el kernel reparte las conexiones). Si un worker
+muere, el supervisor lo relanza. Las tareas de /scrape/async se guardan en
+un SQLite compartido, así cualquier worker responde /status y /result.
+
+Cada etapa del pipeline (fetch, parsing, ida y vuelta de cada TASK_*,
+espera en la cola, serialización) se mide con histogramas que `GET /metrics`
+expone en formato de texto de Prometheus (por worker).
+
+`/status` y `/result` aceptan ?wait=N (long-polling) y `/status/{id}/events`
+es un stream SSE: ambos responden en cuanto la tarea termina.
 """
 
 import asyncio
 import argparse
+import json
+import multiprocessing
+import os
+import signal
 import sys
 import socket
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
 from aiohttp import web
 
 from common.protocol import (
-    ProtocolHandler, TASK_SCREENSHOT, TASK_PERFORMANCE, TASK_IMAGES,
+    TASK_SCREENSHOT, TASK_PERFORMANCE, TASK_IMAGES, TASK_STATS, TASK_NAMES,
     RESP_SUCCESS, RESP_ERROR
 )
 from common import ScrapingError, TaskTimeoutError, ProtocolError
+from common.cache import normalize_url
+from common.connection_pool import ProcessingConnectionPool
+from common.metrics import MetricsRegistry
+from common.screenshot_options import ScreenshotOptions, parse_screenshot_options
+from common.serialization import CODEC_BINARY, CODEC_NAMES, bytes_to_base64
+
+from common.work_queue import BoundedWorkQueue
+from common.task_events import TaskEvents, TASK_RECHECK_INTERVAL
+from common.task_store import (
+    MemoryTaskStore, SQLiteTaskStore, TaskStore,
+    STATUS_SCRAPING, STATUS_COMPLETED, STATUS_FAILED, STATUS_EXPIRED, FINISHED_STATUSES
+)
 
 from scraper.async_http import AsyncHTTPClient 
-from scraper.html_parser import parse_basic_data
-from scraper.metadata_extractor import extract_metadata
+from scraper.http_cache import HTTPCache
+from scraper.parser_pool import ParserPool, INLINE_THRESHOLD, SUMMARY_CACHE_SIZE
+from scraper.result_cache import (
+    ScrapeResultCache, DEFAULT_TTLS, COMPONENTS, SCRAPING_COMPONENTS, METADATA_COMPONENTS,
+    assemble_result, parse_components
+)
+
+# Componentes que requieren descargar y parsear la página
+PAGE_COMPONENTS = frozenset(SCRAPING_COMPONENTS) | {"performance", "thumbnails"}
+
+# Tope de ?wait= (long-polling) y cada cuánto el stream SSE manda un keepalive
+MAX_TASK_WAIT = 60.0
+SSE_KEEPALIVE = 15.0
 
 
 async def on_startup(app: web.Application):
     """Señal que se ejecuta cuando el servidor arranca."""
     print("[AsyncServer] Servidor arrancando...")
-    http_client = AsyncHTTPClient(timeout=30)
-    await http_client.create_session()
-    app['http_client'] = http_client
-    app['tasks_db'] = {}  
-    print("[AsyncServer] Cliente HTTP (aiohttp) y DB de tareas listos.")
+    await app['http_client'].create_session()
+    app['job_queue'].start()
+    print(f"[AsyncServer] Cliente HTTP (aiohttp) y almacén de tareas ({type(app['task_store']).__name__}) listos.")
 
 async def on_cleanup(app: web.Application):
     """Señal que se ejecuta cuando el servidor se apaga."""
     print("[AsyncServer] Servidor apagándose...")
+    if 'job_queue' in app:
+        await app['job_queue'].stop()
     if 'http_client' in app:
         await app['http_client'].close_session()
         print("[AsyncServer] Cliente HTTP (aiohttp) cerrado.")
+    if 'coordinator' in app:
+        await app['coordinator'].close()
+        print("[AsyncServer] Conexiones con Servidor B cerradas.")
+    if 'task_store' in app:
+        await app['task_store'].close()
+        print("[AsyncServer] Almacén de tareas cerrado.")
 
 
 class ScrapingCoordinator:
     """Maneja la lógica de scraping y coordinación."""
     
-    def __init__(self, proc_host: str, proc_port: int):
+    def __init__(self, proc_host: str, proc_port: int, proc_connections: int = 2,
+                 proc_codec: int = CODEC_BINARY, result_cache: Optional[ScrapeResultCache] = None,
+                 parser_pool: Optional[ParserPool] = None, batch_concurrency: int = 8,
+                 batch_max_urls: int = 10000, metrics: Optional[MetricsRegistry] = None):
         self.proc_host = proc_host
         self.proc_port = proc_port
-        self.proto = ProtocolHandler()
-        print(f"[AsyncServer] Coordinador listo. Procesador en: {proc_host}:{proc_port}")
+        self.result_cache = result_cache
+        self.parser_pool = parser_pool or ParserPool(workers=0)
+        self.batch_concurrency = batch_concurrency
+        self.batch_max_urls = batch_max_urls
+        self.metrics = metrics or MetricsRegistry()
+        self.task_events = TaskEvents()
+        self._requests_total = self.metrics.counter(
+            "scrape_requests_total", "Scrapings por endpoint y resultado (origen de cache o error)", ("endpoint", "result"))
+        self._request_seconds = self.metrics.histogram(
+            "scrape_request_seconds", "Duración total de un scraping por endpoint", ("endpoint",))
+        self._stage_seconds = self.metrics.histogram(
+            "scrape_stage_seconds", "Duración de cada etapa del scraping en el Servidor A", ("stage",))
+        self._processing_seconds = self.metrics.histogram(
+            "processing_roundtrip_seconds", "Ida y vuelta de cada tarea al Servidor B", ("task",))
+        self._processing_total = self.metrics.counter(
+            "processing_requests_total", "Tareas enviadas al Servidor B por resultado", ("task", "outcome"))
+        self.proc_pool = ProcessingConnectionPool(
+            proc_host, proc_port, size=proc_connections, connect_timeout=10.0, codec=proc_codec,
+            metrics=self.metrics
+        )
+        print(f"[AsyncServer] Coordinador listo. Procesador en: {proc_host}:{proc_port} "
+              f"({proc_connections} conexiones persistentes, codec {proc_codec})")
+
+    async def close(self):
+        """Cierra las conexiones persistentes con el Servidor B y el pool de parsing."""
+        await self.proc_pool.close()
+        self.parser_pool.close()
 
     async def _request_processing(self, task_type: int, payload: Dict[str, Any]) -> Optional[Any]:
-        """Función genérica para enviar una tarea al Servidor B."""
-        writer = None
+        """
+        Función genérica para enviar una tarea al Servidor B.
+        Usa el pool de conexiones multiplexadas: no abre un socket por tarea.
+        """
+        task = TASK_NAMES.get(task_type, str(task_type))
+        start = time.perf_counter()
+        outcome = "unavailable"
         try:
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(self.proc_host, self.proc_port),
-                timeout=10.0
-            )
-            
-            await self.proto.async_send_message(writer, task_type, payload)
-            
-            msg_type, resp_payload = await asyncio.wait_for(
-                self.proto.async_read_message(reader),
-                timeout=35.0
-            )
+            msg_type, resp_payload = await self.proc_pool.request(task_type, payload, timeout=35.0)
+            outcome = "success" if msg_type == RESP_SUCCESS else "error"
             
             if msg_type == RESP_SUCCESS:
-                return resp_payload.get('data')
+                # Con el codec binario las imágenes llegan crudas: se pasan a
+                # base64 una sola vez, al armar la respuesta JSON del cliente.
+                return bytes_to_base64(resp_payload.get('data'))
             else:
                 error_msg = resp_payload.get('error', 'Error desconocido del Servidor B')
                 print(f"[AsyncServer] Error reportado por Servidor B: {error_msg}")
                 return {"error": error_msg}
 
-        except (asyncio.TimeoutError, ConnectionRefusedError, ProtocolError) as e:
+        except (asyncio.TimeoutError, OSError, ProtocolError) as e:
+            if isinstance(e, asyncio.TimeoutError):
+                outcome = "timeout"
             print(f"[AsyncServer] Error de comunicación con Servidor B: {e}")
             raise ProtocolError(f"Error de comunicación con Servidor B: {e}") from e
         
         finally:
-            if writer:
-                writer.close()
-                await writer.wait_closed()
+            self._processing_seconds.observe(time.perf_counter() - start, task=task)
+            self._processing_total.inc(task=task, outcome=outcome)
+
+    async def _scrape(self, http_client: AsyncHTTPClient, url: str,
+                      components: FrozenSet[str] = frozenset(COMPONENTS),
+                      screenshot_options: Optional[ScreenshotOptions] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Scraping con cache: devuelve (resultado, origen) con origen 'hit',
+        'partial' (sólo se recalcularon los componentes vencidos),
+        'coalesced' (esperó un scraping en curso de la misma URL) o 'miss'.
+        Un screenshot con opciones propias no pasa por la cache.
+        """
+        custom_screenshot = screenshot_options is not None and "screenshot" in components
+        if self.result_cache is None or not self.result_cache.enabled or custom_screenshot:
+            return await self._perform_full_scraping(http_client, url, components, screenshot_options), "miss"
+        return await self.result_cache.get_or_compute(
+            url, lambda missing: self._perform_full_scraping(http_client, url, missing), components
+        )
+
+    async def _timed_scrape(self, endpoint: str, http_client: AsyncHTTPClient, url: str,
+                            components: FrozenSet[str],
+                            screenshot_options: Optional[ScreenshotOptions] = None) -> Tuple[Dict[str, Any], str]:
+        """_scrape con métricas: duración total y resultado por endpoint."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result, outcome = await self._scrape(http_client, url, components, screenshot_options)
+            return result, outcome
+        finally:
+            self._request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+            self._requests_total.inc(endpoint=endpoint, result=outcome)
 
-    async def _perform_full_scraping(self, http_client: AsyncHTTPClient, url: str) -> Dict[str, Any]:
+    async def _perform_full_scraping(self, http_client: AsyncHTTPClient, url: str,
+                                     components: FrozenSet[str] = frozenset(COMPONENTS),
+                                     screenshot_options: Optional[ScreenshotOptions] = None) -> Dict[str, Any]:
         """
         REQUISITO OBLIGATORIO: Función que hace scraping completo y devuelve resultado consolidado.
         Esta es la lógica core que cumple con "Parte C: Transparencia para el Cliente".
+        
+        Sólo corre las etapas que necesitan los `components` pedidos: sin
+        componentes de la página no hay fetch ni parsing, si sólo se piden
+        metadatos el fetch corta después del <head>, y sólo se envían al
+        Servidor B las tareas pedidas (el screenshot con sus opciones, si las hay).
+        El tiempo de carga que recibe el Servidor B tiene que ser el de una
+        descarga real: si la página salió de la cache HTTP (fresca o 304) no
+        se le mandan page_stats y B la descarga y mide por su cuenta. Si
+        performance es lo único que necesita la página, se descarga sin la cache.
         """
-        html, final_url = await http_client.fetch_html(url)
+        final_url = url
+        summary: Dict[str, Any] = {}
+        page_stats: Dict[str, Any] = {}
         
-        loop = asyncio.get_running_loop()
-        scrape_data = await loop.run_in_executor(
-            None, parse_basic_data, html, final_url
-        )
-        meta_data = await loop.run_in_executor(
-            None, extract_metadata, html
-        )
+        page_components = components & PAGE_COMPONENTS
+        if page_components:
+            start_time = time.time()
+            with self._stage_seconds.time(stage="fetch"):
+                page = await http_client.fetch_document(url, head_only=components <= METADATA_COMPONENTS,
+                                                        bypass_cache=page_components == {"performance"})
+            final_url = page.url
+            load_time_ms = (time.time() - start_time) * 1000
+            
+            with self._stage_seconds.time(stage="parse"):
+                summary = await self.parser_pool.summarize(page.body, final_url, page.encoding)
+            if not page.cached:
+                page_stats = {
+                    "load_time_ms": load_time_ms,
+                    "total_size_kb": len(page.body) / 1024,
+                    "resources": summary.get("resources", {})
+                }
         
-        img_urls = scrape_data.pop("image_urls_for_processing", [])
-        payload_base = {"url": final_url}
-        payload_images = {"url": final_url, "image_urls": img_urls}
-
-        task_screenshot = self._request_processing(TASK_SCREENSHOT, payload_base)
-        task_performance = self._request_processing(TASK_PERFORMANCE, payload_base)
-        task_images = self._request_processing(TASK_IMAGES, payload_images)
+        img_urls = summary.get("image_urls_for_processing", [])
+        requests = {}
+        if "screenshot" in components:
+            payload = {"url": final_url}
+            if screenshot_options is not None:
+                payload["options"] = screenshot_options.to_payload()
+            requests["screenshot"] = self._request_processing(TASK_SCREENSHOT, payload)
+        if "performance" in components:
+            requests["performance"] = self._request_processing(
+                TASK_PERFORMANCE, {"url": final_url, "page_stats": page_stats}
+            )
+        if "thumbnails" in components and img_urls:
+            requests["thumbnails"] = self._request_processing(
+                TASK_IMAGES, {"url": final_url, "image_urls": img_urls}
+            )
         
-        results = await asyncio.gather(
-            task_screenshot, task_performance, task_images
-        )
+        with self._stage_seconds.time(stage="processing"):
+            results = dict(zip(requests, await asyncio.gather(*requests.values())))
         
-        final_json = {
-            "url": final_url,
-            "timestamp": datetime.now().isoformat(),
-            "scraping_data": {
-                "title": scrape_data.get("title"),
-                "links": scrape_data.get("links"),
-                "meta_tags": meta_data,
-                "structure": scrape_data.get("structure"),
-                "images_count": scrape_data.get("images_count")
-            },
-            "processing_data": {
-                "screenshot": results[0],
-                "performance": results[1],
-                "thumbnails": results[2] or []
-            },
-            "status": "success"
-        }
+        data = {name: summary.get(name) for name in SCRAPING_COMPONENTS if name in components}
+        data.update(results)
+        if "thumbnails" in components:
+            data["thumbnails"] = results.get("thumbnails") or []
+        
+        final_json = assemble_result(final_url, datetime.now().isoformat(), data, components)
         
         return final_json
 
@@ -141,54 +263,164 @@ class ScrapingCoordinator:
                 {'error': 'URL parameter is required', 'status': 'failed'},
                 status=400
             )
+        try:
+            components = parse_components(request.query.get('components'))
+            screenshot_options = parse_screenshot_options(request.query)
+        except ValueError as e:
+            return web.json_response({'error': str(e), 'status': 'failed'}, status=400)
             
         print(f"[AsyncServer] Petición SÍNCRONA de scraping para: {url}")
         
         try:
             http_client = request.app['http_client']
-            result = await self._perform_full_scraping(http_client, url)
-            return web.json_response(result, status=200)
+            result, origin = await self._timed_scrape("sync", http_client, url, components, screenshot_options)
+            return web.json_response(result, status=200, headers={'X-Cache': origin.upper()})
 
-        except (ScrapingError, TaskTimeoutError) as e:
+        except Exception as e:
+            status, body = self._error_response(url, e)
+            return web.json_response(body, status=status)
+    
+    def _error_response(self, url: str, e: Exception) -> Tuple[int, Dict[str, Any]]:
+        """Traduce una excepción del scraping al (status HTTP, cuerpo JSON) que ve el cliente."""
+        if isinstance(e, (ScrapingError, TaskTimeoutError)):
             print(f"[AsyncServer] Error de Scraping para {url}: {e}")
-            return web.json_response(
-                {'error': f'Error al procesar la URL {url}: {e}', 'status': 'failed'},
-                status=502 
-            )
+            return 502, {'error': f'Error al procesar la URL {url}: {e}', 'status': 'failed'}
             
-        except ProtocolError as e:
+        if isinstance(e, ProtocolError):
             print(f"[AsyncServer] Error de comunicación interna: {e}")
-            return web.json_response(
-                {'error': 'Error interno de comunicación entre servidores', 'status': 'failed'},
-                status=503 
-            )
+            return 503, {'error': 'Error interno de comunicación entre servidores', 'status': 'failed'}
 
-        except Exception as e:
-            print(f"[AsyncServer] Error interno inesperado: {e}")
+        print(f"[AsyncServer] Error interno inesperado: {e}")
+        return 500, {'error': f'Error interno del servidor: {e}', 'status': 'failed'}
+    
+    async def handle_scrape_batch(self, request: web.Request) -> web.StreamResponse:
+        """
+        POST /scrape/batch con {"urls": [...], "concurrency": N, "components": [...]}
+        (o una URL por línea, con ?components=... en la query). Las opciones
+        screenshot_* van en el JSON o en la query y aplican a todo el batch.
+        
+        Deduplica las URLs (por URL normalizada), las scrapea con concurrencia
+        acotada y devuelve una línea NDJSON por URL apenas termina cada una:
+        {"index", "url", "status", "http_status", "cache", "result" | "error"}.
+        """
+        try:
+            urls, concurrency, components, screenshot_options = await self._parse_batch_request(request)
+        except ValueError as e:
+            return web.json_response({'error': str(e), 'status': 'failed'}, status=400)
+        
+        if len(urls) > self.batch_max_urls:
             return web.json_response(
-                {'error': f'Error interno del servidor: {e}', 'status': 'failed'},
-                status=500 
+                {'error': f'Batch too large: {len(urls)} URLs (max {self.batch_max_urls})', 'status': 'failed'},
+                status=413
             )
+        
+        unique: Dict[str, Tuple[int, str]] = {}
+        for index, url in enumerate(urls):
+            unique.setdefault(normalize_url(url), (index, url))
+        jobs = list(unique.values())
+        concurrency = max(1, min(concurrency or self.batch_concurrency, self.batch_concurrency, len(jobs) or 1))
+        
+        print(f"[AsyncServer] Batch de {len(urls)} URLs ({len(jobs)} únicas), concurrencia {concurrency}")
+        
+        response = web.StreamResponse(headers={
+            'Content-Type': 'application/x-ndjson; charset=utf-8',
+            'X-Batch-Total': str(len(urls)),
+            'X-Batch-Unique': str(len(jobs)),
+        })
+        await response.prepare(request)
+        
+        http_client = request.app['http_client']
+        results: asyncio.Queue = asyncio.Queue()
+        pending = iter(jobs)
+        stopping = False
+        
+        async def worker():
+            for index, url in pending:
+                try:
+                    result, origin = await self._timed_scrape("batch", http_client, url, components,
+                                                              screenshot_options)
+                    line = {'index': index, 'url': url, 'status': 'success', 'http_status': 200,
+                            'cache': origin, 'result': result}
+                except asyncio.CancelledError:
+                    if stopping:
+                        raise
+                    # Se canceló el scraping de esta URL, no el batch: se informa y se sigue
+                    print(f"[AsyncServer] Scraping cancelado para {url} (batch)")
+                    line = {'index': index, 'url': url, 'status': 'failed', 'http_status': 500,
+                            'error': f'Scraping cancelled for {url}'}
+                except Exception as e:
+                    status, body = self._error_response(url, e)
+                    line = {'index': index, 'url': url, 'status': 'failed', 'http_status': status,
+                            'error': body['error']}
+                await results.put(line)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for _ in range(len(jobs)):
+                line = await results.get()
+                await response.write(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+            await response.write_eof()
+        finally:
+            # Si el cliente se desconecta, no tiene sentido seguir scrapeando
+            stopping = True
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        return response
     
-    async def _run_scraping_task_background(self, app: web.Application, task_id: str, url: str):
+    async def _parse_batch_request(self, request: web.Request) -> Tuple[List[str], Optional[int], FrozenSet[str],
+                                                                         Optional[ScreenshotOptions]]:
+        """Lee las URLs de un body JSON ({"urls": [...]} o una lista) o de texto, una por línea."""
+        components = request.query.get('components')
+        options = dict(request.query)
+        if request.content_type == 'application/json':
+            try:
+                data = await request.json()
+            except json.JSONDecodeError as e:
+                raise ValueError(f'Invalid JSON body: {e}')
+            if isinstance(data, list):
+                data = {'urls': data}
+            if not isinstance(data, dict) or not isinstance(data.get('urls'), list):
+                raise ValueError('Expected {"urls": [...]}')
+            urls = data['urls']
+            concurrency = data.get('concurrency')
+            if concurrency is not None and not isinstance(concurrency, int):
+                raise ValueError('"concurrency" must be an integer')
+            components = data.get('components', components)
+            options.update(data)
+        else:
+            urls = (await request.text()).splitlines()
+            concurrency = None
+        
+        urls = [url.strip() for url in urls if isinstance(url, str) and url.strip()]
+        if not urls:
+            raise ValueError('At least one URL is required')
+        return urls, concurrency, parse_components(components), parse_screenshot_options(options)
+    
+    async def _run_scraping_task_background(self, app: web.Application, task_id: str, url: str,
+                                            components: FrozenSet[str] = frozenset(COMPONENTS),
+                                            screenshot_options: Optional[ScreenshotOptions] = None):
         """
         BONUS TRACK: Función de background para tareas asíncronas.
         """
-        tasks_db = app['tasks_db']
+        task_store = app['task_store']
         http_client = app['http_client']
         
         try:
-            tasks_db[task_id]['status'] = 'scraping'
-            result = await self._perform_full_scraping(http_client, url)
+            await task_store.set_status(task_id, STATUS_SCRAPING)
+            self.task_events.notify(task_id)
+            result, _ = await self._timed_scrape("async", http_client, url, components, screenshot_options)
             
-            tasks_db[task_id]['result'] = result
-            tasks_db[task_id]['status'] = 'completed'
+            await task_store.finish(task_id, STATUS_COMPLETED, result)
             print(f"[AsyncServer] Tarea {task_id} completada.")
 
         except (ScrapingError, TaskTimeoutError, ProtocolError, Exception) as e:
             print(f"[AsyncServer] Tarea {task_id} falló: {e}")
-            tasks_db[task_id]['status'] = 'failed'
-            tasks_db[task_id]['result'] = {'error': str(e), 'status': 'failed'}
+            await task_store.finish(task_id, STATUS_FAILED, {'error': str(e), 'status': 'failed'})
+        
+        finally:
+            self.task_events.notify(task_id)
 
     async def handle_scrape_async(self, request: web.Request) -> web.Response:
         """
@@ -202,28 +434,89 @@ class ScrapingCoordinator:
                 {'error': 'URL parameter is required in POST data'},
                 status=400
             )
+        try:
+            components = parse_components(data.get('components') or request.query.get('components'))
+            screenshot_options = parse_screenshot_options({**request.query, **data})
+        except ValueError as e:
+            return web.json_response({'error': str(e), 'status': 'failed'}, status=400)
             
-        task_id = uuid.uuid4().hex
         app = request.app
-        app['tasks_db'][task_id] = {
-            "status": "pending",
-            "result": None,
-            "url": url
-        }
+        job_queue = app['job_queue']
+        if job_queue.full():
+            # Se rechaza antes de registrar la tarea: saturado, no se escribe en el almacén
+            job_queue.reject()
+            return self._queue_full_response(job_queue)
+            
+        task_id = uuid.uuid4().hex
+        task_store = app['task_store']
+        await task_store.create(task_id, url)
         
-        asyncio.create_task(self._run_scraping_task_background(app, task_id, url))
+        if not job_queue.submit(task_id, url, components, screenshot_options):
+            # La cola se llenó mientras se registraba la tarea
+            await task_store.finish(task_id, STATUS_FAILED, {'error': 'Queue full', 'status': 'failed'})
+            return self._queue_full_response(job_queue)
         
-        print(f"[AsyncServer] Tarea ASÍNCRONA {task_id} creada para: {url}")
+        print(f"[AsyncServer] Tarea ASÍNCRONA {task_id} encolada para: {url} (en cola: {job_queue.depth})")
         
         return web.json_response(
             {"status": "pending", "task_id": task_id},
             status=202
         )
 
+    def _queue_full_response(self, job_queue: BoundedWorkQueue) -> web.Response:
+        """429 con Retry-After cuando la cola de /scrape/async está llena."""
+        retry_after = job_queue.retry_after()
+        return web.json_response(
+            {'error': 'Too many pending tasks, retry later', 'retry_after': retry_after},
+            status=429,
+            headers={'Retry-After': str(retry_after)}
+        )
+
+    def _parse_wait(self, request: web.Request) -> float:
+        """Segundos de long-polling pedidos con ?wait= (0 si no se pidió, como máximo MAX_TASK_WAIT)."""
+        value = request.query.get('wait')
+        if not value:
+            return 0.0
+        try:
+            wait = float(value)
+        except ValueError:
+            raise ValueError("wait must be a number of seconds") from None
+        if wait < 0:
+            raise ValueError("wait must not be negative")
+        return min(wait, MAX_TASK_WAIT)
+
+    async def _wait_for_task(self, task_store: TaskStore, task_id: str, wait: float) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve la tarea apenas termine, o su estado actual si pasan `wait`
+        segundos antes (None si no existe). Se despierta con el aviso de la
+        tarea y, por si terminó en otro worker, relee el estado cada
+        TASK_RECHECK_INTERVAL segundos.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        with self.task_events.listen(task_id) as next_change:
+            while True:
+                changed = next_change()
+                task = await task_store.get(task_id)
+                remaining = deadline - loop.time()
+                if task is None or task['status'] in FINISHED_STATUSES or remaining <= 0:
+                    return task
+                try:
+                    await asyncio.wait_for(changed.wait(), min(remaining, TASK_RECHECK_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+
     async def handle_status(self, request: web.Request) -> web.Response:
-        """BONUS TRACK: GET /status/{task_id}"""
+        """
+        BONUS TRACK: GET /status/{task_id}
+        Con ?wait=N (long-polling) responde apenas la tarea termina, o a los N segundos.
+        """
         task_id = request.match_info.get('task_id')
-        task = request.app['tasks_db'].get(task_id)
+        try:
+            wait = self._parse_wait(request)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        task = await self._wait_for_task(request.app['task_store'], task_id, wait)
         
         if not task:
             return web.json_response({'error': 'Task ID not found'}, status=404)
@@ -231,54 +524,253 @@ class ScrapingCoordinator:
         return web.json_response({'task_id': task_id, 'status': task['status']})
 
     async def handle_result(self, request: web.Request) -> web.Response:
-        """BONUS TRACK: GET /result/{task_id}"""
+        """
+        BONUS TRACK: GET /result/{task_id}
+        Con ?wait=N espera a que la tarea termine (hasta N segundos) y devuelve
+        el resultado en la misma respuesta.
+        """
         task_id = request.match_info.get('task_id')
-        task = request.app['tasks_db'].get(task_id)
+        task_store = request.app['task_store']
+        try:
+            wait = self._parse_wait(request)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        task = await self._wait_for_task(task_store, task_id, wait)
         
         if not task:
             return web.json_response({'error': 'Task ID not found'}, status=404)
             
-        if task['status'] == 'completed':
-            return web.json_response(task['result'])
-        elif task['status'] == 'failed':
-            return web.json_response(task['result'], status=500)
+        if task['status'] in (STATUS_COMPLETED, STATUS_FAILED):
+            # El resultado ya está serializado: se devuelve tal cual
+            body = await task_store.get_result(task_id)
+            if body is not None:
+                status = 200 if task['status'] == STATUS_COMPLETED else 500
+                return web.Response(body=body, status=status, content_type='application/json', charset='utf-8')
+            task['status'] = STATUS_EXPIRED
+        
+        if task['status'] == STATUS_EXPIRED:
+            return web.json_response(
+                {'status': STATUS_EXPIRED, 'message': 'The task result is no longer available.'},
+                status=410
+            )
         else:
             return web.json_response(
                 {'status': task['status'], 'message': 'Task is not yet complete.'},
                 status=202 
             )
 
+    async def handle_task_events(self, request: web.Request) -> web.StreamResponse:
+        """
+        GET /status/{task_id}/events: Server-Sent Events.
+        Emite un evento `status` por cada cambio de estado y, al terminar, un
+        evento `result` con el JSON del resultado (o `status` expired si ya
+        no está). Después cierra el stream.
+        """
+        task_id = request.match_info.get('task_id')
+        task_store = request.app['task_store']
+        if await task_store.get(task_id) is None:
+            return web.json_response({'error': 'Task ID not found'}, status=404)
+        
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+        await response.prepare(request)
+        
+        async def send(event: str, data: bytes):
+            lines = b"".join(b"data: " + line + b"\n" for line in data.split(b"\n"))
+            await response.write(b"event: " + event.encode() + b"\n" + lines + b"\n")
+        
+        loop = asyncio.get_running_loop()
+        last_status = None
+        last_write = loop.time()
+        try:
+            with self.task_events.listen(task_id) as next_change:
+                while True:
+                    changed = next_change()
+                    task = await task_store.get(task_id)
+                    status = task['status'] if task else STATUS_EXPIRED
+                    if status != last_status:
+                        last_status = status
+                        last_write = loop.time()
+                        await send("status", json.dumps({'task_id': task_id, 'status': status}).encode())
+                    
+                    if status in FINISHED_STATUSES:
+                        body = await task_store.get_result(task_id) if status != STATUS_EXPIRED else None
+                        if body is not None:
+                            await send("result", body)
+                        elif status != STATUS_EXPIRED:
+                            await send("status", json.dumps({'task_id': task_id, 'status': STATUS_EXPIRED}).encode())
+                        break
+                    
+                    if loop.time() - last_write >= SSE_KEEPALIVE:
+                        last_write = loop.time()
+                        await response.write(b": keepalive\n\n")
+                    try:
+                        await asyncio.wait_for(changed.wait(), TASK_RECHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+            await response.write_eof()
+        except ConnectionResetError:
+            # El cliente cerró el stream: no hay a quién avisarle
+            pass
+        return response
+
     async def handle_health(self, request: web.Request) -> web.Response:
         """Health check endpoint."""
         return web.json_response({"status": "healthy", "service": "ScrapingServer"})
 
+    async def handle_cache_stats(self, request: web.Request) -> web.Response:
+        """GET /stats/cache: entradas, bytes, hits, misses, desalojos y misses colapsados."""
+        if self.result_cache is None:
+            return web.json_response({"enabled": False})
+        return web.json_response(dict(self.result_cache.stats(), enabled=self.result_cache.enabled))
+
+    async def handle_task_stats(self, request: web.Request) -> web.Response:
+        """GET /stats/tasks: ocupación del almacén de tareas."""
+        return web.json_response(await request.app['task_store'].stats())
 
-def parse_args():
+    async def handle_http_stats(self, request: web.Request) -> web.Response:
+        """GET /stats/http: conexiones nuevas, reutilizadas, abiertas y ociosas hacia los sitios."""
+        return web.json_response(request.app['http_client'].stats())
+
+    async def handle_parser_stats(self, request: web.Request) -> web.Response:
+        """GET /stats/parser: páginas parseadas en hilos, en el pool de procesos y resúmenes reutilizados."""
+        return web.json_response(self.parser_pool.stats())
+
+    async def handle_queue_stats(self, request: web.Request) -> web.Response:
+        """GET /stats/queue: profundidad, espera, workers ocupados y descartes de la cola."""
+        return web.json_response(request.app['job_queue'].stats())
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """GET /metrics: contadores e histogramas en formato de texto de Prometheus."""
+        return web.Response(
+            body=self.metrics.render().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    async def handle_processing_stats(self, request: web.Request) -> web.Response:
+        """GET /stats/processing: carriles y workers del Servidor B (memoria, tareas, reciclados)."""
+        try:
+            msg_type, payload = await self.proc_pool.request(TASK_STATS, {}, timeout=5.0)
+        except (asyncio.TimeoutError, OSError, ProtocolError) as e:
+            return web.json_response({'error': f'Servidor B no disponible: {e}'}, status=503)
+        if msg_type != RESP_SUCCESS:
+            return web.json_response({'error': payload.get('error')}, status=502)
+        return web.json_response(payload.get('data'))
+
+
+def parse_args(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(
         description='Servidor de Scraping Web Asíncrono (Parte A - COMPLETO)',
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
     parser.add_argument('-i', '--ip', type=str, required=True, help='Dirección de escucha')
     parser.add_argument('-p', '--port', type=int, required=True, help='Puerto de escucha')
-    parser.add_argument('-w', '--workers', type=int, default=1, help='Número de workers')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Número de procesos worker (con N > 1 comparten el puerto con SO_REUSEPORT)')
     parser.add_argument('--processing-host', type=str, default='127.0.0.1', help='Host del servidor de procesamiento')
     parser.add_argument('--processing-port', type=int, default=9000, help='Puerto del servidor de procesamiento')
-    return parser.parse_args()
+    parser.add_argument('--cache-size', type=int, default=256, help='Máximo de resultados en la cache de /scrape (0 = deshabilitada) (default: 256)')
+    parser.add_argument('--cache-max-mb', type=int, default=256, help='Memoria máxima estimada de la cache en MB (default: 256)')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTLS['links'], help='TTL en segundos de title/links/meta/estructura (default: %(default)s)')
+    parser.add_argument('--cache-screenshot-ttl', type=float, default=DEFAULT_TTLS['screenshot'], help='TTL en segundos del screenshot (default: %(default)s)')
+    parser.add_argument('--task-store', choices=['memory', 'sqlite'], default='memory', help='Backend de las tareas de /scrape/async (default: memory)')
+    parser.add_argument('--task-db', type=str, default='tasks.db', help='Archivo SQLite de tareas (con --task-store sqlite) (default: tasks.db)')
+    parser.add_argument('--task-blob-dir', type=str, default=None, help='Directorio para los resultados grandes (default: <task-db>.blobs)')
+    parser.add_argument('--task-memory-mb', type=int, default=64, help='Memoria máxima de resultados con --task-store memory (default: 64)')
+    parser.add_argument('--task-max', type=int, default=10000, help='Máximo de tareas guardadas (default: 10000)')
+    parser.add_argument('--task-ttl', type=float, default=3600.0, help='Segundos que se conserva una tarea terminada (default: 3600)')
+    parser.add_argument('--batch-concurrency', type=int, default=8, help='URLs de un mismo batch scrapeándose a la vez (default: 8)')
+    parser.add_argument('--batch-max-urls', type=int, default=10000, help='Máximo de URLs por batch (default: 10000)')
+    parser.add_argument('--queue-size', type=int, default=1000, help='Máximo de tareas de /scrape/async esperando (default: 1000)')
+    parser.add_argument('--queue-workers', type=int, default=16, help='Tareas de /scrape/async procesándose a la vez (default: 16)')
+    parser.add_argument('--per-host-limit', type=int, default=4, help='Tareas simultáneas por host de destino (default: 4)')
+    parser.add_argument('--max-page-mb', type=int, default=10, help='Tamaño máximo de una página descargada en MB (default: 10)')
+    parser.add_argument('--http-limit', type=int, default=100, help='Conexiones HTTP simultáneas hacia los sitios (default: 100)')
+    parser.add_argument('--http-limit-per-host', type=int, default=8, help='Conexiones HTTP simultáneas por host (default: 8)')
+    parser.add_argument('--dns-ttl', type=int, default=300, help='Segundos que se cachea una resolución DNS (default: 300)')
+    parser.add_argument('--keepalive-timeout', type=float, default=30.0, help='Segundos que se conserva una conexión HTTP ociosa (default: 30)')
+    parser.add_argument('--parse-workers', type=int, default=2, help='Procesos dedicados al parsing HTML (0 = pool de hilos) (default: 2)')
+    parser.add_argument('--http-cache-mb', type=int, default=64, help='Memoria de la cache HTTP condicional (ETag/Last-Modified) en MB, 0 = deshabilitada (default: 64)')
+    parser.add_argument('--parse-cache-size', type=int, default=SUMMARY_CACHE_SIZE, help='Resúmenes de parsing reutilizables por hash del contenido (default: %(default)s)')
+    parser.add_argument('--parse-inline-kb', type=int, default=INLINE_THRESHOLD // 1024, help='Páginas más chicas que esto (KB) se parsean sin IPC (default: %(default)s)')
+    parser.add_argument('--processing-codec', choices=sorted(CODEC_NAMES), default='binary', help='Codec del payload hacia el servidor de procesamiento (default: binary)')
+    parser.add_argument('--processing-connections', type=int, default=2, help='Conexiones persistentes hacia el servidor de procesamiento')
+    return parser.parse_args(argv)
+
+def create_task_store(args: argparse.Namespace) -> TaskStore:
+    """Crea el backend de tareas elegido por línea de comandos."""
+    if args.task_store == 'sqlite':
+        return SQLiteTaskStore(
+            args.task_db,
+            blob_dir=args.task_blob_dir,
+            max_tasks=args.task_max,
+            ttl=args.task_ttl,
+            owner=f"w{args.worker_id}"
+        )
+    return MemoryTaskStore(
+        max_bytes=args.task_memory_mb * 1024 * 1024,
+        max_tasks=args.task_max,
+        ttl=args.task_ttl
+    )
 
 async def init_app(args: argparse.Namespace) -> web.Application:
     """Crea e inicializa la App aiohttp."""
     app = web.Application()
     
+    ttls = {name: args.cache_ttl for name in SCRAPING_COMPONENTS}
+    ttls['screenshot'] = args.cache_screenshot_ttl
+    result_cache = ScrapeResultCache(
+        max_entries=args.cache_size,
+        max_bytes=args.cache_max_mb * 1024 * 1024,
+        ttls=ttls
+    )
+    
     coordinator = ScrapingCoordinator(
         args.processing_host, 
-        args.processing_port 
+        args.processing_port,
+        args.processing_connections,
+        CODEC_NAMES[args.processing_codec],
+        result_cache,
+        ParserPool(args.parse_workers, args.parse_inline_kb * 1024, args.parse_cache_size),
+        args.batch_concurrency,
+        args.batch_max_urls
+    )
+    app['coordinator'] = coordinator
+    app['http_client'] = AsyncHTTPClient(
+        timeout=30,
+        max_bytes=args.max_page_mb * 1024 * 1024,
+        limit=args.http_limit,
+        limit_per_host=args.http_limit_per_host,
+        dns_ttl=args.dns_ttl,
+        keepalive_timeout=args.keepalive_timeout,
+        http_cache=HTTPCache(max_bytes=args.http_cache_mb * 1024 * 1024)
+    )
+    app['task_store'] = create_task_store(args)
+    app['job_queue'] = BoundedWorkQueue(
+        lambda task_id, url, components, screenshot_options: coordinator._run_scraping_task_background(
+            app, task_id, url, components, screenshot_options),
+        max_size=args.queue_size,
+        workers=args.queue_workers,
+        per_host=args.per_host_limit,
+        metrics=coordinator.metrics
     )
     
     app.router.add_get('/scrape', coordinator.handle_scrape_sync)
     app.router.add_get('/health', coordinator.handle_health)
+    app.router.add_get('/stats/cache', coordinator.handle_cache_stats)
+    app.router.add_get('/stats/tasks', coordinator.handle_task_stats)
+    app.router.add_get('/stats/queue', coordinator.handle_queue_stats)
+    app.router.add_get('/stats/http', coordinator.handle_http_stats)
+    app.router.add_get('/stats/parser', coordinator.handle_parser_stats)
+    app.router.add_get('/stats/processing', coordinator.handle_processing_stats)
+    app.router.add_get('/metrics', coordinator.handle_metrics)
     
     app.router.add_post('/scrape/async', coordinator.handle_scrape_async)
+    app.router.add_post('/scrape/batch', coordinator.handle_scrape_batch)
     app.router.add_get('/status/{task_id}', coordinator.handle_status)
+    app.router.add_get('/status/{task_id}/events', coordinator.handle_task_events)
     app.router.add_get('/result/{task_id}', coordinator.handle_result)
     
     app.on_startup.append(on_startup)
@@ -286,26 +778,23 @@ async def init_app(args: argparse.Namespace) -> web.Application:
     
     return app
 
-def main():
-    args = parse_args()
-    if args.ip == '::':
-        print("[AsyncServer] Escuchando en modo Dual-Stack (IPv4 e IPv6) en [::]")
-    elif '.' in args.ip:
-        print(f"[AsyncServer] Escuchando en modo IPv4 en {args.ip}")
-    elif ':' in args.ip:
-         print(f"[AsyncServer] Escuchando en modo IPv6 en [{args.ip}]")
-         
-    print(f"[AsyncServer] Puerto: {args.port}, Workers: {args.workers}")
-    print("=" * 60)
-    print(" GET /scrape?url=... (transparencia total)")
-    print(" POST /scrape/async (sistema de cola)")
-    print("=" * 60)
+def run_worker(args: argparse.Namespace, worker_id: int = 0):
+    """Un worker: event loop aiohttp propio (compartiendo el puerto si hay varios)."""
+    args.worker_id = worker_id
+    reuse_port = args.workers > 1
+    if reuse_port:
+        # Los handlers del supervisor no aplican al worker: aiohttp instala los suyos
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        print(f"[AsyncServer] Worker {worker_id} (pid {os.getpid()}) iniciado.")
     
     try:
         web.run_app(
             init_app(args),
             host=args.ip,
             port=args.port,
+            reuse_port=reuse_port or None,
+            print=None if reuse_port else print,
         )
     except KeyboardInterrupt:
         print("\n[AsyncServer] Apagando servidor...")
@@ -316,5 +805,95 @@ def main():
             print(f"Error de OS: {e}")
         sys.exit(1)
 
+class WorkerSupervisor:
+    """Lanza N procesos worker y relanza los que mueren, con backoff si mueren al arrancar."""
+    
+    MIN_UPTIME = 5.0
+    MAX_BACKOFF = 30.0
+    
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.ctx = multiprocessing.get_context('fork')
+        self.workers: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.backoff: Dict[int, float] = {}
+        self.next_start: Dict[int, float] = {}
+        self.stopping = False
+    
+    def _spawn(self, worker_id: int):
+        process = self.ctx.Process(target=run_worker, args=(self.args, worker_id), name=f"scraping-worker-{worker_id}")
+        process.start()
+        self.workers[worker_id] = process
+        self.started_at[worker_id] = time.monotonic()
+    
+    def _on_signal(self, signum, frame):
+        self.stopping = True
+    
+    def run(self):
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        
+        for worker_id in range(self.args.workers):
+            self._spawn(worker_id)
+        
+        while not self.stopping:
+            time.sleep(0.5)
+            now = time.monotonic()
+            for worker_id, process in list(self.workers.items()):
+                if process.is_alive() or self.stopping:
+                    continue
+                if worker_id not in self.next_start:
+                    # Un worker que muere enseguida de arrancar espera cada vez más
+                    if now - self.started_at[worker_id] < self.MIN_UPTIME:
+                        self.backoff[worker_id] = min(self.MAX_BACKOFF, self.backoff.get(worker_id, 0.5) * 2)
+                    else:
+                        self.backoff[worker_id] = 0.0
+                    self.next_start[worker_id] = now + self.backoff[worker_id]
+                    print(f"[Supervisor] Worker {worker_id} (pid {process.pid}) terminó con código {process.exitcode}. "
+                          f"Relanzando en {self.backoff[worker_id]:.1f}s.")
+                if now >= self.next_start[worker_id]:
+                    del self.next_start[worker_id]
+                    self._spawn(worker_id)
+        
+        print("\n[Supervisor] Apagando workers...")
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        print("[Supervisor] Todos los workers terminaron.")
+
+def main():
+    args = parse_args()
+    if args.workers > 1:
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            print("[AsyncServer] ADVERTENCIA: SO_REUSEPORT no disponible, se usa un solo worker.")
+            args.workers = 1
+        elif args.task_store == 'memory':
+            print("[AsyncServer] Con varios workers las tareas async usan el backend sqlite compartido.")
+            args.task_store = 'sqlite'
+    
+    if args.ip == '::':
+        print("[AsyncServer] Escuchando en modo Dual-Stack (IPv4 e IPv6) en [::]")
+    elif '.' in args.ip:
+        print(f"[AsyncServer] Escuchando en modo IPv4 en {args.ip}")
+    elif ':' in args.ip:
+         print(f"[AsyncServer] Escuchando en modo IPv6 en [{args.ip}]")
+         
+    print(f"[AsyncServer] Puerto: {args.port}, Workers: {args.workers}")
+    print("=" * 60)
+    print(" GET /scrape?url=... (transparencia total)")
+    print(" POST /scrape/async (sistema de cola)")
+    print(" POST /scrape/batch (NDJSON en streaming)")
+    print("=" * 60)
+    
+    if args.workers > 1:
+        WorkerSupervisor(args).run()
+    else:
+        run_worker(args)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
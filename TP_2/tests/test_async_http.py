@@ -0,0 +1,180 @@
+"""
+Pruebas Unitarias para el cliente HTTP asíncrono (scraper/async_http.py)
+
+Se levanta un servidor aiohttp local que responde en chunks, sin
+Content-Length, con distintos charsets.
+"""
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from common import ScrapingError
+from scraper.async_http import AsyncHTTPClient, detect_charset
+from scraper.http_cache import HTTPCache, max_age
+
+HEAD = b"<html><head><title>T\xedtulo</title><meta charset='iso-8859-1'></head>"
+
+
+async def _chunked(request: web.Request, chunks, content_type='text/html'):
+    response = web.StreamResponse(headers={'Content-Type': content_type})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    for chunk in chunks:
+        await response.write(chunk)
+    await response.write_eof()
+    return response
+
+
+@pytest_asyncio.fixture
+async def origin():
+    """Servidor de origen local; devuelve (url_base, contador de bytes enviados)."""
+    sent = {"body": 0, "requests": 0, "full": 0}
+
+    async def big(request):
+        chunks = [HEAD] + [b"<p>" + b"x" * 1000 + b"</p>"] * 200
+        sent["body"] = 0
+        response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for chunk in chunks:
+            await response.write(chunk)
+            sent["body"] += len(chunk)
+        await response.write_eof()
+        return response
+
+    async def utf8_header(request):
+        return await _chunked(request, ["<html><head><title>Ñandú</title></head></html>".encode('utf-8')],
+                              content_type='text/html; charset=utf-8')
+
+    async def versioned(request):
+        # ETag fijo: responde 304 a If-None-Match; /fresh además permite 60 s sin revalidar
+        sent["requests"] += 1
+        cache_control = 'max-age=60' if request.path == '/fresh' else 'no-cache'
+        headers = {'ETag': '"v1"', 'Cache-Control': cache_control}
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers=headers)
+        sent["full"] += 1
+        return web.Response(body=b"<html><head><title>V1</title></head></html>",
+                            content_type='text/html', headers=headers)
+
+    app = web.Application()
+    app.router.add_get('/big', big)
+    app.router.add_get('/versioned', versioned)
+    app.router.add_get('/fresh', versioned)
+    app.router.add_get('/utf8', utf8_header)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", sent
+    await runner.cleanup()
+
+
+def test_detect_charset():
+    assert detect_charset(b"<meta charset='ISO-8859-1'>") == 'iso8859-1'
+    assert detect_charset(b'<meta http-equiv="Content-Type" content="text/html; charset=windows-1252">') == 'cp1252'
+    assert detect_charset(b"<meta charset='iso-8859-1'>", header_charset='utf-8') == 'utf-8'
+    assert detect_charset(b"\xef\xbb\xbf<html>") == 'utf-8'
+    assert detect_charset(b"<meta charset='no-existe'>") == 'utf-8'
+
+
+@pytest.mark.asyncio
+async def test_limite_de_bytes_en_respuesta_chunked(origin):
+    """Sin Content-Length, el presupuesto se controla mientras se lee."""
+    base, _ = origin
+    client = AsyncHTTPClient(max_bytes=50 * 1024)
+    try:
+        with pytest.raises(ScrapingError):
+            await client.fetch_document(f"{base}/big")
+    finally:
+        await client.close_session()
+
+
+@pytest.mark.asyncio
+async def test_charset_del_meta_y_del_header(origin):
+    base, _ = origin
+    client = AsyncHTTPClient()
+    try:
+        page = await client.fetch_document(f"{base}/big")
+        assert page.encoding == 'iso8859-1' and not page.truncated
+        assert "Título" in page.text()
+
+        html, _ = await client.fetch_html(f"{base}/utf8")
+        assert "Ñandú" in html
+    finally:
+        await client.close_session()
+
+
+@pytest.mark.asyncio
+async def test_head_only_corta_despues_del_head(origin):
+    base, _ = origin
+    client = AsyncHTTPClient(max_bytes=50 * 1024)
+    try:
+        page = await client.fetch_document(f"{base}/big", head_only=True, body_after_head=100)
+        assert page.truncated
+        assert len(page.body) == len(HEAD) + 100
+        assert b"</head>" in page.body
+    finally:
+        await client.close_session()
+
+
+@pytest.mark.asyncio
+async def test_reutiliza_conexiones_keep_alive(origin):
+    """Varias descargas seguidas al mismo host usan una sola conexión."""
+    base, _ = origin
+    client = AsyncHTTPClient(limit_per_host=2)
+    try:
+        for _ in range(3):
+            await client.fetch_html(f"{base}/utf8")
+
+        stats = client.stats()
+        assert stats["requests"] == 3
+        assert stats["new_connections"] == 1 and stats["reused_connections"] == 2
+        assert stats["idle"] == 1 and stats["idle_hosts"] == ["127.0.0.1"]
+    finally:
+        await client.close_session()
+
+
+def test_max_age():
+    assert max_age(None) is None
+    assert max_age("public, max-age=120") == 120
+    assert max_age("no-cache, max-age=120") == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_http_revalida_con_304(origin):
+    """Una página sin cambios se revalida con If-None-Match y no se vuelve a transferir."""
+    base, sent = origin
+    client = AsyncHTTPClient(http_cache=HTTPCache())
+    try:
+        first = await client.fetch_document(f"{base}/versioned")
+        second = await client.fetch_document(f"{base}/versioned")
+        assert not first.cached and second.cached
+        assert second.body == first.body and second.url == first.url
+        assert sent["requests"] == 2 and sent["full"] == 1
+
+        # Fresca por max-age: ni siquiera hay request
+        await client.fetch_document(f"{base}/fresh")
+        assert (await client.fetch_document(f"{base}/fresh")).cached
+        assert sent["requests"] == 3
+
+        cache_stats = client.stats()["cache"]
+        assert cache_stats["revalidated"] == 1 and cache_stats["fresh_hits"] == 1
+    finally:
+        await client.close_session()
+
+
+@pytest.mark.asyncio
+async def test_bypass_cache_descarga_completo_aunque_este_fresca(origin):
+    """Para medir performance se descarga de verdad, pero la cache se sigue llenando."""
+    base, sent = origin
+    client = AsyncHTTPClient(http_cache=HTTPCache())
+    try:
+        await client.fetch_document(f"{base}/fresh")
+        page = await client.fetch_document(f"{base}/fresh", bypass_cache=True)
+        assert not page.cached and sent["full"] == 2
+        assert (await client.fetch_document(f"{base}/fresh")).cached
+    finally:
+        await client.close_session()
@@ -0,0 +1,192 @@
+"""
+Pruebas Unitarias para la cache en memoria (common/cache.py) y la cache
+de resultados de /scrape (scraper/result_cache.py).
+
+Se usa un reloj falso para controlar el vencimiento de los TTL.
+"""
+
+import pytest
+import asyncio
+
+from common.cache import TTLCache, normalize_url
+from scraper.result_cache import ScrapeResultCache, parse_components, COMPONENTS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _result(url="https://example.com/", screenshot="AAAA", performance=None):
+    return {
+        "url": url,
+        "timestamp": "2024-01-01T00:00:00Z",
+        "scraping_data": {
+            "title": "Example", "links": [url + "a"], "meta_tags": {},
+            "structure": {"h1": 1}, "images_count": 0
+        },
+        "processing_data": {
+            "screenshot": screenshot,
+            "performance": performance or {"load_time_ms": 10},
+            "thumbnails": []
+        },
+        "status": "success"
+    }
+
+
+def test_ttl_cache_expira_y_desaloja_lru():
+    """Las entradas vencen por TTL y, al superar el límite, sale la menos usada."""
+    clock = FakeClock()
+    cache = TTLCache(max_entries=2, clock=clock)
+
+    cache.put("a", 1, ttl=10)
+    cache.put("b", 2, ttl=100)
+    assert cache.get("a") == 1  # 'a' pasa a ser la más reciente
+
+    cache.put("c", 3, ttl=100)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_limite_de_bytes():
+    cache = TTLCache(max_entries=10, max_bytes=10, size_of=len)
+    cache.put("a", "x" * 6, ttl=60)
+    cache.put("b", "y" * 6, ttl=60)
+    assert "a" not in cache and "b" in cache
+    assert cache.total_bytes == 6
+
+    cache.put("c", "z" * 20, ttl=60)  # más grande que todo el límite: no se guarda
+    assert "c" not in cache
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.COM:443") == "https://example.com/"
+    assert normalize_url("http://example.com:8080/a?b=2&a=1#frag") == "http://example.com:8080/a?a=1&b=2"
+    assert normalize_url("http://example.com/a") != normalize_url("http://example.com/A")
+
+
+def test_result_cache_ttl_por_componente():
+    """El resultado deja de servirse cuando vence el componente con TTL más corto."""
+    clock = FakeClock()
+    cache = ScrapeResultCache(ttls={"screenshot": 5, "performance": 60}, clock=clock)
+
+    cache.put("https://EXAMPLE.com", _result())
+    assert cache.get("https://example.com/")["scraping_data"]["title"] == "Example"
+
+    clock.now += 6
+    assert cache.get("https://example.com/") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_result_cache_no_guarda_errores_de_procesamiento():
+    cache = ScrapeResultCache(clock=FakeClock())
+    cache.put("https://example.com/", _result(performance={"error": "timeout"}))
+    assert cache.get("https://example.com/") is None
+
+
+def test_result_cache_alias_de_redireccion():
+    """La URL pedida apunta a la entrada de la URL final."""
+    cache = ScrapeResultCache(clock=FakeClock())
+    cache.put("http://example.com", _result(url="https://www.example.com/"))
+    assert cache.get("http://example.com")["url"] == "https://www.example.com/"
+
+
+@pytest.mark.asyncio
+async def test_result_cache_colapsa_misses_concurrentes():
+    """N pedidos simultáneos por la misma URL generan un único scraping."""
+    cache = ScrapeResultCache()
+    calls = 0
+
+    async def compute(missing):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return _result()
+
+    results = await asyncio.gather(*[
+        cache.get_or_compute("https://example.com/", compute) for _ in range(5)
+    ])
+
+    assert calls == 1
+    assert sorted(origin for _, origin in results) == ["coalesced"] * 4 + ["miss"]
+
+    result, origin = await cache.get_or_compute("https://example.com/", compute)
+    assert origin == "hit" and calls == 1
+
+
+@pytest.mark.asyncio
+async def test_result_cache_propaga_errores_a_los_que_esperan():
+    cache = ScrapeResultCache()
+
+    async def compute(missing):
+        await asyncio.sleep(0.02)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *[cache.get_or_compute("https://example.com/", compute) for _ in range(3)],
+        return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_result_cache_cancelar_al_que_calcula_no_cancela_a_los_que_esperan():
+    """Si se cancela el pedido que scrapeaba, los que esperaban scrapean ellos mismos."""
+    cache = ScrapeResultCache()
+    calls = 0
+
+    async def compute(missing):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return _result()
+
+    leader = asyncio.create_task(cache.get_or_compute("https://example.com/", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_compute("https://example.com/", compute))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    result, origin = await follower
+    assert origin == "miss" and result["status"] == "success"
+    assert leader.cancelled() and calls == 2
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_parse_components():
+    assert parse_components(None) == frozenset(COMPONENTS)
+    assert parse_components("title, meta") == {"title", "meta_tags"}
+    assert parse_components(["links", "images"]) == {"links", "images_count"}
+    with pytest.raises(ValueError):
+        parse_components("title,favicon")
+
+
+@pytest.mark.asyncio
+async def test_result_cache_refresca_solo_los_componentes_vencidos():
+    """Si venció el screenshot, sólo se recalcula el screenshot."""
+    clock = FakeClock()
+    cache = ScrapeResultCache(ttls={"screenshot": 5}, clock=clock)
+    cache.put("https://example.com/", _result())
+    clock.now += 6
+    asked = []
+
+    async def compute(missing):
+        asked.append(missing)
+        return {"url": "https://example.com/", "timestamp": "2024-01-02T00:00:00Z",
+                "scraping_data": {}, "processing_data": {"screenshot": "BBBB"}, "status": "success"}
+
+    result, origin = await cache.get_or_compute("https://example.com/", compute, {"title", "screenshot"})
+    assert origin == "partial" and asked == [{"screenshot"}]
+    assert result["scraping_data"] == {"title": "Example"}
+    assert result["processing_data"] == {"screenshot": "BBBB"}
+
+    result, origin = await cache.get_or_compute("https://example.com/", compute)
+    assert origin == "hit" and result["processing_data"]["screenshot"] == "BBBB"
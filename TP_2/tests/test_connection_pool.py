@@ -0,0 +1,144 @@
+"""
+Pruebas Unitarias para el pool de conexiones multiplexadas (common/connection_pool.py)
+
+Se levanta un Servidor B falso con asyncio que responde las tareas en
+orden INVERSO, para validar que cada respuesta llega a quien la pidió.
+"""
+
+import pytest
+import asyncio
+
+from common.protocol import ProtocolHandler, TASK_SCREENSHOT, TASK_PERFORMANCE, RESP_SUCCESS
+from common.connection_pool import ProcessingConnectionPool
+from common import ProtocolError
+
+
+async def _start_fake_server(batch_size: int):
+    """Servidor que junta `batch_size` tareas y las responde al revés."""
+    proto = ProtocolHandler()
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        frames = []
+        try:
+            while True:
+                frames.append(await proto.async_read_frame(reader))
+                if len(frames) == batch_size:
+                    for frame in reversed(frames):
+                        await proto.async_send_message(
+                            writer, RESP_SUCCESS, {"data": frame.payload["url"]}, frame.request_id
+                        )
+                    frames = []
+        except Exception:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, port, connections
+
+
+@pytest.mark.asyncio
+async def test_pool_multiplexes_out_of_order_responses():
+    """Varias tareas comparten UNA conexión y reciben su propia respuesta."""
+    server, port, connections = await _start_fake_server(batch_size=3)
+    pool = ProcessingConnectionPool('127.0.0.1', port, size=1)
+    
+    try:
+        urls = ["https://a.com", "https://b.com", "https://c.com"]
+        results = await asyncio.gather(*[
+            pool.request(TASK_SCREENSHOT, {"url": u}, timeout=5) for u in urls
+        ])
+        
+        assert [payload["data"] for _, payload in results] == urls
+        assert all(msg_type == RESP_SUCCESS for msg_type, _ in results)
+        assert len(connections) == 1
+        
+        # La conexión queda abierta y se reutiliza para la siguiente ronda
+        results = await asyncio.gather(*[
+            pool.request(TASK_PERFORMANCE, {"url": u}, timeout=5) for u in urls
+        ])
+        assert [payload["data"] for _, payload in results] == urls
+        assert len(connections) == 1
+    finally:
+        await pool.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_pool_fails_pending_requests_when_server_drops():
+    """Si el Servidor B corta la conexión, las tareas en vuelo fallan con ProtocolError."""
+    server, port, connections = await _start_fake_server(batch_size=2)
+    pool = ProcessingConnectionPool('127.0.0.1', port, size=1)
+    
+    try:
+        pending = asyncio.create_task(pool.request(TASK_SCREENSHOT, {"url": "https://a.com"}, timeout=5))
+        while not connections:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        connections[0].close()
+        
+        with pytest.raises(ProtocolError):
+            await pending
+    finally:
+        await pool.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_cancelar_a_mitad_del_envio_no_rompe_la_conexion():
+    """Un request cancelado mientras se escribe su frame no deja un frame a medias en el socket."""
+    proto = ProtocolHandler()
+    can_read = asyncio.Event()
+    frames = []
+
+    async def handle(reader, writer):
+        await can_read.wait()  # no lee: el envío grande queda trabado a mitad
+        try:
+            while True:
+                frame = await proto.async_read_frame(reader)
+                frames.append(frame.payload["url"][:20])
+                await proto.async_send_message(writer, RESP_SUCCESS, {"data": "ok"}, frame.request_id)
+        except Exception:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    pool = ProcessingConnectionPool('127.0.0.1', port, size=1)
+    try:
+        big = asyncio.create_task(pool.request(TASK_SCREENSHOT, {"url": "https://big/" + "x" * 16 * 2**20}, timeout=10))
+        await asyncio.sleep(0.2)
+        big.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await big
+
+        can_read.set()
+        msg_type, payload = await pool.request(TASK_PERFORMANCE, {"url": "https://small/"}, timeout=10)
+        assert msg_type == RESP_SUCCESS and payload == {"data": "ok"}
+        assert frames[-1] == "https://small/"
+    finally:
+        await pool.close()
+        server.close()
+        await server.wait_closed()
+
+
+
+@pytest.mark.asyncio
+async def test_error_inesperado_del_lector_falla_los_pendientes():
+    """Si el lector muere por cualquier excepción, los requests en vuelo fallan enseguida."""
+    server, port, connections = await _start_fake_server(batch_size=1)
+    pool = ProcessingConnectionPool('127.0.0.1', port, size=1)
+
+    def broken_deserialize(data, codec):
+        raise RuntimeError("frame ilegible")
+
+    pool.proto._deserialize = broken_deserialize
+    try:
+        with pytest.raises(ProtocolError):
+            await asyncio.wait_for(pool.request(TASK_SCREENSHOT, {"url": "https://a.com"}, timeout=30), 5)
+    finally:
+        await pool.close()
+        server.close()
+        await server.wait_closed()
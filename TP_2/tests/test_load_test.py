@@ -0,0 +1,42 @@
+"""
+Pruebas para la prueba de carga E2E (benchmarks/load_test.py).
+
+Se corre una carga corta con el origen sintético, el stub del Servidor B
+y el Servidor A en el mismo event loop: sin red externa ni subprocesos.
+"""
+
+import pytest
+
+from benchmarks.load_test import percentile, summarize, synthetic_page, run_benchmark, parse_args
+
+
+def test_percentil_y_resumen():
+    values = sorted(float(v) for v in range(1, 101))
+    assert percentile(values, 0.5) == 50 and percentile(values, 0.99) == 99
+    assert percentile([], 0.5) is None
+
+    samples = [(True, "200", 0.1)] * 3 + [(False, "502", 0.2)]
+    summary = summarize("sync", 4.0, 1.0, 2.0, samples)
+    assert summary["ok"] == 3 and summary["error_rate"] == 0.25
+    assert summary["throughput_rps"] == 1.5
+    assert summary["status_counts"] == {"200": 3, "502": 1}
+    assert summary["latency_ms"]["p99"] == 100.0
+
+
+def test_pagina_sintetica():
+    html = synthetic_page(7, kb=20, links=30, images=4)
+    assert 20 * 1024 <= len(html) < 21 * 1024
+    assert html.count(b"<a href=") == 30 and html.count(b"<img ") == 4
+
+
+@pytest.mark.asyncio
+async def test_carga_corta_en_proceso():
+    args = parse_args(["--endpoints", "sync,async", "--rate", "20", "--duration", "0.5",
+                       "--in-process", "--warmup", "1", "--stub-delay-ms", "5"])
+    report = await run_benchmark(args)
+
+    assert report["version"] == 1
+    assert [r["endpoint"] for r in report["results"]] == ["sync", "async"]
+    for result in report["results"]:
+        assert result["requests"] == 10 and result["errors"] == 0
+        assert result["latency_ms"]["p50"] is not None
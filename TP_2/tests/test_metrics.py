@@ -0,0 +1,54 @@
+"""
+Pruebas Unitarias para las métricas (common/metrics.py)
+"""
+
+import pytest
+
+from common.metrics import MetricsRegistry
+
+
+def test_histograma_en_formato_prometheus():
+    """Los buckets se publican acumulados, con +Inf, _sum y _count por serie."""
+    metrics = MetricsRegistry()
+    stage = metrics.histogram("scrape_stage_seconds", "Etapas", ("stage",), buckets=(0.1, 1.0))
+    stage.observe(0.05, stage="fetch")
+    stage.observe(0.1, stage="fetch")  # el límite es inclusivo
+    stage.observe(3.0, stage="fetch")
+    metrics.counter("scrape_requests_total", "Pedidos", ("endpoint",)).inc(endpoint='sy"nc')
+
+    text = metrics.render()
+    assert "# TYPE scrape_stage_seconds histogram" in text
+    assert 'scrape_stage_seconds_bucket{stage="fetch",le="0.1"} 2' in text
+    assert 'scrape_stage_seconds_bucket{stage="fetch",le="1"} 2' in text
+    assert 'scrape_stage_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 'scrape_stage_seconds_count{stage="fetch"} 3' in text
+    assert 'scrape_requests_total{endpoint="sy\\"nc"} 1' in text
+
+
+def test_cuantiles_estimados_desde_los_buckets():
+    metrics = MetricsRegistry()
+    latency = metrics.histogram("latency_seconds", "Latencia", buckets=(1.0, 2.0, 4.0))
+    assert latency.quantile(0.5) is None
+
+    for value in [0.5] * 90 + [3.0] * 10:
+        latency.observe(value)
+
+    assert latency.quantile(0.5) == pytest.approx(0.5 / 0.9 * 1.0)
+    assert 2.0 < latency.quantile(0.99) <= 4.0
+    sample = metrics.snapshot()["latency_seconds"]["samples"][0]
+    assert sample["count"] == 100 and sample["p99"] == latency.quantile(0.99)
+
+
+def test_registro_reutiliza_metricas_y_valida_etiquetas():
+    metrics = MetricsRegistry()
+    counter = metrics.counter("tasks_total", "Tareas", ("task",))
+    assert metrics.counter("tasks_total", "Tareas", ("task",)) is counter
+
+    with pytest.raises(ValueError):
+        metrics.histogram("tasks_total", "Otra cosa")
+    with pytest.raises(ValueError):
+        counter.inc(lane="x")
+
+    with metrics.histogram("block_seconds", "Bloque").time():
+        pass
+    assert metrics.histogram("block_seconds", "Bloque").count() == 1
@@ -0,0 +1,250 @@
+"""
+Pruebas Unitarias para el front-end asíncrono del Servidor B (server_processing.py)
+
+Se reemplaza el multiprocessing.Pool por un Pool falso que ejecuta cada tarea
+en un hilo, igual que el hilo de resultados del Pool real invoca los callbacks.
+"""
+
+import pytest
+import asyncio
+import os
+import threading
+import time
+
+from common.protocol import RESP_SUCCESS, RESP_ERROR, TASK_PERFORMANCE, TASK_IMAGES, TASK_SCREENSHOT, TASK_STATS
+from common.connection_pool import ProcessingConnectionPool
+from common import TaskTimeoutError
+from server_processing import (
+    ProcessingServer, TaskLane, WorkerReply, create_listening_socket, parse_lane_sizes,
+    run_task, run_task_in_worker
+)
+
+
+class FakePool:
+    """Imita apply_async: corre la función en otro hilo y llama al callback."""
+
+    def __init__(self, func, rss_bytes=0):
+        self.func = func
+        self.rss_bytes = rss_bytes
+        self.tasks = 0
+        self.closed = False
+        self.max_running = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        def worker():
+            with self._lock:
+                self._running += 1
+                self.max_running = max(self.max_running, self._running)
+            try:
+                result = self.func(*args)
+            except Exception as e:
+                error_callback(e)
+            else:
+                self.tasks += 1
+                callback(WorkerReply(result, None, os.getpid(), self.rss_bytes, self.tasks))
+            finally:
+                with self._lock:
+                    self._running -= 1
+        threading.Thread(target=worker).start()
+
+    def close(self):
+        self.closed = True
+
+    def join(self):
+        pass
+
+
+def fake_task(msg_type, payload, raw_bytes=False, deadline=None):
+    time.sleep(payload.get('delay', 0))
+    if msg_type == TASK_PERFORMANCE:
+        raise ValueError("Payload no contiene 'url'")
+    return payload['url']
+
+
+class RunningServer:
+    """Servidor B corriendo en el loop del test sobre un puerto efímero."""
+
+    def __init__(self, pool, max_in_flight, lanes=None):
+        self.sock = create_listening_socket('127.0.0.1', 0)
+        self.port = self.sock.getsockname()[1]
+        self.server = ProcessingServer(pool, max_in_flight, lanes)
+        self.task = asyncio.create_task(self.server.serve_forever(self.sock))
+
+    async def close(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.sock.close()
+
+
+async def _start(pool, max_in_flight):
+    server = RunningServer(pool, max_in_flight)
+    return server, server.port
+
+
+@pytest.mark.asyncio
+async def test_responses_complete_out_of_order():
+    """Una tarea lenta no bloquea las respuestas de las rápidas en la misma conexión."""
+    server, port = await _start(FakePool(fake_task), max_in_flight=10)
+    client = ProcessingConnectionPool('127.0.0.1', port, size=1)
+    finished = []
+
+    async def send(url, delay):
+        resp = await client.request(TASK_IMAGES, {"url": url, "delay": delay}, timeout=5)
+        finished.append(resp[1]["data"])
+        return resp
+
+    try:
+        results = await asyncio.gather(send("lenta", 0.3), send("rapida", 0))
+        assert [msg_type for msg_type, _ in results] == [RESP_SUCCESS, RESP_SUCCESS]
+        assert finished == ["rapida", "lenta"]
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_task_error_and_bounded_backlog():
+    """Los errores de tarea vuelven como RESP_ERROR y el backlog limita las tareas en vuelo."""
+    pool = FakePool(fake_task)
+    server, port = await _start(pool, max_in_flight=2)
+    client = ProcessingConnectionPool('127.0.0.1', port, size=1)
+
+    try:
+        msg_type, payload = await client.request(TASK_PERFORMANCE, {"url": "x"}, timeout=5)
+        assert msg_type == RESP_ERROR
+        assert "Error de Tarea" in payload["error"]
+
+        results = await asyncio.gather(*[
+            client.request(TASK_IMAGES, {"url": str(i), "delay": 0.05}, timeout=5) for i in range(6)
+        ])
+        assert [p["data"] for _, p in results] == [str(i) for i in range(6)]
+        assert pool.max_running <= 2
+    finally:
+        await client.close()
+        await server.close()
+
+
+def slow_screenshot_task(msg_type, payload, raw_bytes=False, deadline=None):
+    time.sleep(payload.get('delay', 0))
+    return payload['url']
+
+
+@pytest.mark.asyncio
+async def test_carriles_aislan_tareas_rapidas_de_screenshots():
+    """Con el carril de screenshots saturado, una tarea de performance no hace cola detrás."""
+    screenshots = FakePool(slow_screenshot_task)
+    lanes = {
+        "screenshot": TaskLane("screenshot", screenshots, 1, max_pending=1),
+        "performance": TaskLane("performance", FakePool(slow_screenshot_task), 1, max_pending=1),
+    }
+    server = RunningServer(None, 10, lanes)
+    client = ProcessingConnectionPool('127.0.0.1', server.port, size=1)
+    finished = []
+
+    async def send(msg_type, url, delay):
+        await client.request(msg_type, {"url": url, "delay": delay}, timeout=5)
+        finished.append(url)
+
+    try:
+        await asyncio.gather(
+            *[send(TASK_SCREENSHOT, f"shot{i}", 0.1) for i in range(3)],
+            send(TASK_PERFORMANCE, "perf", 0),
+        )
+        assert finished[0] == "perf"
+        assert screenshots.max_running == 1
+
+        stats = server.server.lane_stats()
+        assert stats["screenshot"]["completed"] == 3 and stats["performance"]["completed"] == 1
+        assert stats["screenshot"]["wait_avg_ms"] > 0
+
+        # Un tipo de tarea sin carril (ni carril 'default') responde con error
+        msg_type, payload = await client.request(TASK_IMAGES, {"url": "x"}, timeout=5)
+        assert msg_type == RESP_ERROR
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_parse_lane_sizes():
+    assert parse_lane_sizes(None, 4) == {"screenshot": 4, "performance": 1, "images": 1}
+    assert parse_lane_sizes("images=3, screenshot=2", 4) == {"screenshot": 2, "performance": 1, "images": 3}
+    with pytest.raises(ValueError):
+        parse_lane_sizes("video=2", 4)
+    with pytest.raises(ValueError):
+        parse_lane_sizes("images=0", 4)
+
+
+@pytest.mark.asyncio
+async def test_tareas_vencidas_no_se_ejecutan():
+    """Lo que vence esperando su carril se abandona sin llegar al Pool ni responderse."""
+    pool = FakePool(slow_screenshot_task)
+    lane = TaskLane("screenshot", pool, 1, max_pending=1)
+    server = RunningServer(None, 10, {"screenshot": lane})
+    client = ProcessingConnectionPool('127.0.0.1', server.port, size=1)
+
+    try:
+        ocupada = asyncio.create_task(client.request(TASK_SCREENSHOT, {"url": "lenta", "delay": 0.4}, timeout=5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request(TASK_SCREENSHOT, {"url": "vencida"}, timeout=0.1)
+        await ocupada
+
+        stats = server.server.lane_stats()["screenshot"]
+        assert stats["expired"] == 1 and stats["completed"] == 1
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_run_task_rechaza_deadline_vencido():
+    with pytest.raises(TaskTimeoutError):
+        run_task(TASK_PERFORMANCE, {"url": "https://a.com", "page_stats": {}}, deadline=time.time() - 1)
+
+
+@pytest.mark.asyncio
+async def test_carril_se_recicla_al_superar_el_techo_de_memoria():
+    """Un worker sobre el límite de RSS hace que el carril pase a un Pool nuevo; TASK_STATS lo muestra."""
+    gordo = FakePool(fake_task, rss_bytes=600 * 2**20)
+    nuevos = []
+
+    def factory():
+        nuevos.append(FakePool(fake_task, rss_bytes=50 * 2**20))
+        return nuevos[-1]
+
+    lane = TaskLane("images", gordo, 1, max_pending=2, pool_factory=factory, max_rss_bytes=512 * 2**20)
+    server = RunningServer(None, 10, {"images": lane})
+    client = ProcessingConnectionPool('127.0.0.1', server.port, size=1)
+
+    try:
+        msg_type, _ = await client.request(TASK_IMAGES, {"url": "a"}, timeout=5)
+        assert msg_type == RESP_SUCCESS
+        assert gordo.closed and lane.pool is nuevos[0] and lane.recycles == 1
+
+        await client.request(TASK_IMAGES, {"url": "b"}, timeout=5)
+        msg_type, payload = await client.request(TASK_STATS, {}, timeout=5)
+        assert msg_type == RESP_SUCCESS
+        stats = payload["data"]["lanes"]["images"]
+        assert stats["recycles"] == 1 and stats["completed"] == 2
+        assert stats["workers"] == [{"pid": os.getpid(), "rss_mb": 50.0, "tasks": 1}]
+
+        metrics = payload["data"]["metrics"]
+        samples = metrics["processing_task_seconds"]["samples"]
+        assert samples[0]["labels"] == {"task": "images"} and samples[0]["count"] == 2
+        assert "protocol_codec_seconds" in metrics
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_run_task_in_worker_adjunta_estado_del_worker():
+    ok = run_task_in_worker(TASK_PERFORMANCE, {"url": "https://a.com", "page_stats": {"load_time_ms": 5}})
+    assert ok.error is None and ok.value["load_time_ms"] == 5
+    assert ok.pid == os.getpid() and ok.rss_bytes > 0
+
+    fallida = run_task_in_worker(TASK_PERFORMANCE, {})
+    assert isinstance(fallida.error, ValueError) and fallida.tasks == ok.tasks + 1
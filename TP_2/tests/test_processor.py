@@ -6,6 +6,8 @@ Estas pruebas REALIZAN peticiones de red y usan Selenium.
 
 import pytest
 import os
+import time
+from selenium.common.exceptions import WebDriverException
 from processor import screenshot, performance, image_processor
 
 TARGET_URL = "https://example.com"
@@ -33,6 +35,16 @@ def test_performance():
     assert data['total_size_kb'] > 0
     assert data['num_requests'] >= 1 
 
+def test_performance_from_page_stats():
+    """Con page_stats del Servidor A no se vuelve a descargar la página."""
+    data = performance.analyze_performance("http://no-existe.invalid", page_stats={
+        "load_time_ms": 123.456,
+        "total_size_kb": 10.0,
+        "resources": {"js": 2, "css": 1, "img": 3}
+    })
+    
+    assert data == {"load_time_ms": 123.46, "total_size_kb": 10.0, "num_requests": 7}
+
 @pytest.mark.slow
 def test_image_processor():
     """Prueba el procesador de imágenes con una imagen real."""
@@ -42,4 +54,226 @@ def test_image_processor():
     
     assert len(thumbnails) == 1
     assert isinstance(thumbnails[0], str)
-    assert len(thumbnails[0]) > 100 
\ No newline at end of file
+    assert len(thumbnails[0]) > 100 
+
+
+class FakeDriver:
+    """Imita webdriver.Chrome lo justo para take_screenshot."""
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.visited = []
+        self.quit_called = False
+        self.fail_next = False
+        self.captures = []
+        self.cdp = []
+        FakeDriver.instances.append(self)
+
+    def set_page_load_timeout(self, seconds): pass
+    def quit(self): self.quit_called = True
+
+    def get(self, url):
+        if self.fail_next and url != "about:blank":
+            raise WebDriverException("chrome not reachable")
+        self.visited.append(url)
+
+    def execute_cdp_cmd(self, cmd, params):
+        import base64, io
+        from PIL import Image
+        self.cdp.append((cmd, params))
+        if cmd == "Page.getLayoutMetrics":
+            return {"cssLayoutViewport": {"clientWidth": 1280, "clientHeight": 720},
+                    "cssContentSize": {"width": 1280, "height": 20000}}
+        if cmd == "Page.getFrameTree":
+            return {"frameTree": {"frame": {"securityOrigin": "https://a.com"},
+                                  "childFrames": [{"frame": {"securityOrigin": "https://ads.example"}}]}}
+        if cmd != "Page.captureScreenshot":
+            return {}
+        self.captures.append(params)
+        buf = io.BytesIO()
+        Image.effect_noise((params["clip"]["width"], 400), 60).save(buf, format='PNG')
+        return {"data": base64.b64encode(buf.getvalue()).decode()}
+
+
+def test_screenshot_options_downscale_and_encode(monkeypatch):
+    """Captura vía DevTools (página completa truncada), reduce el ancho y recodifica en JPEG."""
+    from common.screenshot_options import ScreenshotOptions
+
+    FakeDriver.instances = []
+    monkeypatch.setattr(screenshot.webdriver, "Chrome", FakeDriver)
+    monkeypatch.setattr(screenshot, "Service", lambda *a, **k: None)
+    monkeypatch.setattr(screenshot, "DRIVER_PATH", "/fake/chromedriver")
+    monkeypatch.setattr(screenshot, "_driver", None)
+
+    result = screenshot.take_screenshot("https://a.com", as_bytes=True,
+                                        options=ScreenshotOptions(width=320, format="jpeg", quality=50))
+    capture = FakeDriver.instances[0].captures[0]
+    assert capture["clip"]["height"] == 15000 and capture["captureBeyondViewport"]
+    assert result["image"][:2] == b"\xff\xd8"
+    assert (result["width"], result["height"]) == (320, 100)
+    assert result["bytes"] == len(result["image"])
+    assert result["bytes_saved"] == result["original_bytes"] - result["bytes"] > 0
+
+    # Sin opciones: el PNG tal cual, como siempre
+    png = screenshot.take_screenshot("https://b.com", as_bytes=True)
+    assert png.startswith(b"\x89PNG")
+    assert FakeDriver.instances[0].captures[1]["captureBeyondViewport"]
+
+
+def test_screenshot_reuses_and_recycles_driver(monkeypatch):
+    """El navegador se reutiliza entre páginas, se recicla cada N y se descarta si falla."""
+    FakeDriver.instances = []
+    monkeypatch.setattr(screenshot.webdriver, "Chrome", FakeDriver)
+    monkeypatch.setattr(screenshot, "Service", lambda *a, **k: None)
+    monkeypatch.setattr(screenshot, "DRIVER_PATH", "/fake/chromedriver")
+    monkeypatch.setattr(screenshot, "_driver", None)
+    monkeypatch.setattr(screenshot, "MAX_PAGES_PER_DRIVER", 2)
+
+    screenshot.take_screenshot("https://a.com")
+    screenshot.take_screenshot("https://b.com")
+    assert len(FakeDriver.instances) == 1
+    assert FakeDriver.instances[0].visited == ["https://a.com", "about:blank", "https://b.com", "about:blank"]
+
+    # Entre usos se borra el estado de todos los orígenes, incluidos los frames de terceros
+    resets = [(cmd, params.get("origin")) for cmd, params in FakeDriver.instances[0].cdp
+              if cmd in ("Network.clearBrowserCookies", "Storage.clearDataForOrigin")]
+    assert resets[:4] == [("Network.clearBrowserCookies", None), ("Storage.clearDataForOrigin", "*"),
+                          ("Storage.clearDataForOrigin", "https://a.com"),
+                          ("Storage.clearDataForOrigin", "https://ads.example")]
+
+    screenshot.take_screenshot("https://c.com")
+    assert len(FakeDriver.instances) == 2
+    assert FakeDriver.instances[0].quit_called
+
+    FakeDriver.instances[1].fail_next = True
+    with pytest.raises(screenshot.ProcessingError):
+        screenshot.take_screenshot("https://d.com")
+    assert FakeDriver.instances[1].quit_called
+    assert screenshot._driver is None
+
+
+def _serve_images(delays):
+    """Levanta un servidor HTTP local que sirve un PNG por ruta con cierto retardo."""
+    import io
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new('RGB', (300, 200), (200, 30, 30)).save(buf, format='PNG')
+    png = buf.getvalue()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delays.get(self.path, 0))
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(png)))
+            self.end_headers()
+            self.wfile.write(png)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_process_images_downloads_concurrently():
+    """El tiempo total es el de la imagen más lenta, no la suma, y se respeta el orden."""
+    server, base = _serve_images({'/a.png': 0.4, '/b.png': 0.4, '/c.png': 0.4})
+    try:
+        start = time.monotonic()
+        thumbnails = image_processor.process_images([f"{base}/a.png", f"{base}/b.png", f"{base}/c.png"])
+        elapsed = time.monotonic() - start
+
+        assert len(thumbnails) == 3
+        assert elapsed < 1.0
+    finally:
+        server.shutdown()
+
+
+def test_process_images_respects_total_deadline():
+    """Una imagen que no llega a tiempo se descarta sin frenar a las demás."""
+    server, base = _serve_images({'/lenta.png': 2.0})
+    try:
+        start = time.monotonic()
+        thumbnails = image_processor.process_images(
+            [f"{base}/lenta.png", f"{base}/rapida.png"], total_timeout=0.5
+        )
+        elapsed = time.monotonic() - start
+
+        assert len(thumbnails) == 1
+        assert elapsed < 1.5
+    finally:
+        server.shutdown()
+
+
+def _serve_cacheable_image(cache_control):
+    """Servidor local con un PNG con ETag que responde 304 a If-None-Match; cuenta los pedidos."""
+    import io
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new('RGB', (300, 200), (30, 30, 200)).save(buf, format='PNG')
+    png = buf.getvalue()
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            conditional = self.headers.get('If-None-Match') == '"v1"'
+            requests_seen.append((self.path, conditional))
+            self.send_response(304 if conditional else 200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Cache-Control', cache_control)
+            if conditional:
+                self.end_headers()
+                return
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(png)))
+            self.end_headers()
+            self.wfile.write(png)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+
+
+def test_process_images_uses_disk_cache(tmp_path):
+    """Una imagen repetida sale de la cache: sin red si está fresca, con un 304 si venció."""
+    server, base, seen = _serve_cacheable_image('max-age=60')
+    image_processor.configure_cache(str(tmp_path), 1024 * 1024)
+    try:
+        first = image_processor.process_images([f"{base}/logo.png"])
+        again = image_processor.process_images([f"{base}/logo.png"])
+        assert first == again and len(first) == 1
+        assert seen == [('/logo.png', False)]
+
+        # Otra URL con el mismo contenido reutiliza el thumbnail ya generado
+        image_processor.process_images([f"{base}/copia.png"])
+        cache = image_processor._cache
+        assert (cache.hits, cache.misses, cache.content_hits) == (1, 1, 1)
+        assert len(list((tmp_path / "thumbs").iterdir())) == 1
+    finally:
+        image_processor.configure_cache(None, 0)
+        server.shutdown()
+
+
+def test_process_images_revalidates_stale_entries(tmp_path):
+    server, base, seen = _serve_cacheable_image('no-cache')
+    image_processor.configure_cache(str(tmp_path), 1024 * 1024)
+    try:
+        first = image_processor.process_images([f"{base}/logo.png"])
+        again = image_processor.process_images([f"{base}/logo.png"])
+        assert first == again and len(first) == 1
+        assert seen == [('/logo.png', False), ('/logo.png', True)]
+        assert image_processor._cache.revalidated == 1
+    finally:
+        image_processor.configure_cache(None, 0)
+        server.shutdown()
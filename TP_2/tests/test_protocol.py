@@ -7,7 +7,6 @@ asíncrono (Servidor A).
 """
 
 import pytest
-import pytest_asyncio
 import asyncio
 import socket
 import struct
@@ -19,7 +18,11 @@ from common.protocol import (
     TASK_SCREENSHOT, 
     RESP_SUCCESS, 
     HEADER_SIZE, 
-    HEADER_FORMAT
+    HEADER_FORMAT,
+    FLAG_DEADLINE
+)
+from common.serialization import (
+    CODEC_JSON, CODEC_BINARY, serialize_data, deserialize_data
 )
 
 
@@ -28,16 +31,18 @@ def test_pack_message_format():
     handler = ProtocolHandler()
     payload = {"url": "https://test.com"}
     
-    message = handler.pack_message(TASK_SCREENSHOT, payload)
+    message = handler.pack_message(TASK_SCREENSHOT, payload, request_id=42)
     
     payload_bytes = json.dumps(payload, ensure_ascii=False).encode('utf-8')
     expected_total_len = HEADER_SIZE + len(payload_bytes)
     
     header_data = message[:HEADER_SIZE]
-    total_len, msg_type = struct.unpack(HEADER_FORMAT, header_data)
+    total_len, msg_type, flags, request_id = struct.unpack(HEADER_FORMAT, header_data)
     
     assert total_len == expected_total_len
     assert msg_type == TASK_SCREENSHOT
+    assert flags == CODEC_JSON
+    assert request_id == 42
     
     payload_data = message[HEADER_SIZE:]
     assert payload_data == payload_bytes
@@ -114,4 +119,120 @@ def test_sync_send_and_read_with_socketpair():
         
     finally:
         s1.close()
-        s2.close()
\ No newline at end of file
+        s2.close()
+
+
+def test_sync_request_id_roundtrip():
+    """Prueba que el request_id viaja en el header y se recupera al leer."""
+    s1, s2 = socket.socketpair()
+    handler = ProtocolHandler()
+    
+    try:
+        handler.sync_send_message(s1, TASK_SCREENSHOT, {"url": "https://a.com"}, request_id=7)
+        handler.sync_send_message(s1, TASK_SCREENSHOT, {"url": "https://b.com"}, request_id=8)
+        
+        frame_a = handler.sync_read_frame(s2)
+        frame_b = handler.sync_read_frame(s2)
+        
+        assert (frame_a.msg_type, frame_a.request_id, frame_a.payload) == (TASK_SCREENSHOT, 7, {"url": "https://a.com"})
+        assert (frame_b.msg_type, frame_b.request_id, frame_b.payload) == (TASK_SCREENSHOT, 8, {"url": "https://b.com"})
+        
+    finally:
+        s1.close()
+        s2.close()
+
+
+def test_deadline_viaja_en_la_extension_del_header():
+    """Con deadline_ms se prende FLAG_DEADLINE y el lector recupera los ms restantes."""
+    s1, s2 = socket.socketpair()
+    handler = ProtocolHandler(codec=CODEC_BINARY)
+    
+    try:
+        handler.sync_send_message(s1, TASK_SCREENSHOT, {"url": "https://a.com"}, request_id=9, deadline_ms=1500.7)
+        handler.sync_send_message(s1, TASK_SCREENSHOT, {"url": "https://b.com"}, request_id=10)
+        
+        frame = handler.sync_read_frame(s2)
+        assert frame.deadline_ms == 1500 and frame.payload == {"url": "https://a.com"}
+        assert frame.codec == CODEC_BINARY
+        
+        frame = handler.sync_read_frame(s2)
+        assert frame.deadline_ms is None and frame.request_id == 10
+    finally:
+        s1.close()
+        s2.close()
+    
+    message = handler.pack_message(TASK_SCREENSHOT, {}, deadline_ms=-5)
+    _, _, flags, _ = struct.unpack(HEADER_FORMAT, message[:HEADER_SIZE])
+    assert flags & FLAG_DEADLINE
+    assert struct.unpack("!I", message[HEADER_SIZE:HEADER_SIZE + 4])[0] == 0
+
+
+def test_binary_codec_roundtrip_keeps_raw_bytes():
+    """El codec binario conserva bytes crudos y todos los tipos JSON."""
+    data = {
+        "data": {
+            "screenshot": b"\x89PNG\x00\xff" * 1000,
+            "thumbnails": [b"\xff\xd8jpeg", b""],
+            "performance": {"load_time_ms": 12.5, "num_requests": 3, "ok": True, "extra": None},
+            "title": "Título ñandú",
+            "big": 2 ** 80,
+        }
+    }
+    encoded = serialize_data(data, CODEC_BINARY)
+    
+    assert deserialize_data(encoded, CODEC_BINARY) == data
+    # Los bytes no se inflan con base64: el mensaje pesa poco más que los datos crudos
+    assert len(encoded) < 6000 * 1.05
+
+
+def test_binary_codec_rechaza_payloads_malformados():
+    """Un entero 'L' inválido o una clave de map no hasheable dan un error de deserialización."""
+    bad_long = b"L" + struct.pack("!I", 3) + b"abc"
+    bad_key = b"m" + struct.pack("!I", 1) + b"l" + struct.pack("!I", 0) + b"N"
+    for garbage in (bad_long, bad_key):
+        result = deserialize_data(garbage, CODEC_BINARY)
+        assert "deserialization_error" in result
+
+
+def test_codec_negotiated_in_header():
+    """El codec viaja en los flags del header y el lector lo usa para decodificar."""
+    s1, s2 = socket.socketpair()
+    cliente = ProtocolHandler(codec=CODEC_BINARY)
+    servidor = ProtocolHandler()
+    
+    try:
+        cliente.sync_send_message(s1, TASK_SCREENSHOT, {"url": "https://a.com"}, request_id=3)
+        frame = servidor.sync_read_frame(s2)
+        assert frame.codec == CODEC_BINARY
+        assert frame.payload == {"url": "https://a.com"}
+        
+        # El servidor responde con el mismo codec que recibió
+        servidor.sync_send_message(s2, RESP_SUCCESS, {"data": b"raw"}, frame.request_id, frame.codec)
+        resp = cliente.sync_read_frame(s1)
+        assert resp.payload == {"data": b"raw"}
+        assert resp.request_id == 3
+    finally:
+        s1.close()
+        s2.close()
+
+
+@pytest.mark.asyncio
+async def test_async_sock_large_frame_roundtrip():
+    """Un frame de varios MB se recibe completo en el buffer preasignado (sock_recv_into)."""
+    s1, s2 = socket.socketpair()
+    s1.setblocking(False)
+    s2.setblocking(False)
+    handler = ProtocolHandler(codec=CODEC_BINARY)
+    payload = {"data": {"screenshot": bytes(range(256)) * (12 * 1024)}}
+    
+    try:
+        send = asyncio.create_task(handler.async_sock_send_message(s1, RESP_SUCCESS, payload, request_id=5))
+        frame = await handler.async_sock_read_frame(s2)
+        await send
+        
+        assert frame.msg_type == RESP_SUCCESS
+        assert frame.request_id == 5
+        assert frame.payload == payload
+    finally:
+        s1.close()
+        s2.close()
@@ -5,6 +5,8 @@ Pruebas Unitarias para los módulos de scraping (parser y metadata).
 import pytest
 from scraper.html_parser import parse_basic_data
 from scraper.metadata_extractor import extract_metadata
+from scraper.document_summary import build_document_summary
+from scraper.parser_pool import ParserPool
 
 MOCK_HTML = """
 <html>
@@ -63,4 +65,61 @@ def test_parse_title_fallback():
     """Prueba que el título haga fallback a H1 si <title> no existe."""
     html = "<html><body><h1>Título H1</h1></body></html>"
     data = parse_basic_data(html, BASE_URL)
-    assert data['title'] == "Título H1"
\ No newline at end of file
+    assert data['title'] == "Título H1"
+
+def test_document_summary_matches_individual_parsers():
+    """El resumen de una sola pasada coincide con parse_basic_data + extract_metadata."""
+    summary = build_document_summary(MOCK_HTML, BASE_URL)
+    basic = parse_basic_data(MOCK_HTML, BASE_URL)
+    
+    assert summary['title'] == basic['title']
+    assert sorted(summary['links']) == sorted(basic['links'])
+    assert summary['structure'] == basic['structure']
+    assert summary['images_count'] == basic['images_count']
+    assert summary['meta_tags'] == extract_metadata(MOCK_HTML)
+    
+    # Solo img/logo.png es del mismo dominio (cdn.com es externo, data: no tiene netloc)
+    assert summary['resources'] == {"js": 0, "css": 0, "img": 1}
+
+
+@pytest.mark.asyncio
+async def test_parser_pool_inline_y_en_procesos():
+    """Las páginas chicas se parsean en hilos y las grandes en el pool, con el mismo resultado."""
+    html_bytes = MOCK_HTML.encode('utf-8')
+    expected = build_document_summary(MOCK_HTML, BASE_URL)
+    
+    pool = ParserPool(workers=1, inline_threshold=len(html_bytes) + 1)
+    try:
+        assert await pool.summarize(html_bytes, BASE_URL, 'utf-8') == expected
+        
+        # El mismo contenido no se vuelve a parsear
+        assert await pool.summarize(html_bytes, BASE_URL, 'utf-8') == expected
+        assert pool.stats()['reused'] == 1 and pool.stats()['inline'] == 1
+
+        pool._summaries.clear()
+        pool.inline_threshold = 0
+        assert await pool.summarize(html_bytes, BASE_URL, 'utf-8') == expected
+        assert pool.stats()['inline'] == 1 and pool.stats()['pool'] == 1
+    finally:
+        pool.close()
+
+
+@pytest.mark.asyncio
+async def test_parser_pool_no_parsea_en_el_hilo_del_event_loop(monkeypatch):
+    """Ni las páginas chicas se parsean en el hilo del loop (bloquearían otros requests)."""
+    import threading
+    import scraper.parser_pool as parser_pool
+
+    threads = []
+
+    def fake_summary(html, base_url, encoding=None):
+        threads.append(threading.get_ident())
+        return {"title": "ok"}
+
+    monkeypatch.setattr(parser_pool, "build_document_summary", fake_summary)
+    pool = ParserPool(workers=0)
+    try:
+        assert await pool.summarize(b"<html></html>", BASE_URL) == {"title": "ok"}
+        assert threads and threads[0] != threading.get_ident()
+    finally:
+        pool.close()
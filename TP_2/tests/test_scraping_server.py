@@ -0,0 +1,335 @@
+"""
+Pruebas Unitarias para los endpoints del Servidor A (server_scraping.py)
+
+El scraping real se reemplaza por una función falsa, así se prueban los
+handlers sin red ni Servidor B.
+"""
+
+import pytest
+import asyncio
+import json
+from aiohttp import web
+from aiohttp.test_utils import TestServer, TestClient
+
+from common import ScrapingError
+from server_scraping import ScrapingCoordinator
+
+
+async def _client_for(coordinator: ScrapingCoordinator) -> TestClient:
+    app = web.Application()
+    app['http_client'] = None
+    app.router.add_post('/scrape/batch', coordinator.handle_scrape_batch)
+    app.router.add_get('/metrics', coordinator.handle_metrics)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_batch_deduplica_y_transmite_ndjson():
+    coordinator = ScrapingCoordinator('127.0.0.1', 1, batch_concurrency=2)
+    calls = []
+
+    async def fake_scrape(http_client, url, components, screenshot_options=None):
+        calls.append(url)
+        if "falla" in url:
+            raise ScrapingError("HTTP 404")
+        # La primera URL tarda más: su línea debe llegar al final
+        await asyncio.sleep(0.05 if url.endswith("/lenta") else 0)
+        return {"url": url, "status": "success"}, "miss"
+
+    coordinator._scrape = fake_scrape
+    client = await _client_for(coordinator)
+    try:
+        urls = ["https://a.com/lenta", "https://b.com/", "HTTPS://B.com", "https://c.com/falla"]
+        response = await client.post('/scrape/batch', json={"urls": urls})
+        assert response.status == 200
+        assert response.headers['X-Batch-Unique'] == "3"
+
+        lines = [json.loads(line) for line in (await response.text()).splitlines()]
+        assert len(lines) == 3 and len(calls) == 3
+        assert lines[-1]["url"] == "https://a.com/lenta"
+
+        by_index = {line["index"]: line for line in lines}
+        assert by_index[1]["result"]["url"] == "https://b.com/"
+        assert by_index[3]["status"] == "failed" and by_index[3]["http_status"] == 502
+
+        metrics = await (await client.get('/metrics')).text()
+        assert 'scrape_requests_total{endpoint="batch",result="miss"} 2' in metrics
+        assert 'scrape_requests_total{endpoint="batch",result="error"} 1' in metrics
+        assert 'scrape_request_seconds_count{endpoint="batch"} 3' in metrics
+    finally:
+        await client.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_sigue_si_se_cancela_el_scraping_de_una_url():
+    """Una URL cuyo scraping se cancela da una línea 'failed' y el batch termina."""
+    coordinator = ScrapingCoordinator('127.0.0.1', 1, batch_concurrency=1)
+
+    async def fake_scrape(http_client, url, components, screenshot_options=None):
+        if "cancelada" in url:
+            raise asyncio.CancelledError()
+        return {"url": url, "status": "success"}, "miss"
+
+    coordinator._scrape = fake_scrape
+    client = await _client_for(coordinator)
+    try:
+        urls = ["https://a.com/cancelada", "https://b.com/", "https://c.com/"]
+        response = await asyncio.wait_for(client.post('/scrape/batch', json={"urls": urls}), 5)
+        lines = [json.loads(line) for line in (await asyncio.wait_for(response.text(), 5)).splitlines()]
+
+        by_index = {line["index"]: line for line in lines}
+        assert sorted(by_index) == [0, 1, 2]
+        assert by_index[0]["status"] == "failed" and by_index[0]["http_status"] == 500
+        assert by_index[1]["status"] == by_index[2]["status"] == "success"
+    finally:
+        await client.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_valida_el_pedido():
+    coordinator = ScrapingCoordinator('127.0.0.1', 1, batch_max_urls=2)
+    client = await _client_for(coordinator)
+    try:
+        assert (await client.post('/scrape/batch', json={"urls": []})).status == 400
+        assert (await client.post('/scrape/batch', data="a\nb\nc")).status == 413
+    finally:
+        await client.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_pedir_solo_metadatos_no_usa_el_servidor_b():
+    """Con components=title,meta sólo se lee el <head> y no se envían tareas al Servidor B."""
+    from scraper.async_http import FetchedPage
+
+    coordinator = ScrapingCoordinator('127.0.0.1', 1)
+    fetches, tasks, bypassed, payloads = [], [], [], []
+
+    class FakeHTTP:
+        cached = False
+
+        async def fetch_document(self, url, head_only=False, bypass_cache=False):
+            fetches.append(head_only)
+            bypassed.append(bypass_cache)
+            html = b'<html><head><title>Hola</title><meta name="a" content="b"></head><body></body></html>'
+            return FetchedPage(html, url, 'utf-8', cached=self.cached and not bypass_cache)
+
+    async def fake_processing(task_type, payload):
+        tasks.append(task_type)
+        payloads.append(payload)
+        return {"ok": True}
+
+    coordinator._request_processing = fake_processing
+    try:
+        result, origin = await coordinator._scrape(FakeHTTP(), "https://a.com/", frozenset({"title", "meta_tags"}))
+        assert origin == "miss" and fetches == [True] and tasks == []
+        assert result["scraping_data"]["title"] == "Hola"
+        assert set(result["scraping_data"]) == {"title", "meta_tags"}
+        assert result["processing_data"] == {}
+
+        result, _ = await coordinator._scrape(FakeHTTP(), "https://a.com/", frozenset({"screenshot"}))
+        assert fetches == [True] and len(tasks) == 1
+        assert result["processing_data"] == {"screenshot": {"ok": True}}
+
+        # Con otros componentes la página sale de la cache HTTP; si vino de la
+        # cache, el Servidor B mide la carga por su cuenta (sin page_stats)
+        cached_http = FakeHTTP()
+        cached_http.cached = True
+        await coordinator._scrape(cached_http, "https://a.com/", frozenset({"title", "performance"}))
+        assert bypassed == [False, False] and payloads[-1]["page_stats"] == {}
+
+        await coordinator._scrape(FakeHTTP(), "https://a.com/", frozenset({"title", "performance"}))
+        assert payloads[-1]["page_stats"]["total_size_kb"] > 0
+
+        # Si sólo performance necesita la página, se descarga sin la cache
+        await coordinator._scrape(cached_http, "https://a.com/", frozenset({"performance"}))
+        assert bypassed[-1] is True and payloads[-1]["page_stats"]["total_size_kb"] > 0
+    finally:
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_opciones_de_screenshot_llegan_al_servidor_b():
+    """Las opciones screenshot_* se validan, viajan en el payload y no usan la cache."""
+    from scraper.result_cache import ScrapeResultCache
+
+    coordinator = ScrapingCoordinator('127.0.0.1', 1, result_cache=ScrapeResultCache())
+    payloads = []
+
+    async def fake_processing(task_type, payload):
+        payloads.append(payload)
+        return {"image": "AAAA", "format": payload.get("options", {}).get("format", "png")}
+
+    coordinator._request_processing = fake_processing
+    app = web.Application()
+    app['http_client'] = None
+    app.router.add_get('/scrape', coordinator.handle_scrape_sync)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        params = {'url': 'https://a.com/', 'components': 'screenshot',
+                  'screenshot_format': 'jpg', 'screenshot_width': '640', 'screenshot_mode': 'viewport'}
+        for _ in range(2):
+            response = await client.get('/scrape', params=params)
+            assert response.status == 200 and response.headers['X-Cache'] == 'MISS'
+        assert payloads[0]["options"] == {"mode": "viewport", "width": 640, "format": "jpeg", "quality": 80}
+        assert len(payloads) == 2
+
+        response = await client.get('/scrape', params={'url': 'https://a.com/', 'screenshot_quality': '0'})
+        assert response.status == 400
+    finally:
+        await client.close()
+        await coordinator.close()
+
+
+async def _task_client(coordinator: ScrapingCoordinator):
+    from common.task_store import MemoryTaskStore
+
+    app = web.Application()
+    app['http_client'] = None
+    app['task_store'] = MemoryTaskStore()
+    app.router.add_get('/status/{task_id}', coordinator.handle_status)
+    app.router.add_get('/status/{task_id}/events', coordinator.handle_task_events)
+    app.router.add_get('/result/{task_id}', coordinator.handle_result)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return app, client
+
+
+def _fake_scrape(release: asyncio.Event):
+    async def fake_timed_scrape(endpoint, http_client, url, components, screenshot_options):
+        await release.wait()
+        return {"url": url, "status": "success"}, None
+    return fake_timed_scrape
+
+
+@pytest.mark.asyncio
+async def test_long_polling_responde_apenas_termina_la_tarea():
+    """/result?wait= devuelve el resultado en un solo request, sin esperar el timeout."""
+    coordinator = ScrapingCoordinator('127.0.0.1', 1)
+    release = asyncio.Event()
+    coordinator._timed_scrape = _fake_scrape(release)
+    app, client = await _task_client(coordinator)
+    try:
+        await app['task_store'].create('t1', 'https://a.com/')
+        background = asyncio.create_task(
+            coordinator._run_scraping_task_background(app, 't1', 'https://a.com/'))
+
+        response = await client.get('/status/t1', params={'wait': '0.05'})
+        assert (await response.json())['status'] in ('pending', 'scraping')
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        pending = asyncio.ensure_future(client.get('/result/t1', params={'wait': '30'}))
+        await asyncio.sleep(0.1)
+        assert not pending.done()
+        release.set()
+        response = await pending
+        assert response.status == 200
+        assert (await response.json())['url'] == 'https://a.com/'
+        assert loop.time() - started < 5
+        await background
+        assert coordinator.task_events.listeners == 0
+
+        assert (await client.get('/status/t1', params={'wait': 'x'})).status == 400
+        assert (await client.get('/status/nope', params={'wait': '1'})).status == 404
+    finally:
+        await client.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_sse_transmite_estados_y_resultado():
+    coordinator = ScrapingCoordinator('127.0.0.1', 1)
+    release = asyncio.Event()
+    coordinator._timed_scrape = _fake_scrape(release)
+    app, client = await _task_client(coordinator)
+    try:
+        await app['task_store'].create('t2', 'https://a.com/')
+        response = await client.get('/status/t2/events')
+        assert response.status == 200
+        assert response.headers['Content-Type'].startswith('text/event-stream')
+
+        background = asyncio.create_task(
+            coordinator._run_scraping_task_background(app, 't2', 'https://a.com/'))
+        await asyncio.sleep(0.05)
+        release.set()
+        body = (await response.read()).decode()
+        await background
+
+        events = [block.split('\n') for block in body.strip().split('\n\n')]
+        names = [lines[0] for lines in events]
+        assert names[0] == 'event: status' and names[-1] == 'event: result'
+        statuses = [json.loads(lines[1][len('data: '):])['status'] for lines in events[:-1]]
+        assert statuses == ['pending', 'scraping', 'completed']
+        assert json.loads(events[-1][1][len('data: '):])['url'] == 'https://a.com/'
+
+        assert (await client.get('/status/nope/events')).status == 404
+    finally:
+        await client.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_rescrapear_con_todos_los_componentes_revalida_con_la_cache_http():
+    """Un re-scrape con los componentes por defecto manda If-None-Match/If-Modified-Since."""
+    from scraper.async_http import AsyncHTTPClient
+    from scraper.http_cache import HTTPCache
+
+    seen = []
+
+    async def page(request):
+        seen.append((request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')))
+        headers = {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT', 'Cache-Control': 'no-cache'}
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=b"<html><head><title>V1</title></head></html>",
+                            content_type='text/html', headers=headers)
+
+    origin_app = web.Application()
+    origin_app.router.add_get('/page', page)
+    origin = TestServer(origin_app)
+    await origin.start_server()
+
+    coordinator = ScrapingCoordinator('127.0.0.1', 1)
+    payloads = []
+
+    async def fake_processing(task_type, payload):
+        payloads.append(payload)
+        return {"ok": True}
+
+    coordinator._request_processing = fake_processing
+    http_client = AsyncHTTPClient(http_cache=HTTPCache())
+    url = str(origin.make_url('/page'))
+    try:
+        for _ in range(2):
+            result, _ = await coordinator._scrape(http_client, url)
+            assert result["scraping_data"]["title"] == "V1"
+
+        assert seen == [(None, None), ('"v1"', 'Mon, 01 Jan 2024 00:00:00 GMT')]
+        performance = [p for p in payloads if "page_stats" in p]
+        assert performance[0]["page_stats"] and performance[1]["page_stats"] == {}
+    finally:
+        await http_client.close_session()
+        await origin.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_stats_parser():
+    coordinator = ScrapingCoordinator('127.0.0.1', 1)
+    app = web.Application()
+    app.router.add_get('/stats/parser', coordinator.handle_parser_stats)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        await coordinator.parser_pool.summarize(b"<html><head><title>A</title></head></html>", "https://a.com/")
+        stats = await (await client.get('/stats/parser')).json()
+        assert stats["inline"] == 1 and stats["pool"] == 0 and stats["reused"] == 0
+    finally:
+        await client.close()
+        await coordinator.close()
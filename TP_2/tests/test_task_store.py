@@ -0,0 +1,129 @@
+"""
+Pruebas Unitarias para el almacén de tareas (common/task_store.py)
+"""
+
+import pytest
+import json
+import os
+
+from common.task_store import (
+    MemoryTaskStore, SQLiteTaskStore,
+    STATUS_SCRAPING, STATUS_COMPLETED, STATUS_FAILED, STATUS_EXPIRED
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_memory_store_respeta_presupuesto():
+    """Al superar el presupuesto, el resultado más viejo se descarta y la tarea queda 'expired'."""
+    store = MemoryTaskStore(max_bytes=300)
+    for task_id in ("a", "b"):
+        await store.create(task_id, f"https://{task_id}.com")
+        await store.finish(task_id, STATUS_COMPLETED, {"screenshot": "x" * 200})
+
+    assert (await store.get("a"))["status"] == STATUS_EXPIRED
+    assert await store.get_result("a") is None
+    assert json.loads(await store.get_result("b"))["screenshot"] == "x" * 200
+    assert (await store.stats())["result_bytes"] <= 300
+
+
+@pytest.mark.asyncio
+async def test_memory_store_purga_tareas_vencidas():
+    clock = FakeClock()
+    store = MemoryTaskStore(ttl=60, purge_every=1, clock=clock)
+    await store.create("viejo", "https://a.com")
+    await store.finish("viejo", STATUS_COMPLETED, {"ok": True})
+    await store.create("en_curso", "https://b.com")
+
+    clock.now += 61
+    await store.create("nuevo", "https://c.com")
+
+    assert await store.get("viejo") is None
+    assert await store.get("en_curso") is not None  # las no terminadas no se purgan
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_persiste_y_derrama_a_archivos(tmp_path):
+    """Los resultados grandes van a archivos y todo sobrevive a un reinicio."""
+    db_path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(db_path, spill_threshold=100)
+
+    await store.create("chico", "https://a.com")
+    await store.finish("chico", STATUS_COMPLETED, {"title": "A"})
+    await store.create("grande", "https://b.com")
+    await store.finish("grande", STATUS_COMPLETED, {"screenshot": "x" * 1000})
+    await store.create("colgada", "https://c.com")
+    await store.set_status("colgada", STATUS_SCRAPING)
+
+    assert os.listdir(store.blob_dir) == ["grande.json"]
+    assert (await store.stats())["spilled_results"] == 1
+    await store.close()
+
+    store = SQLiteTaskStore(db_path, spill_threshold=100)
+    try:
+        assert json.loads(await store.get_result("chico")) == {"title": "A"}
+        assert json.loads(await store.get_result("grande"))["screenshot"] == "x" * 1000
+        assert (await store.get("colgada"))["status"] == STATUS_FAILED
+        assert await store.get("inexistente") is None
+    finally:
+        await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_purga_filas_y_archivos(tmp_path):
+    clock = FakeClock()
+    store = SQLiteTaskStore(str(tmp_path / "tasks.db"), spill_threshold=10,
+                            ttl=60, purge_every=1, clock=clock)
+    try:
+        await store.create("viejo", "https://a.com")
+        await store.finish("viejo", STATUS_COMPLETED, {"screenshot": "x" * 100})
+        clock.now += 61
+        await store.create("nuevo", "https://b.com")
+        await store.finish("nuevo", STATUS_COMPLETED, {"screenshot": "y" * 100})
+
+        assert await store.get("viejo") is None
+        assert os.listdir(store.blob_dir) == ["nuevo.json"]
+    finally:
+        await store.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_compartido_recupera_solo_sus_tareas(tmp_path):
+    """Un worker relanzado marca como fallidas sólo las tareas que él dejó en curso."""
+    db_path = str(tmp_path / "tasks.db")
+    w0 = SQLiteTaskStore(db_path, owner="w0")
+    w1 = SQLiteTaskStore(db_path, owner="w1")
+    try:
+        await w0.create("de_w0", "https://a.com")
+        await w1.create("de_w1", "https://b.com")
+
+        relanzado = SQLiteTaskStore(db_path, owner="w0")
+        await relanzado.close()
+
+        assert (await w1.get("de_w0"))["status"] == STATUS_FAILED
+        assert (await w0.get("de_w1"))["status"] == "pending"
+    finally:
+        await w0.close()
+        await w1.close()
+
+
+
+def test_un_backend_incompleto_falla_al_crearse():
+    from common.task_store import TaskStore
+
+    class SinResultados(TaskStore):
+        async def create(self, task_id, url): pass
+        async def set_status(self, task_id, status): pass
+        async def finish(self, task_id, status, result): pass
+        async def get(self, task_id): return None
+        async def stats(self): return {}
+
+    with pytest.raises(TypeError):
+        SinResultados()
@@ -0,0 +1,76 @@
+"""
+Pruebas Unitarias para la cache de thumbnails en disco (processor/thumbnail_cache.py).
+"""
+
+import os
+import time
+
+from processor.thumbnail_cache import ThumbnailCache, content_hash, fresh_seconds
+
+
+def test_guarda_por_contenido_y_url(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=1024 * 1024)
+    digest = content_hash(b"imagen original")
+    cache.store(digest, b"jpeg")
+    cache.store_index("https://a.com/logo.png", digest, {"etag": '"v1"', "cache_control": "max-age=60"})
+
+    entry = cache.lookup("https://a.com/logo.png")
+    assert entry["digest"] == digest and cache.is_fresh(entry)
+    assert cache.read(digest) == b"jpeg"
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"'}
+
+    # Otra instancia (otro proceso) ve lo mismo
+    other = ThumbnailCache(str(tmp_path))
+    assert other.read(other.lookup("https://a.com/logo.png")["digest"]) == b"jpeg"
+    assert cache.lookup("https://b.com/") is None and cache.read("0" * 64) is None
+
+
+def test_fresh_seconds_respeta_cache_control():
+    assert fresh_seconds(None, 300) == 300
+    assert fresh_seconds("public, max-age=42") == 42
+    assert fresh_seconds("no-cache") == 0
+    assert fresh_seconds("max-age=99999999") == 24 * 3600
+
+
+def test_desaloja_los_menos_usados(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=3000)
+    digests = [content_hash(bytes([i])) for i in range(3)]
+    for i, digest in enumerate(digests):
+        cache.store(digest, b"x" * 900)
+        os.utime(cache._thumb_path(digest), (time.time() - 100 + i, time.time() - 100 + i))
+
+    # Leer el más viejo lo vuelve el más reciente
+    assert cache.read(digests[0]) is not None
+    cache.store(content_hash(b"nuevo"), b"x" * 900)
+
+    assert cache.evictions >= 1
+    assert cache.read(digests[1]) is None
+    assert cache.read(digests[0]) is not None
+    assert cache._scan_size() <= 3000
+
+
+def test_el_limite_vale_para_todos_los_procesos(tmp_path):
+    """Dos instancias (dos workers del Pool) comparten el límite, no uno cada una."""
+    caches = [ThumbnailCache(str(tmp_path), max_bytes=10000) for _ in range(2)]
+    for i in range(40):
+        caches[i % 2].store(content_hash(bytes([i])), b"x" * 500)
+        assert caches[0]._scan_size() <= 10000
+
+    assert sum(cache.evictions for cache in caches) >= 1
+    assert caches[0].stats()["estimated_bytes"] <= 10000
+
+
+def test_sobrescribir_cuenta_solo_la_diferencia_y_no_toca_temporales(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=1024 * 1024)
+    digest = content_hash(b"logo")
+    for _ in range(5):
+        cache.store_index("https://a.com/logo.png", digest, {"etag": '"v1"'})
+    assert cache.stats()["estimated_bytes"] == cache._scan_size()
+
+    # Un temporal de otro proceso a medio escribir no se desaloja
+    in_progress = tmp_path / "thumbs" / ".tmp-otro"
+    in_progress.write_bytes(b"x" * 2000)
+    small = ThumbnailCache(str(tmp_path), max_bytes=1000)
+    small.store(content_hash(b"nuevo"), b"x" * 900)
+    small.store(content_hash(b"otro"), b"x" * 900)
+    assert small.evictions >= 1 and in_progress.exists()
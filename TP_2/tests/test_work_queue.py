@@ -0,0 +1,75 @@
+"""
+Pruebas Unitarias para la cola de trabajo acotada (common/work_queue.py)
+"""
+
+import pytest
+import asyncio
+from collections import defaultdict
+
+from common.work_queue import BoundedWorkQueue, host_of
+
+
+def test_host_of():
+    assert host_of("https://Example.com:8443/a?b=1") == "example.com"
+
+
+@pytest.mark.asyncio
+async def test_cola_llena_rechaza_y_cuenta_descartes():
+    release = asyncio.Event()
+
+    async def handler(task_id, url):
+        await release.wait()
+
+    queue = BoundedWorkQueue(handler, max_size=2, workers=1, per_host=1)
+    queue.start()
+    try:
+        assert queue.submit("1", "https://a.com")
+        await asyncio.sleep(0.01)  # el worker toma el primero
+        assert queue.submit("2", "https://b.com")
+        assert queue.submit("3", "https://c.com")
+        assert not queue.submit("4", "https://d.com")
+
+        stats = queue.stats()
+        assert stats["depth"] == 2 and stats["busy"] == 1 and stats["dropped"] == 1
+        assert 1 <= queue.retry_after() <= 60
+
+        queue.reject()
+        assert queue.stats()["dropped"] == 2
+
+        release.set()
+        while queue.completed < 3:
+            await asyncio.sleep(0.01)
+        assert queue.depth == 0
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_limite_por_host_no_bloquea_otros_hosts():
+    """Un host saturado no ocupa todos los workers: otros hosts siguen avanzando."""
+    running = defaultdict(int)
+    peak = defaultdict(int)
+    order = []
+
+    async def handler(task_id, url):
+        host = host_of(url)
+        running[host] += 1
+        peak[host] = max(peak[host], running[host])
+        await asyncio.sleep(0.05 if host == "lento.com" else 0.001)
+        running[host] -= 1
+        order.append(task_id)
+
+    queue = BoundedWorkQueue(handler, max_size=100, workers=4, per_host=2)
+    queue.start()
+    try:
+        for i in range(6):
+            queue.submit(f"lento-{i}", f"https://lento.com/{i}")
+        queue.submit("rapido", "https://rapido.com/")
+
+        while queue.completed < 7:
+            await asyncio.sleep(0.01)
+
+        assert peak["lento.com"] == 2
+        assert order.index("rapido") < order.index("lento-2")
+    finally:
+        await queue.stop()